@@ -0,0 +1,168 @@
+# api/batching.py
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, Prometheus-style (the last bucket is +Inf)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with count and sum, safe to observe from any thread."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts, count, total = list(self._counts), self._count, self._sum
+        cumulative, running = {}, 0
+        for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+            running += n
+            cumulative[str(bound)] = running
+        return {
+            "buckets": cumulative,
+            "count": count,
+            "sum": round(total, 3),
+            "mean": round(total / count, 3) if count else None,
+        }
+
+
+class MicroBatcher:
+    """Carpool lane for /predict - one forward pass per batch, not per request
+
+    ``submit`` queues one request's model inputs and awaits its row of the
+    output. A single collector task takes the first waiting request, keeps
+    collecting until ``max_batch`` requests or ``max_wait_ms`` have passed, then
+    runs the whole batch through the model on a dedicated thread. While that
+    pass runs, new requests pile up, so under load the batches grow on their
+    own and throughput scales with batch size rather than request count.
+
+    Requests are grouped by the bundle they were prepared with, so a hot swap
+    mid-batch never mixes one version's scaling with another's weights.
+    Callers that already hold a whole batch (bulk /predict, the forecast
+    scheduler) use ``predict`` to run it on the same model thread.
+    """
+
+    def __init__(self, max_batch: int = 32, max_wait_ms: float = 3.0):
+        if max_batch < 1 or max_wait_ms < 0:
+            raise ValueError("max_batch must be >= 1 and max_wait_ms >= 0.")
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(WAIT_MS_BUCKETS)
+        self.forward_ms = Histogram(WAIT_MS_BUCKETS)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # One model lane: every forward pass in the service runs here, so none contend for cores
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+
+    def _ensure_started(self) -> asyncio.Queue:
+        # Started lazily so the queue and task belong to the server's running loop
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._collect(), name="micro-batcher")
+        return self._queue
+
+    async def submit(self, bundle, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """Scaled model output for one request's ``inputs`` (batch dimension of 1)."""
+        future = asyncio.get_running_loop().create_future()
+        await self._ensure_started().put((bundle, inputs, future, time.perf_counter()))
+        return await future
+
+    def predict(self, bundle, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """Blocking forward pass over an already-batched ``inputs`` on the model lane.
+
+        For worker threads only; from the event loop use ``submit``.
+        """
+        return self._executor.submit(self._forward, bundle, inputs).result()
+
+    @staticmethod
+    def _forward(bundle, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        rows = len(next(iter(inputs.values())))
+        return bundle.model.predict(inputs, batch_size=rows, verbose=0)
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Anything that queued up meanwhile rides along, still within max_batch
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            started = time.perf_counter()
+            for _, _, _, queued_at in batch:
+                self.queue_wait_ms.observe((started - queued_at) * 1000)
+            self.batch_size.observe(len(batch))
+
+            # Callers that timed out or disconnected while queued don't need a forward pass
+            batch = [item for item in batch if not item[2].done()]
+            groups: Dict[int, List[Tuple]] = {}
+            for item in batch:
+                groups.setdefault(id(item[0]), []).append(item)
+            for items in groups.values():
+                await self._run(loop, items)
+            self.forward_ms.observe((time.perf_counter() - started) * 1000)
+
+    async def _run(self, loop: asyncio.AbstractEventLoop, items: List[Tuple]) -> None:
+        bundle = items[0][0]
+        inputs = {key: np.concatenate([item[1][key] for item in items]) for key in items[0][1]}
+        try:
+            outputs = await loop.run_in_executor(self._executor, self._forward, bundle, inputs)
+        except Exception as e:
+            logger.error(f"Batched forward pass over {len(items)} requests failed: {e}")
+            for _, _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for row, (_, _, future, _) in enumerate(items):
+            # The caller may have gone away (client disconnect cancels its future)
+            if not future.done():
+                future.set_result(outputs[row:row + 1])
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_ms,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size": self.batch_size.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "forward_ms": self.forward_ms.snapshot(),
+        }
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,99 @@
+# api/bounded_executor.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class PredictionOverloaded(RuntimeError):
+    """Every worker is busy and the queue is full - the caller should back off (503)."""
+
+
+class PredictionTimeout(TimeoutError):
+    """The prediction didn't finish within its deadline (504)."""
+
+
+class BoundedExecutor:
+    """Bouncer at the door of the prediction threads
+
+    Blocking work (downloads, indicators, forward passes) runs on
+    ``max_workers`` threads so the event loop stays free for auth, health and
+    Mongo traffic. At most ``max_queue`` more calls may wait for a thread;
+    beyond that ``run`` refuses immediately with PredictionOverloaded instead
+    of letting latency pile up. A call still queued when its caller times out
+    or disconnects is cancelled before it starts. One already running finishes
+    in the background and keeps holding its slot until it does, so the bound
+    stays honest.
+    """
+
+    def __init__(self, max_workers: int = 8, max_queue: int = 32, timeout_s: Optional[float] = 20.0):
+        if max_workers < 1 or max_queue < 0:
+            raise ValueError("max_workers must be >= 1 and max_queue >= 0.")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout_s = timeout_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="predict")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                self.cancelled += 1
+            else:
+                self.completed += 1
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PredictionOverloaded(
+                    f"Prediction capacity exhausted ({self._in_flight} in flight, "
+                    f"{self.max_workers} workers + {self.max_queue} queued)."
+                )
+            self._in_flight += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """``fn(*args)`` on a prediction thread, with admission control and cancellation."""
+        self._acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._release)
+        # wrap_future cancels the thread future too if this coroutine is cancelled
+        return await asyncio.wrap_future(future)
+
+    async def wait(self, awaitable, timeout_s: Optional[float] = None) -> Any:
+        """Await with the executor's deadline; on expiry the work is cancelled and PredictionTimeout raised."""
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        try:
+            return await asyncio.wait_for(awaitable, timeout_s)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise PredictionTimeout(f"Prediction took longer than {timeout_s}s.") from None
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "timeout_s": self.timeout_s,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.max_workers),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "cancelled": self.cancelled,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,165 @@
+# api/forecast_scheduler.py
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from app.api.prediction_cache import last_closed_session
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastScheduler:
+    """Night shift for the prediction store - tomorrow's forecasts are ready before anyone asks
+
+    Every ``poll_seconds`` it checks whether a new session has closed (or a new
+    model version was swapped in) since the last refresh. If so it runs one
+    PredictionService.predict_many over every symbol in the model's mapping,
+    which fetches concurrently, scores in one model call and writes each result
+    to the service's PredictionCache. Symbols that fail or whose vendor hasn't
+    published the new bar yet are retried with exponential backoff, at most
+    ``max_attempts`` times per version and session.
+
+    /predict and the agent read through the same cache, so after a refresh a
+    request is a lookup. Run it on its own with ``python -m
+    app.api.forecast_scheduler`` next to a shared cache path so every API
+    worker sees its results, or in a single-process API with
+    PRECOMPUTE_FORECASTS=1 (off by default, since each uvicorn worker would
+    otherwise run its own full refresh).
+    """
+
+    def __init__(self, service, poll_seconds: float = 60.0, max_attempts: int = 5):
+        self.service = service
+        self.poll_seconds = poll_seconds
+        # A symbol that keeps failing (delisted, too little data, ...) is retried with
+        # exponential backoff, then given up on until the next version or session
+        self.max_attempts = max_attempts
+        # (model version, session) whose refresh is done: every symbol cached or given up on
+        self.completed: Optional[tuple] = None
+        self.last_run: Dict[str, Any] = {}
+        self._target: Optional[tuple] = None
+        self._attempts: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _current_target(self) -> tuple:
+        return self.service.bundle.version, last_closed_session().date().isoformat()
+
+    def pending(self) -> List[str]:
+        """Symbols with no cached forecast for the current version and session."""
+        bundle = self.service.bundle
+        return [
+            symbol for symbol in bundle.stock_identifier_mapping
+            if self.service.cache.key(bundle.version, symbol) not in self.service.cache
+        ]
+
+    def refresh(self) -> Dict[str, Any]:
+        """One batched refresh of every missing symbol whose retry backoff has passed."""
+        target = self._current_target()
+        if target != self._target:
+            # New session or model version: everyone gets a fresh set of attempts
+            self._target = target
+            self._attempts.clear()
+            self._retry_at.clear()
+            self._errors.clear()
+
+        now = time.monotonic()
+        missing = self.pending()
+        symbols = [
+            symbol for symbol in missing
+            if self._attempts.get(symbol, 0) < self.max_attempts and self._retry_at.get(symbol, 0.0) <= now
+        ]
+        started = time.perf_counter()
+        try:
+            outcomes = self.service.predict_many(symbols) if symbols else {}
+        except Exception as e:
+            # A failed batch (e.g. the model call) counts as an attempt for each symbol in it
+            logger.error(f"Forecast refresh batch failed: {e}")
+            outcomes = {symbol: e for symbol in symbols}
+        remaining = self.pending()
+        for symbol in set(symbols) & set(remaining):
+            attempts = self._attempts.get(symbol, 0) + 1
+            self._attempts[symbol] = attempts
+            self._retry_at[symbol] = now + self.poll_seconds * 2 ** (attempts - 1)
+            outcome = outcomes.get(symbol)
+            self._errors[symbol] = str(outcome) if isinstance(outcome, Exception) else "bar not published yet"
+
+        gave_up = sorted(s for s in remaining if self._attempts.get(s, 0) >= self.max_attempts)
+        if len(gave_up) == len(remaining):
+            self.completed = target
+        if not symbols and self.last_run.get("session") == target[1] and self.last_run.get("version") == target[0]:
+            # Everything left is backing off; nothing ran, nothing new to report
+            return self.last_run
+
+        self.last_run = {
+            "version": target[0],
+            "session": target[1],
+            "refreshed": len(symbols) - len(set(symbols) & set(remaining)),
+            "remaining": remaining,
+            "gave_up": gave_up,
+            "failed": {s: self._errors[s] for s in remaining if s in self._errors},
+            "seconds": round(time.perf_counter() - started, 3),
+            "finished_at": pd.Timestamp.now().isoformat(),
+        }
+        logger.info(f"Forecast refresh for v{target[0]} session {target[1]}: "
+                    f"{self.last_run['refreshed']} refreshed, {len(remaining)} still missing "
+                    f"({len(gave_up)} given up)")
+        return self.last_run
+
+    def due(self) -> bool:
+        return self.completed != self._current_target()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="forecast-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds)
+            self._thread = None
+
+    def _run(self) -> None:
+        # First pass right away, so a freshly started server doesn't wait for the next close
+        while True:
+            if self.due():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Forecast refresh failed, retrying in {self.poll_seconds}s: {e}")
+            if self._stop.wait(self.poll_seconds):
+                return
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "completed": list(self.completed) if self.completed else None,
+            "due": self.due(),
+            "last_run": self.last_run,
+        }
+
+
+def main():
+    """Standalone worker: keep the shared prediction store warm for the API processes."""
+    from app.api.prediction_service import PredictionService
+
+    logging.basicConfig(level=logging.INFO)
+    service = PredictionService(precompute=False)
+    if service.cache.shared is None:
+        logger.warning("PREDICTION_CACHE_PATH is not set - forecasts will only live in this worker's memory.")
+    scheduler = ForecastScheduler(service, service.config.forecast_poll_seconds)
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop()
+        service.models.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 # api/main.py
 from fastapi import FastAPI, HTTPException
 from contextlib import asynccontextmanager
-from pathlib import Path
-from .prediction_service import PredictionService
+from .bounded_executor import PredictionOverloaded, PredictionTimeout
+from .prediction_service import BulkPredictionRequest, PredictionService
 import numpy as np
 import pandas as pd
 
@@ -13,35 +13,17 @@ ml_models = {}
 async def lifespan(app: FastAPI):
      
     print("🚀 Server starting up...")
-    # Use absolute path to the model files from the original location
-    model_path = Path(r"C:\Users\mohit\Desktop\python\FinancialAgent\LJ_Hackathon\backend\models\saved\multi_stock_model.keras")
-    feature_scaler_path = Path(r"C:\Users\mohit\Desktop\python\FinancialAgent\LJ_Hackathon\backend\models\saved\multi_stock_feature_scaler.pkl")
-    target_scaler_path = Path(r"C:\Users\mohit\Desktop\python\FinancialAgent\LJ_Hackathon\backend\models\saved\multi_stock_target_scaler.pkl")
-    
-    # Check if model files exist
-    for file_path, file_desc in [
-        (model_path, "Model file"),
-        (feature_scaler_path, "Feature scaler"),
-        (target_scaler_path, "Target scaler")
-    ]:
-        if not file_path.exists():
-            print(f"⚠️ Warning: {file_desc} not found at {file_path}")
-        else:
-            print(f"✅ Found {file_desc} at {file_path}")
-            
-    # Initialize our prediction service
+    # Model bundles come from the registry (Config.registry_path, or MODEL_REGISTRY_DIR)
     try:
-        ml_models["stock_predictor"] = PredictionService(
-            model_path=model_path,
-            feature_scaler_path=feature_scaler_path,
-            target_scaler_path=target_scaler_path
-        )
-        print("✅ Successfully loaded model and scalers")
+        ml_models["stock_predictor"] = PredictionService()
+        print("✅ Successfully loaded model bundle")
     except Exception as e:
         print(f"❌ Error initializing prediction service: {str(e)}")
         
     yield
     # This code runs ONCE when the server shuts down.
+    if "stock_predictor" in ml_models:
+        await ml_models["stock_predictor"].close()
     ml_models.clear()
     print("🌙 Server shutting down...")
 
@@ -61,6 +43,63 @@ app.add_middleware(
 def read_root():
     return {"message": "Grumpy's Stock Prediction API is awake. Now what?"}
 
+@app.get("/model")
+def get_model_info():
+    """Version, cutoff and metadata of the bundle currently serving requests"""
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.bundle.manifest()
+
+@app.get("/metrics/cache")
+def get_cache_metrics():
+    """Hit/miss counters and size of the prediction cache"""
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.cache.metrics()
+
+@app.get("/metrics/forecasts")
+def get_forecast_status():
+    """Last precompute run of the forecast scheduler and whether one is due"""
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.scheduler.status()
+
+@app.get("/metrics/executor")
+def get_executor_metrics():
+    """In-flight, queued, rejected and timed-out counts of the prediction executor"""
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.executor.metrics()
+
+@app.get("/metrics/batching")
+def get_batching_metrics():
+    """Batch size, queue wait and forward-pass time histograms of the predict batcher"""
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.batcher.metrics()
+
+@app.post("/predict")
+async def get_bulk_prediction(request: BulkPredictionRequest):
+    """
+    Predictions for a list of symbols (or "all") in one call; failures are reported per symbol
+    """
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    try:
+        return await predictor.bulk_response_async(request)
+    except PredictionOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except PredictionTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 @app.post("/predict/{symbol}")
 @app.get("/predict/{symbol}")  # Added GET endpoint to handle both request types
 async def get_prediction(symbol: str):
@@ -73,12 +112,12 @@ async def get_prediction(symbol: str):
 
     # Convert symbol to uppercase to match our config
     symbol = symbol.upper()
-    if symbol not in predictor.config.data.stock_identifier_mapping:
+    if symbol not in predictor.stock_identifier_mapping:
         raise HTTPException(status_code=404, detail=f"Stock symbol '{symbol}' not supported.")
 
     try:
         # Make the prediction - this internally calls _prepare_inference_data
-        prediction = predictor.predict(symbol)
+        prediction = await predictor.predict_async(symbol)
         
         # Extract and format values for response
         return {
@@ -88,6 +127,11 @@ async def get_prediction(symbol: str):
             "close": float(prediction[0][2]),
             "date": pd.Timestamp.now().strftime('%Y-%m-%d')
         }
+    except PredictionOverloaded as e:
+        # Saturated: shed load instead of queueing without bound
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except PredictionTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         # Catch any errors during fetching or prediction
         print(f"Error making prediction: {str(e)}")
@@ -42,7 +42,7 @@ async def get_prediction_node(state: AgentState):
 
     try:
         # This is the direct Python function call to our loaded model service. NO HTTP.
-        prediction_result = service_instance.predict(symbol)
+        prediction_result = await service_instance.predict_async(symbol)
         state["prediction_data"] = prediction_result
         logger.info(f"Successfully ran prediction model for {symbol}")
     except Exception as e:
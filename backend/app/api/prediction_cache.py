@@ -0,0 +1,153 @@
+# api/prediction_cache.py
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from app.data.market_calendar import last_closed_session, next_session_close
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePredictionStore:
+    """Shared second level for PredictionCache: one SQLite file that every worker
+    process on the machine reads and writes, so a prediction computed by one
+    uvicorn worker is a hit for the others."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " version INTEGER, symbol TEXT, session TEXT, value TEXT, expires_at REAL,"
+                " PRIMARY KEY (version, symbol, session))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't cross threads, so each thread opens its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: Tuple[int, str, str], now: float) -> Optional[np.ndarray]:
+        row = self._connection().execute(
+            "SELECT value FROM predictions WHERE version=? AND symbol=? AND session=? AND expires_at>?",
+            (*key, now),
+        ).fetchone()
+        return np.asarray(json.loads(row[0])) if row else None
+
+    def put(self, key: Tuple[int, str, str], value: np.ndarray, expires_at: float) -> None:
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                         (*key, json.dumps(value.tolist()), expires_at))
+            conn.execute("DELETE FROM predictions WHERE expires_at<=?", (pd.Timestamp.now(tz="UTC").timestamp(),))
+
+
+class PredictionCache:
+    """Pensieve for predictions - a daily-bar forecast only changes when a bar closes
+
+    Entries are keyed by (model version, symbol, last closed session) and
+    expire when the next session's bar becomes final, not on a fixed TTL. A
+    hot-swapped model version misses on its own. An LRU of ``max_entries``
+    bounds memory; with ``shared_path`` a SQLite file behind it lets several
+    worker processes share hits.
+    """
+
+    def __init__(self, max_entries: int = 1024, shared_path: Optional[Path] = None, settle_minutes: int = 30):
+        self.max_entries = max_entries
+        self.settle_minutes = settle_minutes
+        self.shared = SQLitePredictionStore(shared_path) if shared_path else None
+        self._memory: "OrderedDict[Tuple[int, str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, version: int, symbol: str, now: Optional[pd.Timestamp] = None) -> Tuple[int, str, str]:
+        return version, symbol, last_closed_session(now, self.settle_minutes).date().isoformat()
+
+    def get(self, key: Tuple[int, str, str]) -> Optional[np.ndarray]:
+        value = self.get_local(key)
+        return value if value is not None else self.get_shared(key)
+
+    def get_local(self, key: Tuple[int, str, str]) -> Optional[np.ndarray]:
+        """Memory-only lookup, never blocks on I/O. A miss here isn't counted until get_shared."""
+        now = pd.Timestamp.now(tz="UTC").timestamp()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._memory[key]
+        return None
+
+    def get_shared(self, key: Tuple[int, str, str]) -> Optional[np.ndarray]:
+        """Shared-store lookup after a get_local miss; a SQLite query, so keep it off the event loop."""
+        now = pd.Timestamp.now(tz="UTC").timestamp()
+        value = self.shared.get(key, now) if self.shared is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._store(key, value, self._expiry(key))
+        return value
+
+    def __contains__(self, key: Tuple[int, str, str]) -> bool:
+        """Whether a live entry exists here or in the shared store, without touching the counters."""
+        now = pd.Timestamp.now(tz="UTC").timestamp()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                return True
+        return self.shared is not None and self.shared.get(key, now) is not None
+
+    def put(self, key: Tuple[int, str, str], value: np.ndarray) -> None:
+        expires_at = self._expiry(key)
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, value, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared prediction cache write failed: {e}")
+
+    def _expiry(self, key: Tuple[int, str, str]) -> float:
+        return next_session_close(pd.Timestamp(key[2]), self.settle_minutes).timestamp()
+
+    def _store(self, key: Tuple[int, str, str], value: np.ndarray, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+                "shared": str(self.shared.path) if self.shared is not None else None,
+            }
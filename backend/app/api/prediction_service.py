@@ -1,78 +1,408 @@
 # api/prediction_service.py
-import pickle
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
 import numpy as np
 import pandas as pd
-import tensorflow as tf
+from pydantic import BaseModel
+from app.api.batching import MicroBatcher
+from app.api.bounded_executor import BoundedExecutor, PredictionOverloaded
+from app.api.forecast_scheduler import ForecastScheduler
+from app.api.prediction_cache import PredictionCache, last_closed_session
 from app.data.dataFetcher import DataFetcher
+from app.data.online_indicators import IncrementalIndicatorEngine
+from app.data.model_bundle import HotBundle, ModelBundle, ModelRegistry
 from app.data.stock_config import Config
 
+# Feature rows kept per symbol by the incremental indicator engine
+INDICATOR_HISTORY = 256
+
+
+class InsufficientDataError(ValueError):
+    """Too few recent bars for a symbol to fill one model window."""
+
+
+class BulkPredictionRequest(BaseModel):
+    # A list of tickers, or "all" for every symbol the model knows
+    symbols: Union[List[str], str] = "all"
+
+
 class PredictionService:
-    def __init__(self, model_path: Path, feature_scaler_path: Path, target_scaler_path: Path):
+    def __init__(self, registry_path: Optional[Path] = None, poll_seconds: float = 30.0,
+                 precompute: Optional[bool] = None):
         """
-        Loads the trained model and scalers into memory ONCE.
+        Loads the current model bundle from the registry ONCE, then watches the
+        registry and hot-swaps newer versions in the background. With precompute
+        (default: Config.precompute_forecasts) every symbol's forecast is refreshed
+        into the cache after each session close.
         """
-        self.model = tf.keras.models.load_model(model_path)
-        with open(feature_scaler_path, "rb") as f:
-            self.feature_scaler = pickle.load(f)
-        with open(target_scaler_path, "rb") as f:
-            self.target_scaler = pickle.load(f)
-        
         self.config = Config()
+        self.registry = ModelRegistry(registry_path or self.config.registry_path)
+        # With a TFLite/ONNX export and its runtime installed, TensorFlow is never imported
+        self.models = HotBundle(self.registry, poll_seconds=poll_seconds, runtime=self.config.inference_runtime)
+        self.models.start()
         self.fetcher = DataFetcher(self.config.data)
-        print("✅ PredictionService initialized. Model and scalers are loaded.")
+        # Per-symbol indicator state: after the first request only the new bars are fetched
+        self.indicators = IncrementalIndicatorEngine(self.config.data, history_size=INDICATOR_HISTORY)
+        self.batcher = MicroBatcher(self.config.predict_batch_max_size, self.config.predict_batch_wait_ms)
+        # Blocking fetch/prepare work runs here, never on the event loop
+        self.executor = BoundedExecutor(self.config.predict_workers, self.config.predict_max_queue,
+                                        self.config.predict_timeout_s)
+        self.cache = PredictionCache(self.config.prediction_cache_size, self.config.prediction_cache_path)
+        self.scheduler = ForecastScheduler(self, self.config.forecast_poll_seconds)
+        if self.config.precompute_forecasts if precompute is None else precompute:
+            self.scheduler.start()
+        print(f"✅ PredictionService initialized with model v{self.models.current.version} "
+              f"on {self.models.current.runtime}.")
+
+    @property
+    def bundle(self) -> ModelBundle:
+        return self.models.current
 
-    def _prepare_inference_data(self, symbol: str) -> dict:
+    @property
+    def stock_identifier_mapping(self):
+        return self.bundle.stock_identifier_mapping
+
+    def _prepare_inference_data(self, symbol: str, bundle: ModelBundle) -> dict:
         """
         Fetches the LATEST data needed for a single prediction.
         """
-        # Fetch the last ~120 days to ensure enough data for a 30-day sequence after cleaning
-        end_date = pd.Timestamp.now().strftime('%Y-%m-%d')
-        start_date = (pd.Timestamp.now() - pd.DateOffset(days=120)).strftime('%Y-%m-%d')
-        
-        df = self.fetcher.fetch_data(symbol, start_date, end_date)
+        return self._prepare_window(symbol, bundle)[0]
+
+    def _window_range(self) -> Tuple[str, str]:
+        # Fetch the last ~120 days to ensure enough data for a 30-day sequence after cleaning.
+        # The range is [start, end), so end the day after the last settled session:
+        # that bar is included, a session still trading is not
+        last_session = last_closed_session(settle_minutes=self.cache.settle_minutes)
+        end_date = (last_session + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        start_date = (last_session - pd.DateOffset(days=120)).strftime('%Y-%m-%d')
+        return start_date, end_date
+
+    def _incremental(self, bundle: ModelBundle) -> bool:
+        return self.indicators.supports(bundle.feature_names) and bundle.time_steps <= INDICATOR_HISTORY
+
+    def _warm(self, symbol: str, bundle: ModelBundle, start_date: str) -> bool:
+        """Whether the symbol's indicator state is recent enough to only catch up on new bars."""
+        last = self.indicators.last_date(symbol)
+        return self._incremental(bundle) and last is not None and last >= pd.Timestamp(start_date)
+
+    def _prepare_window(self, symbol: str, bundle: ModelBundle) -> Tuple[dict, str]:
+        """
+        Model inputs for the latest window, plus the date of its last bar.
+        """
+        start_date, end_date = self._window_range()
+        if self._incremental(bundle):
+            df = self._incremental_features(symbol, bundle, start_date, end_date)
+        else:
+            # Planner features the engine doesn't cover: full fetch and recompute
+            df = self.fetcher.fetch_data(symbol, start_date, end_date)[bundle.feature_names]
+        return self._window(symbol, bundle, df)
+
+    def _window(self, symbol: str, bundle: ModelBundle, df: pd.DataFrame) -> Tuple[dict, str]:
         df = df.dropna()
-        
+
         # We only need the last `time_steps` worth of data
-        if len(df) < self.config.data.time_steps:
-            raise ValueError(f"Not enough recent data for {symbol} to make a prediction.")
-        
-        # Get feature names and slice the dataframe
-        feature_names = self.config.data.get_active_features
-        features_df = df[feature_names].tail(self.config.data.time_steps)
-        
-        # IMPORTANT: Use the LOADED scaler to TRANSFORM the new data
-        scaled_features = self.feature_scaler.transform(features_df)
-        
+        if len(df) < bundle.time_steps:
+            raise InsufficientDataError(f"Not enough recent data for {symbol} to make a prediction.")
+
+        # Feature order comes from the bundle, exactly as the model was trained
+        features_df = df[bundle.feature_names].tail(bundle.time_steps)
+
+        # IMPORTANT: Use the bundle's scaler parameters to TRANSFORM the new data
+        scaled_features = bundle.feature_scaler.transform(features_df.to_numpy(dtype=self.config.data.dtype))
+
         # The model expects a batch dimension, so add one
-        price_input = np.expand_dims(scaled_features, axis=0)
-        
+        price_input = np.expand_dims(scaled_features, axis=0).astype(self.config.data.dtype, copy=False)
+
         # Get the stock ID for the embedding layer
-        stock_id = self.config.data.stock_identifier_mapping[symbol]
-        stock_input = np.array([[stock_id]])
-        
+        stock_id = bundle.stock_identifier_mapping[symbol]
+        stock_input = np.array([[stock_id]], dtype=np.int32)
+
         return {
             'price_input': price_input,
             'stock_input': stock_input
-        }
+        }, pd.Timestamp(features_df.index[-1]).date().isoformat()
+
+    def _windows_from_raw(self, raw: Dict[str, pd.DataFrame],
+                          bundle: ModelBundle) -> Dict[str, Union[Tuple[dict, str], Exception]]:
+        """
+        Model inputs for several symbols' raw bars, with the features computed for
+        the whole batch at once (DataFetcher.add_features_many, i.e. the vectorized
+        universe kernels). A symbol that fails maps to its exception.
+        """
+        if not raw:
+            return {}
+        try:
+            frames = self.fetcher.add_features_many(raw)
+        except Exception as e:
+            return {symbol: e for symbol in raw}
+        outcomes = {}
+        for symbol, df in frames.items():
+            try:
+                outcomes[symbol] = self._window(symbol, bundle, df[bundle.feature_names])
+            except Exception as e:
+                outcomes[symbol] = e
+        return outcomes
+
+    def _incremental_features(self, symbol: str, bundle: ModelBundle, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        The bundle's features for the latest bars, updating the symbol's indicator
+        state with only the bars since it was last seen. A symbol seen for the
+        first time (or whose state fell out of the fetch window) is warmed up from
+        the full window.
+        """
+        # One catch-up per symbol at a time: a second request waits, then finds it current
+        with self.indicators.symbol_lock(symbol):
+            last = self.indicators.last_date(symbol)
+            if last is None or last < pd.Timestamp(start_date):
+                raw = self.fetcher.fetch_raw(symbol, start_date, end_date)
+                return self.indicators.warm_up(symbol, raw, bundle.feature_names)
+
+            new_start = (last + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+            if new_start < end_date:
+                try:
+                    raw = self.fetcher.fetch_raw(symbol, new_start, end_date)
+                except ValueError:
+                    # Nothing published yet for the new range comes back as an empty, column-less frame
+                    raw = pd.DataFrame()
+                for date, bar in zip(raw.index, raw.to_dict("records")):
+                    self.indicators.update(symbol, bar, date)
+            return self.indicators.window(symbol, feature_names=bundle.feature_names)
+
+    def _remember(self, key: Tuple[int, str, str], last_bar: str, prediction: np.ndarray) -> None:
+        # Only cache once the data has caught up with the session the key names;
+        # a vendor that hasn't published the bar yet would otherwise pin a stale answer
+        if last_bar >= key[2]:
+            self.cache.put(key, prediction)
 
     def predict(self, symbol: str) -> np.ndarray:
         """
         The main prediction function.
         """
+        # One bundle for the whole request, even if a new version is swapped in meanwhile
+        bundle = self.bundle
+
+        # 0. Same version, same symbol, no new bar since: nothing to recompute
+        key = self.cache.key(bundle.version, symbol)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
         # 1. Get and prepare the latest data
-        inference_data = self._prepare_inference_data(symbol)
-        
-        # 2. Make a prediction using the loaded model
-        scaled_prediction = self.model.predict(inference_data)
-        
-        # 3. Inverse transform the prediction to get real values
-        # The scaler expects the same number of features as during training,
-        # so we create a dummy array and place our prediction in it.
-        dummy_array = np.zeros((scaled_prediction.shape[0], self.target_scaler.n_features_in_))
-        dummy_array[:, :self.config.model.output_dim] = scaled_prediction
-        
-        real_prediction = self.target_scaler.inverse_transform(dummy_array)
-        
-        # Return only the relevant columns (High, Low, Close)
-        return real_prediction[:, :self.config.model.output_dim]
\ No newline at end of file
+        inference_data, last_bar = self._prepare_window(symbol, bundle)
+
+        # 2. Make a prediction using the loaded model, on the batcher's model lane
+        scaled_prediction = self.batcher.predict(bundle, inference_data)
+
+        # 3. Inverse transform the prediction to get real values (High, Low, Close)
+        prediction = bundle.target_scaler.inverse_transform(scaled_prediction[:, :self.config.model.output_dim])
+        self._remember(key, last_bar, prediction)
+        return prediction
+
+    async def predict_async(self, symbol: str) -> np.ndarray:
+        """
+        Same result as predict, but the forward pass is shared with whatever other
+        requests arrive within the batching window, and nothing blocks the event loop:
+        fetching runs on the bounded executor and the whole call has its deadline.
+        Raises PredictionOverloaded when saturated and PredictionTimeout past the deadline.
+        """
+        return await self.executor.wait(self._predict_async(symbol))
+
+    async def _predict_async(self, symbol: str) -> np.ndarray:
+        bundle = self.bundle
+        key = self.cache.key(bundle.version, symbol)
+        cached = (await self._cached_async([key]))[0]
+        if cached is not None:
+            return cached
+
+        inference_data, last_bar = await self.executor.run(self._prepare_window, symbol, bundle)
+        scaled_prediction = await self.batcher.submit(bundle, inference_data)
+        prediction = bundle.target_scaler.inverse_transform(scaled_prediction[:, :self.config.model.output_dim])
+        self._remember(key, last_bar, prediction)
+        return prediction
+
+    async def _cached_async(self, keys: List[Tuple[int, str, str]]) -> List[Optional[np.ndarray]]:
+        # Memory lookups on the loop; the shared store is a SQLite query, so it goes to the executor
+        values = [self.cache.get_local(key) for key in keys]
+        misses = [i for i, value in enumerate(values) if value is None]
+        if misses:
+            def lookup():
+                return [self.cache.get_shared(keys[i]) for i in misses]
+            shared = await self.executor.run(lookup) if self.cache.shared is not None else lookup()
+            for i, value in zip(misses, shared):
+                values[i] = value
+        return values
+
+    def _score(self, bundle: ModelBundle, prepared: Dict[str, Tuple[dict, str]],
+               keys: Dict[str, Tuple[int, str, str]]) -> Dict[str, np.ndarray]:
+        """One model call over every prepared window; each row is cached under its symbol's key."""
+        inputs = {key: np.concatenate([p[key] for p, _ in prepared.values()])
+                  for key in ('price_input', 'stock_input')}
+        # Same model thread as the micro-batches, so bulk and precompute passes queue behind them
+        scaled_prediction = self.batcher.predict(bundle, inputs)
+        predictions = bundle.target_scaler.inverse_transform(scaled_prediction[:, :self.config.model.output_dim])
+        results = {}
+        for row, (symbol, (_, last_bar)) in enumerate(prepared.items()):
+            results[symbol] = predictions[row:row + 1]
+            self._remember(keys[symbol], last_bar, results[symbol])
+        return results
+
+    def predict_many(self, symbols: List[str],
+                     bundle: Optional[ModelBundle] = None) -> Dict[str, Union[np.ndarray, Exception]]:
+        """
+        Predictions for several symbols: symbols with warm indicator state catch up
+        on their new bars, the rest are fetched concurrently and get their features
+        from the vectorized universe kernels in one go. Everything that prepared
+        cleanly is scored in one model call. A symbol that fails maps to its
+        exception instead of failing the rest.
+        """
+        bundle = bundle or self.bundle
+        prepared, results = {}, {}
+        keys = {symbol: self.cache.key(bundle.version, symbol) for symbol in symbols}
+        for symbol in symbols:
+            cached = self.cache.get(keys[symbol])
+            if cached is not None:
+                results[symbol] = cached
+        missing = [symbol for symbol in symbols if symbol not in results]
+
+        start_date, end_date = self._window_range()
+        warm = [symbol for symbol in missing if self._warm(symbol, bundle, start_date)]
+        cold = [symbol for symbol in missing if symbol not in warm]
+
+        # Symbols with current indicator state only catch up on their new bars
+        outcomes = {}
+        workers = min(self.config.data.fetch_workers, len(warm)) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prepare") as pool:
+            futures = {symbol: pool.submit(self._prepare_window, symbol, bundle) for symbol in warm}
+            for symbol, future in futures.items():
+                outcomes[symbol] = future.exception() or future.result()
+
+        # The rest: one batched fetch, then features for the whole batch at once
+        raw = self.fetcher.fetch_many_raw(cold, start_date, end_date, return_exceptions=True)
+        outcomes.update({symbol: df for symbol, df in raw.items() if isinstance(df, Exception)})
+        outcomes.update(self._windows_from_raw(
+            {symbol: df for symbol, df in raw.items() if not isinstance(df, Exception)}, bundle
+        ))
+
+        for symbol in missing:
+            if isinstance(outcomes[symbol], Exception):
+                results[symbol] = outcomes[symbol]
+            else:
+                prepared[symbol] = outcomes[symbol]
+
+        if prepared:
+            results.update(self._score(bundle, prepared, keys))
+        return {symbol: results[symbol] for symbol in symbols}
+
+    async def predict_many_async(self, symbols: List[str],
+                                 bundle: Optional[ModelBundle] = None) -> Dict[str, Union[np.ndarray, Exception]]:
+        """
+        predict_many for the event loop: every fetch, the batched feature computation
+        and the model call run on the bounded executor, so a bulk request takes its
+        share of the prediction threads instead of starting its own. At most
+        ``max_workers`` of its fetches are in flight at once; one refused by a
+        saturated executor fails only its symbol.
+        """
+        bundle = bundle or self.bundle
+        prepared, results = {}, {}
+        keys = {symbol: self.cache.key(bundle.version, symbol) for symbol in symbols}
+        for symbol, cached in zip(symbols, await self._cached_async([keys[s] for s in symbols])):
+            if cached is not None:
+                results[symbol] = cached
+        missing = [symbol for symbol in symbols if symbol not in results]
+
+        start_date, end_date = self._window_range()
+        warm = [symbol for symbol in missing if self._warm(symbol, bundle, start_date)]
+        cold = [symbol for symbol in missing if symbol not in warm]
+        limit = asyncio.Semaphore(self.executor.max_workers)
+
+        async def on_executor(fn, *args):
+            async with limit:
+                return await self.executor.run(fn, *args)
+
+        # Warm symbols catch up on their new bars; cold ones are only fetched here...
+        outcomes = dict(zip(warm + cold, await asyncio.gather(
+            *(on_executor(self._prepare_window, symbol, bundle) for symbol in warm),
+            *(on_executor(self.fetcher.fetch_raw, symbol, start_date, end_date) for symbol in cold),
+            return_exceptions=True,
+        )))
+        # ...and get their features computed as one batch
+        raw = {symbol: outcomes.pop(symbol) for symbol in cold if not isinstance(outcomes[symbol], Exception)}
+        if raw:
+            outcomes.update(await self.executor.run(self._windows_from_raw, raw, bundle))
+
+        for symbol in missing:
+            if isinstance(outcomes[symbol], Exception):
+                results[symbol] = outcomes[symbol]
+            else:
+                prepared[symbol] = outcomes[symbol]
+
+        if prepared:
+            results.update(await self.executor.run(self._score, bundle, prepared, keys))
+        return {symbol: results[symbol] for symbol in symbols}
+
+    def _bulk_symbols(self, request: BulkPredictionRequest, bundle: ModelBundle) -> List[str]:
+        if isinstance(request.symbols, str):
+            if request.symbols.lower() != "all":
+                raise ValueError('symbols must be a list of tickers or "all".')
+            return list(bundle.stock_identifier_mapping)
+        # Uppercase and de-duplicate, keeping the caller's order
+        return list(dict.fromkeys(symbol.upper() for symbol in request.symbols))
+
+    def _bulk_body(self, symbols: List[str], outcomes: Dict[str, Union[np.ndarray, Exception]],
+                   bundle: ModelBundle) -> dict:
+        items = []
+        for symbol in symbols:
+            outcome = outcomes.get(symbol)
+            if outcome is None:
+                items.append({"symbol": symbol, "status": "error", "code": 404,
+                              "detail": f"Stock symbol '{symbol}' not supported."})
+            elif isinstance(outcome, Exception):
+                if isinstance(outcome, InsufficientDataError):
+                    code = 422
+                elif isinstance(outcome, PredictionOverloaded):
+                    code = 503
+                else:
+                    code = 500
+                items.append({"symbol": symbol, "status": "error", "code": code, "detail": str(outcome)})
+            else:
+                items.append({"symbol": symbol, "status": "ok", "high": float(outcome[0][0]),
+                              "low": float(outcome[0][1]), "close": float(outcome[0][2])})
+        return {
+            "date": pd.Timestamp.now().strftime('%Y-%m-%d'),
+            "model_version": bundle.version,
+            "predictions": items,
+        }
+
+    def bulk_response(self, request: BulkPredictionRequest) -> dict:
+        """
+        JSON body for the bulk /predict endpoint: one item per requested symbol,
+        either the prediction or that symbol's own error status and detail.
+        """
+        # One bundle for the whole call: its mapping, its predictions, its version in the response
+        bundle = self.bundle
+        symbols = self._bulk_symbols(request, bundle)
+        known = [symbol for symbol in symbols if symbol in bundle.stock_identifier_mapping]
+        outcomes = self.predict_many(known, bundle) if known else {}
+        return self._bulk_body(symbols, outcomes, bundle)
+
+    async def bulk_response_async(self, request: BulkPredictionRequest) -> dict:
+        """
+        bulk_response without blocking the event loop: prepares and scoring share the
+        bounded executor with single predictions, and the whole call has the bulk
+        deadline (Config.predict_bulk_timeout_s) instead of the per-prediction one.
+        """
+        bundle = self.bundle
+        symbols = self._bulk_symbols(request, bundle)
+        known = [symbol for symbol in symbols if symbol in bundle.stock_identifier_mapping]
+        outcomes = await self.executor.wait(self.predict_many_async(known, bundle),
+                                            timeout_s=self.config.predict_bulk_timeout_s) if known else {}
+        return self._bulk_body(symbols, outcomes, bundle)
+
+    async def close(self) -> None:
+        """Stop the reload watcher, the forecast scheduler, the batcher and the executor."""
+        self.scheduler.stop()
+        self.models.stop()
+        await self.batcher.close()
+        self.executor.shutdown()
@@ -1,9 +1,10 @@
 # app/api/router.py
+import asyncio
 from fastapi import APIRouter, HTTPException
-from pathlib import Path
 import pandas as pd
 import numpy as np
-from .prediction_service import PredictionService
+from .bounded_executor import PredictionOverloaded, PredictionTimeout
+from .prediction_service import BulkPredictionRequest, InsufficientDataError, PredictionService
 
 # This dictionary will hold our loaded service
 ml_models = {}
@@ -12,42 +13,105 @@ router = APIRouter(tags=["predictions"])
 
 # Initialize the prediction service
 def initialize_prediction_service():
-    # Use absolute path to the model files from the original location
-    model_path = Path(r"C:\Users\mohit\Desktop\python\FinancialAgent\LJ_Hackathon\backend\models\saved\multi_stock_model.keras")
-    feature_scaler_path = Path(r"C:\Users\mohit\Desktop\python\FinancialAgent\LJ_Hackathon\backend\models\saved\multi_stock_feature_scaler.pkl")
-    target_scaler_path = Path(r"C:\Users\mohit\Desktop\python\FinancialAgent\LJ_Hackathon\backend\models\saved\multi_stock_target_scaler.pkl")
-    
-    # Check if model files exist
-    for file_path, file_desc in [
-        (model_path, "Model file"),
-        (feature_scaler_path, "Feature scaler"),
-        (target_scaler_path, "Target scaler")
-    ]:
-        if not file_path.exists():
-            print(f"⚠️ Warning: {file_desc} not found at {file_path}")
-        else:
-            print(f"✅ Found {file_desc} at {file_path}")
-            
-    # Initialize our prediction service
+    # Model bundles come from the registry (Config.registry_path, or MODEL_REGISTRY_DIR)
     try:
-        ml_models["stock_predictor"] = PredictionService(
-            model_path=model_path,
-            feature_scaler_path=feature_scaler_path,
-            target_scaler_path=target_scaler_path
-        )
-        print("✅ Successfully loaded model and scalers")
+        ml_models["stock_predictor"] = PredictionService()
+        print("✅ Successfully loaded model bundle")
     except Exception as e:
         print(f"❌ Error initializing prediction service: {str(e)}")
 
 
+_initializing = asyncio.Lock()
+
+async def ensure_prediction_service():
+    # Loading the model takes seconds; do it off the event loop, and only once
+    async with _initializing:
+        if not ml_models.get("stock_predictor"):
+            await asyncio.to_thread(initialize_prediction_service)
+
+
+@router.get("/model")
+async def get_model_info():
+    """
+    Version, cutoff and metadata of the bundle currently serving requests
+    """
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.bundle.manifest()
+
+
+@router.get("/metrics/cache")
+async def get_cache_metrics():
+    """
+    Hit/miss counters and size of the prediction cache
+    """
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.cache.metrics()
+
+
+@router.get("/metrics/forecasts")
+async def get_forecast_status():
+    """
+    Last precompute run of the forecast scheduler and whether one is due
+    """
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.scheduler.status()
+
+
+@router.get("/metrics/executor")
+async def get_executor_metrics():
+    """
+    In-flight, queued, rejected and timed-out counts of the prediction executor
+    """
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.executor.metrics()
+
+
+@router.get("/metrics/batching")
+async def get_batching_metrics():
+    """
+    Batch size, queue wait and forward-pass time histograms of the predict batcher
+    """
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    return predictor.batcher.metrics()
+
+
+@router.post("/predict")
+async def get_bulk_prediction(request: BulkPredictionRequest):
+    """
+    Predictions for a list of symbols (or "all") in one call; failures are reported per symbol
+    """
+    await ensure_prediction_service()
+
+    predictor = ml_models.get("stock_predictor")
+    if not predictor:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet.")
+    try:
+        return await predictor.bulk_response_async(request)
+    except PredictionOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except PredictionTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 @router.post("/predict/{symbol}")
 @router.get("/predict/{symbol}")
 async def get_prediction(symbol: str):
     """
     Endpoint to get stock prediction for a given symbol
     """
-    if not ml_models.get("stock_predictor"):
-        initialize_prediction_service()
+    await ensure_prediction_service()
         
     predictor = ml_models.get("stock_predictor")
     if not predictor:
@@ -55,13 +119,13 @@ async def get_prediction(symbol: str):
 
     # Convert symbol to uppercase to match our config
     symbol = symbol.upper()
-    if symbol not in predictor.config.data.stock_identifier_mapping:
+    if symbol not in predictor.stock_identifier_mapping:
         raise HTTPException(status_code=404, detail=f"Stock symbol '{symbol}' not supported.")
 
     try:
         try:
             # Make the prediction - this internally calls _prepare_inference_data
-            prediction = predictor.predict(symbol)
+            prediction = await predictor.predict_async(symbol)
             
             # Extract and format values for response
             return {
@@ -74,12 +138,19 @@ async def get_prediction(symbol: str):
         except ValueError as ve:
             # Handle specific value errors like not enough data
             print(f"Value Error in prediction: {str(ve)}")
-            if "Not enough recent data" in str(ve):
+            if isinstance(ve, InsufficientDataError):
                 raise HTTPException(
                     status_code=422, 
                     detail=f"Insufficient data available for {symbol}. We need at least 30 days of market data to make a prediction."
                 )
             raise ve
+    except HTTPException:
+        raise
+    except PredictionOverloaded as e:
+        # Saturated: shed load instead of queueing without bound
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except PredictionTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         # Catch any other errors during fetching or prediction
         print(f"Error making prediction: {str(e)}")
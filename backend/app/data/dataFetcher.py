@@ -1,10 +1,12 @@
 import pandas as pd
-import yfinance as yf
-from alpha_vantage.timeseries import TimeSeries
-from typing import Optional
+from typing import Dict, Iterator, List, Mapping, Optional, Union
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from .stock_config import DataConfig
-from .data_preprocessor import TechnicalIndicators
+from .ohlcv_cache import OHLCVCache
+from .market_sources import MarketDataSource, get_source
+from .feature_planner import FeaturePlanner
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -12,57 +14,112 @@ logger.setLevel(logging.INFO)
 
 class DataFetcher:
     """The Sacred Scroll of Market Data"""
-    def __init__(self, config: DataConfig):
+    def __init__(self, config: DataConfig, source: Optional[MarketDataSource] = None):
         self.config = config
+        # Any registered backend (or a custom stand-in) can supply the raw bars
+        self.source = source or get_source(config)
+        # Raw bars are served from disk/memory when caching is enabled, one cache per source
+        self.cache = None
+        if config.cache_dir and self.source.name != "replay":
+            self.cache = OHLCVCache(Path(config.cache_dir) / (self.source.name or "custom"), config.memory_cache_symbols)
 
-        # # Initialize Alpha Vantage TimeSeries client if needed
-        # if config.api_source == "alphavantage" and config.api_key:
-        #     self.ts = TimeSeries(key=config.api_key)
-        # elif config.api_source == "alphavantage" and not config.api_key:
-        #     raise ValueError("API Key is required for Alpha Vantage!")
-
-    def fetch_data(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
-        """Fetch data for a given symbol and date range."""
-        # Fetch data based on API source
-        if self.config.api_source == "yahoo":
-            df = yf.download(symbol, start=start_date, end=end_date)
-            print(f"Downloaded for {symbol}: shape={df.shape}, columns={df.columns}")
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = [col[0] for col in df.columns]
-        elif self.config.api_source == "alphavantage":
-            data, _ = self.ts.get_daily(symbol=symbol, outputsize="full")
-            df = pd.DataFrame(data).loc[start_date:end_date]
-            df.columns = [col.split('.')[1].strip() for col in df.columns]  # Clean column names
+    def fetch_raw(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """Raw daily bars for a symbol, indexed by date."""
+        # Only the date ranges missing from the local cache go upstream
+        if self.cache is not None:
+            df = self.cache.get(symbol, start_date, end_date, self.source.fetch)
         else:
-            raise ValueError(f"Invalid API source: {self.config.api_source}. Fix your config!")
-
-        # Reset index for cleaner data
-        df.reset_index(inplace=True)
+            df = self.source.fetch(symbol, start_date, end_date)
 
         # Validate that base features are present
         missing_features = set(self.config.base_features) - set(df.columns)
         if missing_features:
             raise ValueError(f"Fetched data is missing required base features: {missing_features}")
+        return df
 
-        # Add derived features
-        if "daily_return" in self.config.derived_features:
-            df['daily_return'] = df['Close'].pct_change()
-         
-        if "volatility" in self.config.derived_features:
-            df['volatility'] = df['daily_return'].rolling(window=5).std()
-
-        # Add technical indicators dynamically
-        if self.config.technical_indicators.get("RSI", False):
-            df['RSI'] = TechnicalIndicators.calculate_rsi(df)
-        if self.config.technical_indicators.get("MACD", False):
-            df['MACD'], df['MACD_Signal'] = TechnicalIndicators.calculate_macd(df)
-         
-        if self.config.technical_indicators.get("ATR", False):
-            df['ATR'] = TechnicalIndicators.calculate_atr(df)
-
-        # Filter active features
-        active_features = self.config.get_active_features
-        df = df[active_features]
-
+    def fetch_data(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """Fetch data for a given symbol and date range."""
+        df = self.fetch_raw(symbol, start_date, end_date)
+        df = self._add_features(df)
         logger.info(f"Fetched data for {symbol}: {len(df)} rows, {len(df.columns)} columns.")
-        return df
\ No newline at end of file
+        return df
+
+    def _add_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Feature frames keep the bar dates as their index, so callers can tell
+        # which session the latest row belongs to
+        # Derived features and indicators come from the planner, which only
+        # computes the active features and shares intermediates between them
+        return FeaturePlanner.for_config(self.config).compute_frame(df).astype(self.config.dtype)
+
+    def fetch_many(self, symbols: List[str], start_date: str, end_date: str,
+                   max_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        """Fetch several symbols concurrently and compute their features.
+
+        The result is the same {symbol: DataFrame} mapping that
+        DataPreprocessor.preprocess_multiple consumes, in the order given.
+        """
+        raw = self.fetch_many_raw(symbols, start_date, end_date, max_workers)
+        return self.add_features_many(raw, max_workers)
+
+    def fetch_many_raw(self, symbols: List[str], start_date: str, end_date: str,
+                       max_workers: Optional[int] = None,
+                       return_exceptions: bool = False) -> Dict[str, Union[pd.DataFrame, Exception]]:
+        """Raw bars for several symbols, downloaded (or read from cache) on a bounded thread pool.
+
+        With ``return_exceptions`` a symbol that fails maps to its exception instead
+        of failing the whole call.
+        """
+        if not symbols:
+            return {}
+        workers = min(max_workers or self.config.fetch_workers, len(symbols))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as pool:
+            futures = {
+                symbol: pool.submit(self.fetch_raw, symbol, start_date, end_date)
+                for symbol in symbols
+            }
+            if not return_exceptions:
+                return {symbol: future.result() for symbol, future in futures.items()}
+            return {symbol: future.exception() or future.result() for symbol, future in futures.items()}
+
+    def add_features_many(self, raw: Dict[str, pd.DataFrame],
+                          max_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        """Feature frames for several symbols' raw bars.
+
+        With DataConfig.vectorized_indicators the whole universe is computed at once
+        on stacked arrays, otherwise symbol by symbol on a thread pool.
+        """
+        if not raw:
+            return {}
+        if self.config.vectorized_indicators:
+            frames = FeaturePlanner.for_config(self.config).compute_universe(raw)
+            return {symbol: df.astype(self.config.dtype) for symbol, df in frames.items()}
+
+        workers = min(max_workers or self.config.fetch_workers, len(raw))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="features") as pool:
+            futures = {symbol: pool.submit(self._add_features, df) for symbol, df in raw.items()}
+            return {symbol: future.result() for symbol, future in futures.items()}
+
+    def lazy_frames(self, symbols: List[str], start_date: str, end_date: str) -> Mapping[str, pd.DataFrame]:
+        """A read-only mapping that fetches each symbol only when it is accessed."""
+        return _LazyFrames(self, symbols, start_date, end_date)
+
+
+class _LazyFrames(Mapping):
+    """Keeps no frames around - each lookup goes through fetch_data (and its cache)"""
+
+    def __init__(self, fetcher: DataFetcher, symbols: List[str], start_date: str, end_date: str):
+        self.fetcher = fetcher
+        self.symbols = list(symbols)
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def __getitem__(self, symbol: str) -> pd.DataFrame:
+        if symbol not in self.symbols:
+            raise KeyError(symbol)
+        return self.fetcher.fetch_data(symbol, self.start_date, self.end_date)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.symbols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
@@ -1,8 +1,15 @@
+import logging
 import pandas as pd
 import numpy as np
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Mapping, Optional
 from sklearn.preprocessing import MinMaxScaler
 from .stock_config import DataConfig
+from .feature_planner import FeaturePlanner
+from .sequence_windows import SequenceWindows, SymbolSeries
+from .feature_store import FeatureStore
+
+logger = logging.getLogger(__name__)
+
 
 class TechnicalIndicators:
     """The Ancient Arts of Technical Analysis"""
@@ -33,10 +40,19 @@ class TechnicalIndicators:
         true_range = np.maximum.reduce([high_low, high_close, low_close])
         return pd.Series(true_range).rolling(window=window).mean()
     @staticmethod
-    def calculate_all(df: pd.DataFrame) -> pd.DataFrame:
-        df['RSI'] = TechnicalIndicators.calculate_rsi(df)
-        df['MACD'], df['MACD_Signal'] = TechnicalIndicators.calculate_macd(df)
-        df['ATR'] = TechnicalIndicators.calculate_atr(df)
+    def calculate_all(df: pd.DataFrame, features: Optional[List[str]] = None) -> pd.DataFrame:
+        """Add indicator columns. With ``features``, only the missing ones are computed."""
+        if features is None:
+            df['RSI'] = TechnicalIndicators.calculate_rsi(df)
+            df['MACD'], df['MACD_Signal'] = TechnicalIndicators.calculate_macd(df)
+            df['ATR'] = TechnicalIndicators.calculate_atr(df)
+            return df
+
+        missing = [name for name in features if name not in df.columns]
+        if missing:
+            computed = FeaturePlanner(missing, available=df.columns).compute_frame(df)
+            for name in missing:
+                df[name] = computed[name].to_numpy()
         return df
 
 
@@ -49,11 +65,19 @@ class DataPreprocessor:
     def _process_single_stock(self, stock_data: pd.DataFrame) -> pd.DataFrame:
         return stock_data
     
-    def preprocess_multiple(self, stock_data: Dict[str, pd.DataFrame]) -> Tuple[Dict[str, np.ndarray], np.ndarray, MinMaxScaler, MinMaxScaler]:
-        """Process multiple stocks together"""
+    def preprocess_multiple(self, stock_data: Dict[str, pd.DataFrame], lazy: bool = False,
+                            holdout_rows: int = 0):
+        """Process multiple stocks together
+
+        Returns ``((X_dict, y), feature_scaler, target_scaler)``. With ``lazy=True``
+        the first element is a SequenceWindows of strided views instead, and
+        nothing is copied into dense window tensors. ``holdout_rows`` keeps each
+        symbol's latest rows out of the scaler fit (they are still scaled and
+        windowed), so a backtest never peeks at future price ranges.
+        """
         combined_features = []
         combined_targets = []
-        stock_ids = []
+        symbols = []
         
         feature_names = self.config.get_active_features
         
@@ -62,21 +86,17 @@ class DataPreprocessor:
             df = self._process_single_stock(df)
             df = df.dropna() 
             
-            # Get stock identifier
-            stock_id = self.config.stock_identifier_mapping[symbol]
-            stock_ids.extend([stock_id] * len(df))
-            
             # Store features and targets
-            features = df[feature_names].values
-            targets = df[['High', 'Low', 'Close']].values
+            features = df[feature_names].to_numpy(dtype=self.config.dtype)
+            targets = df[['High', 'Low', 'Close']].to_numpy(dtype=self.config.dtype)
             
             combined_features.append(features)
             combined_targets.append(targets)
+            symbols.append(symbol)
         
         # Combine all data
         X_np = np.concatenate(combined_features, axis=0)
         y = np.concatenate(combined_targets, axis=0)
-        stock_ids = np.array(stock_ids)
 
         X = pd.DataFrame(X_np, columns=feature_names)
 
@@ -86,8 +106,18 @@ class DataPreprocessor:
             raise ValueError("NaN or Inf detected in targets before scaling.")
 
         # Fit scalers
-        self.feature_scaler.fit(X)
-        self.target_scaler.fit(y)
+        if holdout_rows:
+            bounds = np.cumsum([0] + [len(f) for f in combined_features])
+            fit_mask = np.zeros(len(X_np), dtype=bool)
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                fit_mask[lo:max(hi - holdout_rows, lo)] = True
+            if not fit_mask.any():
+                raise ValueError(f"holdout_rows={holdout_rows} leaves no rows to fit the scalers on.")
+            self.feature_scaler.fit(X[fit_mask])
+            self.target_scaler.fit(y[fit_mask])
+        else:
+            self.feature_scaler.fit(X)
+            self.target_scaler.fit(y)
         # Scale features and targets
         X_scaled = self.feature_scaler.transform(X)
         y_scaled = self.target_scaler.transform(y)
@@ -96,20 +126,114 @@ class DataPreprocessor:
         print("X_scaled min:", X_scaled.min(), "max:", X_scaled.max())
         print("y_scaled min:", y_scaled.min(), "max:", y_scaled.max())
  
-        # Create sequences with stock IDs
-        return self._create_sequences_with_ids(X_scaled, y_scaled, stock_ids), self.feature_scaler, self.target_scaler
+        # Create sequences with stock IDs, one symbol at a time
+        lengths = [len(f) for f in combined_features]
+        windows = self._build_windows(symbols, X_scaled, y_scaled, lengths)
+        report = windows.memory_report()
+        logger.info(f"Windows: {report['windows']}, source {report['source_bytes'] / 1e6:.1f} MB, "
+                    f"dense {report['materialized_bytes'] / 1e6:.1f} MB, saved {report['saved_bytes'] / 1e6:.1f} MB")
 
-    def _create_sequences_with_ids(self, features: np.ndarray, 
-                                 targets: np.ndarray, 
-                                 stock_ids: np.ndarray) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
-        X, y, ids = [], [], []
-        
-        for i in range(self.config.time_steps, len(features)):
-            X.append(features[i - self.config.time_steps:i])
-            y.append(targets[i])
-            ids.append(stock_ids[i])
-            
-        return {
-            'price_input': np.array(X),
-            'stock_input': np.array(ids)
-        }, np.array(y)
\ No newline at end of file
+        if lazy:
+            return windows, self.feature_scaler, self.target_scaler
+        return windows.materialize(), self.feature_scaler, self.target_scaler
+
+    def preprocess_to_store(self, stock_data: Mapping[str, pd.DataFrame], store: FeatureStore):
+        """Out-of-core variant of preprocess_multiple that never holds more than one symbol.
+
+        Each symbol is loaded once: its unscaled arrays are written to the store
+        while the scalers fit incrementally with partial_fit, then the stored
+        arrays are rescaled on disk, chunk by chunk. ``stock_data`` may be a lazy
+        mapping (e.g. DataFetcher.lazy_frames) that loads a frame on access.
+        Returns ``(windows, feature_scaler, target_scaler)`` with windows reading
+        from the store.
+        """
+        feature_names = self.config.get_active_features
+        self.feature_scaler = MinMaxScaler()
+        self.target_scaler = MinMaxScaler()
+
+        entries = {}
+        for symbol in stock_data:
+            features, targets = self._symbol_arrays(stock_data[symbol], feature_names)
+            self.feature_scaler.partial_fit(features)
+            self.target_scaler.partial_fit(targets)
+            store.write_symbol(symbol, features, targets)
+            entries[symbol] = {
+                "stock_id": self.config.stock_identifier_mapping[symbol],
+                "rows": len(features),
+            }
+
+        # The scaler ranges are only final once every symbol was seen
+        for symbol in entries:
+            store.rewrite_symbol(
+                symbol,
+                lambda X: np.clip(self.feature_scaler.transform(X), 0, 1),
+                lambda y: np.clip(self.target_scaler.transform(y), 0, 1),
+            )
+
+        store.write_manifest({
+            "feature_names": feature_names,
+            "time_steps": self.config.time_steps,
+            "dtype": str(store.dtype),
+            "feature_scaler": {
+                "data_min": self.feature_scaler.data_min_.tolist(),
+                "data_max": self.feature_scaler.data_max_.tolist(),
+            },
+            "target_scaler": {
+                "data_min": self.target_scaler.data_min_.tolist(),
+                "data_max": self.target_scaler.data_max_.tolist(),
+            },
+            "symbols": entries,
+        })
+
+        windows = store.open_windows(list(entries))
+        report = windows.memory_report()
+        logger.info(f"Windows: {report['windows']} memory-mapped from {store.root}, "
+                    f"dense copy would be {report['materialized_bytes'] / 1e6:.1f} MB")
+        return windows, self.feature_scaler, self.target_scaler
+
+    def transform_multiple(self, stock_data: Mapping[str, pd.DataFrame],
+                           feature_scaler: MinMaxScaler, target_scaler: MinMaxScaler) -> SequenceWindows:
+        """Scale and window new data with scalers fit by an earlier training run (no refit)."""
+        self.feature_scaler = feature_scaler
+        self.target_scaler = target_scaler
+        feature_names = self.config.get_active_features
+
+        symbols, features, targets, lengths = [], [], [], []
+        for symbol in stock_data:
+            X, y = self._symbol_arrays(stock_data[symbol], feature_names)
+            features.append(np.clip(feature_scaler.transform(X), 0, 1).astype(self.config.dtype, copy=False))
+            targets.append(np.clip(target_scaler.transform(y), 0, 1).astype(self.config.dtype, copy=False))
+            symbols.append(symbol)
+            lengths.append(len(X))
+        if not symbols:
+            raise ValueError("No stock data to transform.")
+        return self._build_windows(symbols, np.concatenate(features), np.concatenate(targets), lengths)
+
+    def _symbol_arrays(self, df: pd.DataFrame, feature_names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        # Plain arrays: the store rescales chunks of them, and sklearn warns when a
+        # scaler fit on a DataFrame is later handed an array (or the other way round)
+        df = self._process_single_stock(df).dropna()
+        features = df[feature_names].to_numpy(dtype=self.config.dtype)
+        targets = df[['High', 'Low', 'Close']].to_numpy(dtype=self.config.dtype)
+        if not np.isfinite(features).all():
+            raise ValueError("NaN or Inf detected in features before scaling.")
+        if not np.isfinite(targets).all():
+            raise ValueError("NaN or Inf detected in targets before scaling.")
+        return features, targets
+
+    def _build_windows(self, symbols: List[str], features: np.ndarray,
+                       targets: np.ndarray, lengths: List[int]) -> SequenceWindows:
+        """Split the scaled rows back per symbol so no window crosses into the next ticker."""
+        series = []
+        bounds = np.cumsum([0] + lengths)
+        for symbol, lo, hi in zip(symbols, bounds[:-1], bounds[1:]):
+            n = hi - lo
+            series.append(SymbolSeries(
+                symbol=symbol,
+                stock_id=self.config.stock_identifier_mapping[symbol],
+                features=features[lo:hi],
+                targets=targets[lo:hi],
+                start=min(self.config.time_steps, n),
+                stop=n,
+            ))
+        return SequenceWindows(series, self.config.time_steps)
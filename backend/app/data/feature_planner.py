@@ -0,0 +1,225 @@
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .stock_config import DataConfig
+from .vectorized_indicators import (
+    shift, pct_change, rolling_mean, rolling_std, ewm_mean, stack_universe
+)
+
+logger = logging.getLogger(__name__)
+
+RAW_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    name: str
+    deps: Tuple[str, ...]
+    compute: Callable[..., np.ndarray]
+    public: bool = True
+
+
+_REGISTRY: Dict[str, FeatureSpec] = {}
+
+
+def register_feature(name: str, deps: Iterable[str] = (), public: bool = True):
+    """Register a recipe computing ``name`` from its dependency arrays.
+
+    Recipes receive their dependencies positionally as (symbols x days) arrays
+    and return an array of the same shape. Names starting with "_" are shared
+    intermediates that never end up as columns.
+    """
+    def decorator(fn: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+        _REGISTRY[name] = FeatureSpec(name, tuple(deps), fn, public)
+        return fn
+    return decorator
+
+
+def registered_features() -> List[str]:
+    return sorted(name for name, spec in _REGISTRY.items() if spec.public)
+
+
+# --- Shared intermediates -------------------------------------------------
+
+@register_feature("_prev_close", deps=("Close",), public=False)
+def _prev_close(close):
+    return shift(close)
+
+
+@register_feature("_close_diff", deps=("Close", "_prev_close"), public=False)
+def _close_diff(close, prev_close):
+    return close - prev_close
+
+
+@register_feature("_ema12", deps=("Close",), public=False)
+def _ema12(close):
+    return ewm_mean(close, 12)
+
+
+@register_feature("_ema26", deps=("Close",), public=False)
+def _ema26(close):
+    return ewm_mean(close, 26)
+
+
+@register_feature("_bb_mid", deps=("Close",), public=False)
+def _bb_mid(close):
+    return rolling_mean(close, 20)
+
+
+@register_feature("_bb_std", deps=("Close",), public=False)
+def _bb_std(close):
+    return rolling_std(close, 20)
+
+
+@register_feature("_return_20", deps=("Close",), public=False)
+def _return_20(close):
+    return pct_change(close, 20)
+
+
+# --- Columns --------------------------------------------------------------
+
+@register_feature("daily_return", deps=("Close", "_prev_close"))
+def _daily_return(close, prev_close):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return close / prev_close - 1
+
+
+@register_feature("volatility", deps=("daily_return",))
+def _volatility(daily_return):
+    return rolling_std(daily_return, 5)
+
+
+@register_feature("RSI", deps=("Close", "_close_diff"))
+def _rsi(close, delta, window: int = 14):
+    # A missing delta counts as zero gain/loss on real bars, like Series.where
+    gain = np.where(np.isnan(close), np.nan, np.where(delta > 0, delta, 0.0))
+    loss = np.where(np.isnan(close), np.nan, np.where(delta < 0, -delta, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = rolling_mean(gain, window) / rolling_mean(loss, window)
+        return 100 - (100 / (1 + rs))
+
+
+@register_feature("MACD", deps=("_ema12", "_ema26"))
+def _macd(ema12, ema26):
+    return ema12 - ema26
+
+
+@register_feature("MACD_Signal", deps=("MACD",))
+def _macd_signal(macd):
+    return ewm_mean(macd, 9)
+
+
+@register_feature("ATR", deps=("High", "Low", "_prev_close"))
+def _atr(high, low, prev_close, window: int = 14):
+    true_range = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    return rolling_mean(true_range, window)
+
+
+@register_feature("BBANDS", deps=("Close", "_bb_mid", "_bb_std"))
+def _bbands(close, mid, std):
+    # %B: where the close sits inside the 20-day, 2-sigma Bollinger Bands
+    lower = mid - 2 * std
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (close - lower) / (4 * std)
+
+
+@register_feature("BB_Width", deps=("_bb_mid", "_bb_std"))
+def _bb_width(mid, std):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (4 * std) / mid
+
+
+@register_feature("OBV", deps=("Close", "Volume", "_close_diff"))
+def _obv(close, volume, delta):
+    signed = np.sign(np.nan_to_num(delta)) * volume
+    missing = np.isnan(close)
+    signed[missing] = 0.0
+    obv = np.cumsum(signed, axis=1)
+    obv[missing] = np.nan
+    return obv
+
+
+@register_feature("tech_momentum", deps=("_return_20",))
+def _tech_momentum(return_20):
+    return rolling_mean(return_20, 5)
+
+
+class FeaturePlanner:
+    """The Battle Plan - resolve what to compute before computing anything
+
+    Walks the dependency graph of the requested features and produces an ordered
+    list of steps. Intermediates such as the previous close, close diff, EWMs and
+    rolling std are computed once and shared; features nobody asked for are never
+    touched. Columns already present in the input are reused, not recomputed.
+    """
+
+    def __init__(self, features: List[str], available: Iterable[str] = RAW_COLUMNS):
+        self.features = list(dict.fromkeys(features))
+        self.available = set(available)
+        self.steps: List[FeatureSpec] = []
+        self._resolve()
+
+    @classmethod
+    def for_config(cls, config: DataConfig, symbol: Optional[str] = None,
+                   available: Iterable[str] = RAW_COLUMNS) -> "FeaturePlanner":
+        features = config.get_symbol_active_features(symbol) if symbol else config.get_active_features
+        return cls(features, available)
+
+    def _resolve(self) -> None:
+        done = set(self.available)
+        visiting = set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Feature dependency cycle at '{name}'")
+            spec = _REGISTRY.get(name)
+            if spec is None:
+                raise ValueError(f"No recipe registered for feature '{name}'. Add one with register_feature.")
+            visiting.add(name)
+            for dep in spec.deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            self.steps.append(spec)
+
+        for name in self.features:
+            visit(name)
+
+    def compute(self, arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Run the plan over (symbols x days) arrays; returns every requested feature."""
+        values = dict(arrays)
+        for spec in self.steps:
+            values[spec.name] = spec.compute(*(values[dep] for dep in spec.deps))
+        return {name: values[name] for name in self.features}
+
+    def compute_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Single-symbol path: raw (or partially featured) frame in, feature frame out."""
+        inputs = {name: df[name].to_numpy(dtype=float)[None, :] for name in self.available if name in df.columns}
+        computed = self.compute(inputs)
+        out = pd.DataFrame(index=df.index)
+        for name in self.features:
+            out[name] = df[name].to_numpy() if name in df.columns else computed[name][0]
+        return out
+
+    def compute_universe(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """Raw per-symbol bars in, per-symbol feature frames out, computed on one stacked grid."""
+        if not frames:
+            return {}
+        inputs = [name for name in RAW_COLUMNS if name in self.available]
+        arrays, lengths = stack_universe(frames, inputs)
+        computed = self.compute(arrays)
+
+        width = arrays["Close"].shape[1]
+        result = {}
+        for row, (symbol, n) in enumerate(zip(frames, lengths)):
+            result[symbol] = pd.DataFrame(
+                {name: computed[name][row, width - n:] for name in self.features},
+                columns=self.features,
+                index=frames[symbol].index,
+            )
+        logger.info(f"Computed {len(self.features)} features for {len(frames)} symbols on a {len(frames)}x{width} grid.")
+        return result
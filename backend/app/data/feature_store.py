@@ -0,0 +1,90 @@
+import json
+import os
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from .sequence_windows import SequenceWindows, SymbolSeries
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureStore:
+    """Gate of Babylon - every symbol's scaled matrices, summoned from disk on demand
+
+    Layout under ``root``::
+
+        manifest.json              feature names, time_steps, scaler ranges, symbols
+        <SYMBOL>/features.npy      (rows, n_features) scaled
+        <SYMBOL>/targets.npy       (rows, 3) scaled
+
+    Arrays are opened with ``mmap_mode='r'``, so windows are read straight from
+    the page cache and only the rows a batch touches are ever loaded.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, root: Path, dtype: str = "float32"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dtype = np.dtype(dtype)
+
+    def write_symbol(self, symbol: str, features: np.ndarray, targets: np.ndarray) -> None:
+        symbol_dir = self.root / symbol
+        symbol_dir.mkdir(parents=True, exist_ok=True)
+        self._save(symbol_dir / "features.npy", features)
+        self._save(symbol_dir / "targets.npy", targets)
+
+    def rewrite_symbol(self, symbol: str, features_fn: Callable[[np.ndarray], np.ndarray],
+                       targets_fn: Callable[[np.ndarray], np.ndarray], chunk_rows: int = 65536) -> None:
+        """Replace a symbol's arrays with ``fn(rows)``, a chunk at a time, never loading a whole array."""
+        for name, fn in (("features.npy", features_fn), ("targets.npy", targets_fn)):
+            path = self.root / symbol / name
+            source = np.load(path, mmap_mode="r")
+            tmp_path = path.with_suffix(".npy.tmp")
+            out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=source.shape)
+            for lo in range(0, len(source), chunk_rows):
+                out[lo:lo + chunk_rows] = fn(np.asarray(source[lo:lo + chunk_rows]))
+            out.flush()
+            del out, source
+            os.replace(tmp_path, path)
+
+    def write_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = self.root / (self.MANIFEST + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.root / self.MANIFEST)
+
+    def manifest(self) -> Dict[str, Any]:
+        path = self.root / self.MANIFEST
+        if not path.exists():
+            raise ValueError(f"No feature store manifest at {path}. Run preprocess_to_store first.")
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def open_windows(self, symbols: Optional[List[str]] = None) -> SequenceWindows:
+        """SequenceWindows backed by read-only memory maps."""
+        manifest = self.manifest()
+        time_steps = manifest["time_steps"]
+        entries = manifest["symbols"]
+        series = []
+        for symbol in symbols or list(entries):
+            features = np.load(self.root / symbol / "features.npy", mmap_mode="r")
+            targets = np.load(self.root / symbol / "targets.npy", mmap_mode="r")
+            n = len(features)
+            series.append(SymbolSeries(
+                symbol=symbol,
+                stock_id=entries[symbol]["stock_id"],
+                features=features,
+                targets=targets,
+                start=min(time_steps, n),
+                stop=n,
+            ))
+        return SequenceWindows(series, time_steps)
+
+    def _save(self, path: Path, array: np.ndarray) -> None:
+        # Write-then-rename so readers never map a half-written file
+        tmp_path = path.with_suffix(".npy.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(array, dtype=self.dtype))
+        os.replace(tmp_path, path)
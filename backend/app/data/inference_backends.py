@@ -0,0 +1,136 @@
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Preference order for runtime="auto"; keras is the always-available fallback
+SLIM_RUNTIMES = ("tflite", "onnx")
+
+
+def _tflite_interpreter():
+    """The smallest TFLite interpreter that is installed, full TensorFlow last."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+def runtime_available(runtime: str) -> bool:
+    """Whether the runtime's package can be imported, without importing TensorFlow for it."""
+    import importlib.util
+    if runtime == "tflite":
+        return any(importlib.util.find_spec(name) is not None for name in ("ai_edge_litert", "tflite_runtime"))
+    if runtime == "onnx":
+        return importlib.util.find_spec("onnxruntime") is not None
+    return runtime == "keras"
+
+
+def _fit_inputs(inputs: Dict[str, np.ndarray], expected: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Cast and reshape to what the exported graph declares (stock_input is float (n, 1) there)."""
+    fitted = {}
+    for name, (dtype, rank) in expected.items():
+        # Exporters sometimes decorate the names (serving_default_price_input:0, ...)
+        key = name if name in inputs else next(k for k in inputs if k in name)
+        value = np.asarray(inputs[key])
+        if value.ndim < rank:
+            value = value.reshape(value.shape + (1,) * (rank - value.ndim))
+        fitted[name] = value.astype(dtype, copy=False)
+    return fitted
+
+
+class TFLiteBackend:
+    """Keras-shaped ``predict`` over a TFLite signature runner.
+
+    The interpreter is not thread-safe, so calls are serialized; the runner
+    resizes its inputs whenever the batch size changes.
+    """
+    runtime = "tflite"
+
+    def __init__(self, path: Path, num_threads: Optional[int] = None):
+        interpreter = _tflite_interpreter()(model_path=str(path), num_threads=num_threads)
+        self._runner = interpreter.get_signature_runner()
+        self._expected = {
+            name: (detail["dtype"], len(detail["shape_signature"]))
+            for name, detail in self._runner.get_input_details().items()
+        }
+        self._lock = threading.Lock()
+
+    def predict(self, inputs: Dict[str, np.ndarray], batch_size: Optional[int] = None, verbose: int = 0) -> np.ndarray:
+        fitted = _fit_inputs(inputs, self._expected)
+        with self._lock:
+            outputs = self._runner(**fitted)
+        return next(iter(outputs.values()))
+
+
+class ONNXBackend:
+    """Keras-shaped ``predict`` over an onnxruntime session (thread-safe on its own)."""
+    runtime = "onnx"
+
+    _DTYPES = {"tensor(float)": np.float32, "tensor(double)": np.float64,
+               "tensor(int32)": np.int32, "tensor(int64)": np.int64}
+
+    def __init__(self, path: Path, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(str(path), sess_options=options, providers=["CPUExecutionProvider"])
+        self._expected = {i.name: (self._DTYPES[i.type], len(i.shape)) for i in self._session.get_inputs()}
+
+    def predict(self, inputs: Dict[str, np.ndarray], batch_size: Optional[int] = None, verbose: int = 0) -> np.ndarray:
+        return self._session.run(None, _fit_inputs(inputs, self._expected))[0]
+
+
+class KerasFastPath:
+    """Keras-shaped ``predict`` that skips Model.predict's per-call machinery.
+
+    ``Model.predict`` builds a data adapter, a callback list and a progress bar on
+    every call, which dominates the cost of one window. This traces the model's
+    forward pass once into a ``tf.function`` with the model's own input
+    signature (batch dimension left open, so any batch reuses the same graph)
+    and calls it directly. Outputs match ``predict``; batches above
+    ``max_direct_batch`` still go through ``predict`` so they are chunked.
+    Anything else (``save``, ``count_params``, ...) is forwarded to the model.
+    """
+    runtime = "keras"
+
+    def __init__(self, model, jit_compile: Optional[bool] = None, max_direct_batch: int = 256):
+        import tensorflow as tf
+
+        self.model = model
+        self.max_direct_batch = max_direct_batch
+        self._names = [t.name for t in model.inputs]
+        signature = [tf.TensorSpec(t.shape, t.dtype, name=t.name) for t in model.inputs]
+        self._shapes = {t.name: (np.dtype(t.dtype), tuple(t.shape[1:])) for t in model.inputs}
+
+        def forward(*tensors):
+            return model(dict(zip(self._names, tensors)), training=False)
+
+        self._forward = tf.function(forward, input_signature=signature, jit_compile=bool(jit_compile))
+
+    def predict(self, inputs: Dict[str, np.ndarray], batch_size: Optional[int] = None, verbose: int = 0) -> np.ndarray:
+        if len(inputs[self._names[0]]) > self.max_direct_batch:
+            return self.model.predict(inputs, batch_size=batch_size, verbose=verbose)
+        tensors = []
+        for name in self._names:
+            dtype, shape = self._shapes[name]
+            tensors.append(np.asarray(inputs[name]).reshape((-1,) + shape).astype(dtype, copy=False))
+        return self._forward(*tensors).numpy()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+BACKENDS = {"tflite": TFLiteBackend, "onnx": ONNXBackend}
@@ -0,0 +1,51 @@
+from datetime import time as dtime
+from typing import Optional
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr, USMemorialDay,
+    USPresidentsDay, USThanksgivingDay, nearest_workday,
+)
+from pandas.tseries.offsets import CustomBusinessDay
+
+MARKET_TZ = "America/New_York"
+MARKET_CLOSE = dtime(16, 0)
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    """Full-day NYSE closures (early closes are treated as normal sessions)."""
+    rules = [
+        Holiday("New Year's Day", month=1, day=1, observance=nearest_workday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("Independence Day", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas Day", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+SESSION = CustomBusinessDay(calendar=NYSEHolidayCalendar())
+
+
+def last_closed_session(now: Optional[pd.Timestamp] = None, settle_minutes: int = 30) -> pd.Timestamp:
+    """Date of the most recent session whose daily bar is final at ``now``.
+
+    A bar counts as final ``settle_minutes`` after the 16:00 ET close, which
+    gives the data vendors time to publish it.
+    """
+    now = pd.Timestamp.now(tz=MARKET_TZ) if now is None else pd.Timestamp(now).tz_convert(MARKET_TZ)
+    today = now.normalize().tz_localize(None)
+    settled = now.tz_localize(None) >= today + pd.Timedelta(hours=MARKET_CLOSE.hour, minutes=settle_minutes)
+    if SESSION.is_on_offset(today) and settled:
+        return today
+    return SESSION.rollback(today - pd.Timedelta(days=1))
+
+
+def next_session_close(session: pd.Timestamp, settle_minutes: int = 30) -> pd.Timestamp:
+    """When the bar of the session after ``session`` becomes final (tz-aware, ET)."""
+    following = SESSION.rollforward(pd.Timestamp(session) + pd.Timedelta(days=1))
+    close = following + pd.Timedelta(hours=MARKET_CLOSE.hour, minutes=settle_minutes)
+    return close.tz_localize(MARKET_TZ)
@@ -0,0 +1,163 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Type
+import pandas as pd
+from .stock_config import DataConfig
+
+logger = logging.getLogger(__name__)
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class MarketDataSource(ABC):
+    """The Summoning Contract - anything that can hand over daily bars
+
+    A source returns raw OHLCV bars for the half-open range [start_date, end_date),
+    indexed by date. Caching and indicator math live in DataFetcher, so a new
+    vendor only has to implement ``fetch``.
+    """
+    name: str = ""
+
+    def __init__(self, config: DataConfig):
+        self.config = config
+
+    @abstractmethod
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        ...
+
+    @staticmethod
+    def _slice(df: pd.DataFrame, start_date: str, end_date: str) -> pd.DataFrame:
+        df = df.sort_index()
+        mask = (df.index >= pd.Timestamp(start_date)) & (df.index < pd.Timestamp(end_date))
+        return df.loc[mask]
+
+
+_SOURCES: Dict[str, Type[MarketDataSource]] = {}
+
+
+def register_source(name: str) -> Callable[[Type[MarketDataSource]], Type[MarketDataSource]]:
+    """Class decorator adding a backend under ``DataConfig.api_source == name``."""
+    def decorator(cls: Type[MarketDataSource]) -> Type[MarketDataSource]:
+        cls.name = name
+        _SOURCES[name] = cls
+        return cls
+    return decorator
+
+
+def available_sources() -> Iterable[str]:
+    return sorted(_SOURCES)
+
+
+def get_source(config: DataConfig) -> MarketDataSource:
+    try:
+        source_cls = _SOURCES[config.api_source]
+    except KeyError:
+        raise ValueError(
+            f"Invalid API source: {config.api_source}. Fix your config! "
+            f"Known sources: {', '.join(available_sources())}"
+        )
+    return source_cls(config)
+
+
+@register_source("yahoo")
+class YahooSource(MarketDataSource):
+    """Yahoo Finance via yfinance"""
+
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        import yfinance as yf
+
+        # Ticker.history keeps its own state; yf.download shares a module-level
+        # result dict and is not safe to call from several threads at once
+        df = yf.Ticker(symbol).history(start=start_date, end=end_date, auto_adjust=True)
+        df = df[[col for col in df.columns if col in OHLCV_COLUMNS]]
+        logger.info(f"Downloaded for {symbol}: shape={df.shape}, columns={list(df.columns)}")
+        return df
+
+
+@register_source("alphavantage")
+class AlphaVantageSource(MarketDataSource):
+    """Alpha Vantage daily series (requires DataConfig.api_key)"""
+
+    def __init__(self, config: DataConfig):
+        super().__init__(config)
+        if not config.api_key:
+            raise ValueError("API Key is required for Alpha Vantage!")
+        self._ts = None
+
+    @property
+    def ts(self):
+        if self._ts is None:
+            from alpha_vantage.timeseries import TimeSeries
+            self._ts = TimeSeries(key=self.config.api_key, output_format="pandas")
+        return self._ts
+
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        data, _ = self.ts.get_daily(symbol=symbol, outputsize="full")
+        data.index = pd.to_datetime(data.index)
+        data.index.name = "Date"
+        data.columns = [col.split('.')[1].strip().title() for col in data.columns]  # "1. open" -> "Open"
+        return self._slice(data, start_date, end_date)
+
+
+@register_source("replay")
+class ReplaySource(MarketDataSource):
+    """Offline fixtures - reads ``<replay_dir>/<SYMBOL>.parquet`` or ``.csv``
+
+    Files are read once and kept in memory, so repeated fetches run at memory
+    speed and never touch the network. Handy for load tests and benchmarks.
+    """
+
+    def __init__(self, config: DataConfig, replay_dir: Optional[Path] = None):
+        super().__init__(config)
+        replay_dir = replay_dir or config.replay_dir
+        if not replay_dir:
+            raise ValueError("Replay source needs DataConfig.replay_dir (or MARKET_DATA_REPLAY_DIR).")
+        self.replay_dir = Path(replay_dir)
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, symbol: str, start_date: str, end_date: str) -> pd.DataFrame:
+        return self._slice(self._frame(symbol), start_date, end_date).copy()
+
+    def _frame(self, symbol: str) -> pd.DataFrame:
+        with self._lock:
+            if symbol not in self._frames:
+                self._frames[symbol] = self._read(symbol)
+            return self._frames[symbol]
+
+    def _read(self, symbol: str) -> pd.DataFrame:
+        parquet_path = self.replay_dir / f"{symbol}.parquet"
+        csv_path = self.replay_dir / f"{symbol}.csv"
+        if parquet_path.exists():
+            df = pd.read_parquet(parquet_path)
+        elif csv_path.exists():
+            df = pd.read_csv(csv_path)
+        else:
+            raise ValueError(f"No replay fixture for {symbol} in {self.replay_dir}")
+
+        if "Date" in df.columns:
+            df = df.set_index("Date")
+        df.index = _naive_dates(pd.to_datetime(df.index))
+        return df.sort_index()
+
+
+def _naive_dates(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """Drop the timezone, keeping the local session date, so it compares with plain dates."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.rename("Date")
+
+
+def record_fixtures(source: MarketDataSource, symbols: Iterable[str],
+                    start_date: str, end_date: str, replay_dir: Path) -> None:
+    """Snapshot a live source into Parquet fixtures the replay source can serve."""
+    replay_dir = Path(replay_dir)
+    replay_dir.mkdir(parents=True, exist_ok=True)
+    for symbol in symbols:
+        df = source.fetch(symbol, start_date, end_date)
+        # Yahoo's index is tz-aware (exchange time); _slice compares with naive dates
+        df.index = _naive_dates(pd.to_datetime(df.index))
+        df.to_parquet(replay_dir / f"{symbol}.parquet")
+        logger.info(f"Recorded {len(df)} bars for {symbol} to {replay_dir}")
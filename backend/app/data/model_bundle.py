@@ -0,0 +1,310 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+from .inference_backends import BACKENDS, SLIM_RUNTIMES, KerasFastPath, runtime_available
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+MODEL_FILE = "model.keras"
+SCALERS_FILE = "scalers.npz"
+MANIFEST_FILE = "bundle.json"
+CURRENT_FILE = "CURRENT"
+
+
+@dataclass
+class ScalerParams:
+    """A fitted MinMaxScaler as plain arrays: ``scaled = X * scale + min``."""
+    scale: np.ndarray
+    min: np.ndarray
+    data_min: np.ndarray
+    data_max: np.ndarray
+
+    @classmethod
+    def from_scaler(cls, scaler: MinMaxScaler) -> "ScalerParams":
+        return cls(
+            scale=np.asarray(scaler.scale_, dtype=np.float64),
+            min=np.asarray(scaler.min_, dtype=np.float64),
+            data_min=np.asarray(scaler.data_min_, dtype=np.float64),
+            data_max=np.asarray(scaler.data_max_, dtype=np.float64),
+        )
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return X * self.scale.astype(X.dtype, copy=False) + self.min.astype(X.dtype, copy=False)
+
+    def inverse_transform(self, X: np.ndarray) -> np.ndarray:
+        n = X.shape[-1]
+        return (X - self.min[:n]) / self.scale[:n]
+
+    def to_scaler(self) -> MinMaxScaler:
+        """Rebuild the sklearn scaler for code paths (training, fine-tuning) that want one."""
+        scaler = MinMaxScaler()
+        scaler.data_min_ = self.data_min
+        scaler.data_max_ = self.data_max
+        scaler.data_range_ = self.data_max - self.data_min
+        scaler.scale_ = self.scale
+        scaler.min_ = self.min
+        scaler.n_features_in_ = len(self.scale)
+        scaler.n_samples_seen_ = 1
+        return scaler
+
+
+@dataclass
+class ModelBundle:
+    """Everything needed to serve a model, in one directory
+
+    ``model.keras``, the scaler parameters as arrays in ``scalers.npz`` and
+    ``bundle.json`` with the ordered feature list, time_steps, symbol mapping,
+    the exclusive training cutoff and free-form metadata (start date, parent
+    version, metrics, ...). Nothing is pickled and nothing is guessed at load time.
+    """
+    model: Any
+    feature_scaler: ScalerParams
+    target_scaler: ScalerParams
+    feature_names: List[str]
+    time_steps: int
+    stock_identifier_mapping: Dict[str, int]
+    cutoff: str
+    version: Optional[int] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # Exported slim-runtime copies of the model, one per runtime and quantization:
+    # {"tflite": {...}, "tflite_int8": {"runtime", "file", "quantization", "parity", ...}}
+    runtimes: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Which runtime ``model`` is: "keras", or a data.inference_backends backend with the same predict()
+    runtime: str = "keras"
+
+    @classmethod
+    def from_training(cls, model, feature_scaler: MinMaxScaler, target_scaler: MinMaxScaler,
+                      feature_names: List[str], time_steps: int, stock_identifier_mapping: Dict[str, int],
+                      cutoff: str, **metadata: Any) -> "ModelBundle":
+        return cls(
+            model=model,
+            feature_scaler=ScalerParams.from_scaler(feature_scaler),
+            target_scaler=ScalerParams.from_scaler(target_scaler),
+            feature_names=list(feature_names),
+            time_steps=int(time_steps),
+            stock_identifier_mapping=dict(stock_identifier_mapping),
+            cutoff=str(cutoff),
+            metadata=metadata,
+        )
+
+    def manifest(self) -> Dict[str, Any]:
+        return {
+            "format": BUNDLE_FORMAT,
+            "version": self.version,
+            "feature_names": self.feature_names,
+            "time_steps": self.time_steps,
+            "stock_identifier_mapping": self.stock_identifier_mapping,
+            "cutoff": self.cutoff,
+            "metadata": self.metadata,
+            "runtimes": self.runtimes,
+        }
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.model.save(directory / MODEL_FILE)
+        np.savez(
+            directory / SCALERS_FILE,
+            **{f"feature_{k}": v for k, v in vars(self.feature_scaler).items()},
+            **{f"target_{k}": v for k, v in vars(self.target_scaler).items()},
+        )
+        with open(directory / MANIFEST_FILE, "w") as f:
+            json.dump(self.manifest(), f, indent=2, default=str)
+
+    @classmethod
+    def load(cls, directory: Path, compile: bool = True, runtime: str = "keras") -> "ModelBundle":
+        """Load a bundle. ``runtime`` is "keras", an export name ("tflite", "onnx",
+        "tflite_float16", "tflite_int8", "onnx_int8") or "auto" (the first
+        full-precision export whose package is installed, else keras). Only the
+        keras runtime imports TensorFlow."""
+        directory = Path(directory)
+        with open(directory / MANIFEST_FILE) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported bundle format {manifest.get('format')} in {directory}.")
+
+        runtimes = manifest.get("runtimes", {})
+        if runtime == "auto":
+            # Only full-precision exports are picked automatically; a quantized one is
+            # served only when asked for by name ("tflite_int8", "onnx_int8", ...)
+            runtime = next((name for name in SLIM_RUNTIMES
+                            if name in runtimes and runtime_available(runtimes[name].get("runtime", name))), "keras")
+        if runtime == "keras":
+            import tensorflow as tf
+            model = tf.keras.models.load_model(directory / MODEL_FILE, compile=compile)
+        elif runtime in runtimes:
+            info = runtimes[runtime]
+            model = BACKENDS[info.get("runtime", runtime)](directory / info["file"])
+        else:
+            raise FileNotFoundError(f"Model v{manifest['version']} has no {runtime} export - run modal.export first.")
+        with np.load(directory / SCALERS_FILE) as arrays:
+            params = {key: arrays[key] for key in arrays.files}
+        names = ("scale", "min", "data_min", "data_max")
+        return cls(
+            model=model,
+            feature_scaler=ScalerParams(**{k: params[f"feature_{k}"] for k in names}),
+            target_scaler=ScalerParams(**{k: params[f"target_{k}"] for k in names}),
+            feature_names=manifest["feature_names"],
+            time_steps=manifest["time_steps"],
+            stock_identifier_mapping=manifest["stock_identifier_mapping"],
+            cutoff=manifest["cutoff"],
+            version=manifest["version"],
+            metadata=manifest.get("metadata", {}),
+            runtimes=runtimes,
+            runtime=runtime,
+        )
+
+
+class ModelRegistry:
+    """Hall of Records - numbered bundle directories plus a CURRENT pointer
+
+    ``publish`` writes a bundle into a temporary directory, renames it to
+    ``v0007`` and only then rewrites ``CURRENT``, both with atomic renames, so
+    a reader sees either the old version or the complete new one.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _dirname(version: int) -> str:
+        return f"v{version:04d}"
+
+    def versions(self) -> List[int]:
+        return sorted(int(p.name[1:]) for p in self.root.glob("v[0-9][0-9][0-9][0-9]") if p.is_dir())
+
+    def current_version(self) -> Optional[int]:
+        path = self.root / CURRENT_FILE
+        if not path.exists():
+            return None
+        return int(path.read_text().strip())
+
+    def path(self, version: int) -> Path:
+        return self.root / self._dirname(version)
+
+    def manifest(self, version: Optional[int] = None) -> Dict[str, Any]:
+        version = self._resolve(version)
+        with open(self.path(version) / MANIFEST_FILE) as f:
+            return json.load(f)
+
+    def load(self, version: Optional[int] = None, compile: bool = True, runtime: str = "keras") -> ModelBundle:
+        return ModelBundle.load(self.path(self._resolve(version)), compile=compile, runtime=runtime)
+
+    def record_runtime(self, version: int, name: str, info: Dict[str, Any]) -> None:
+        """Add an export to a published bundle's manifest under ``name`` (atomic rewrite).
+        Names are per runtime and quantization, so exports don't replace each other."""
+        manifest = self.manifest(version)
+        manifest.setdefault("runtimes", {})[name] = info
+        path = self.path(version) / MANIFEST_FILE
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    def _resolve(self, version: Optional[int]) -> int:
+        version = self.current_version() if version is None else version
+        if version is None:
+            raise FileNotFoundError(f"No model published in {self.root} yet - run the training pipeline first.")
+        return version
+
+    def publish(self, bundle: ModelBundle, activate: bool = True) -> int:
+        existing = self.versions()
+        bundle.version = (existing[-1] + 1) if existing else 1
+        bundle.metadata.setdefault("created_at", datetime.now().isoformat())
+
+        tmp_dir = self.root / f".{self._dirname(bundle.version)}.tmp-{os.getpid()}"
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        bundle.save(tmp_dir)
+        os.replace(tmp_dir, self.path(bundle.version))
+        if activate:
+            self.activate(bundle.version)
+        logger.info(f"Published model v{bundle.version} to {self.path(bundle.version)}")
+        return bundle.version
+
+    def activate(self, version: int) -> None:
+        """Point CURRENT at ``version`` (also how you roll back)."""
+        if not (self.path(version) / MANIFEST_FILE).exists():
+            raise FileNotFoundError(f"Model v{version} is not in {self.root}.")
+        tmp_path = self.root / (CURRENT_FILE + ".tmp")
+        tmp_path.write_text(str(version))
+        os.replace(tmp_path, self.root / CURRENT_FILE)
+
+
+class HotBundle:
+    """Byakugan on the registry - swaps in new versions while requests keep flowing
+
+    ``current`` is a plain attribute read, so a request grabs one consistent
+    bundle and keeps it for its whole lifetime. New versions are loaded and warmed
+    up on a background thread and swapped in with a single reference assignment;
+    the old bundle stays valid for requests already holding it.
+    """
+
+    def __init__(self, registry: ModelRegistry, poll_seconds: float = 30.0, runtime: str = "keras",
+                 fast_path: bool = True):
+        self.registry = registry
+        self.poll_seconds = poll_seconds
+        self.runtime = runtime
+        # Keras bundles are served through KerasFastPath instead of Model.predict
+        self.fast_path = fast_path
+        self.current: ModelBundle = self._load(registry.current_version())
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load(self, version: Optional[int]) -> ModelBundle:
+        bundle = self.registry.load(version, compile=False, runtime=self.runtime)
+        if self.fast_path and bundle.runtime == "keras":
+            bundle.model = KerasFastPath(bundle.model)
+        # One forward pass traces predict, so the first real request doesn't pay for it
+        n_features = len(bundle.feature_names)
+        bundle.model.predict({
+            'price_input': np.zeros((1, bundle.time_steps, n_features), dtype=np.float32),
+            'stock_input': np.zeros((1, 1), dtype=np.int32),
+        }, verbose=0)
+        return bundle
+
+    def reload_if_changed(self) -> bool:
+        """Load and swap in CURRENT if it moved. Concurrent callers don't load twice."""
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            version = self.registry.current_version()
+            if version is None or version == self.current.version:
+                return False
+            bundle = self._load(version)
+            previous, self.current = self.current.version, bundle
+            logger.info(f"Hot-swapped model v{previous} -> v{bundle.version}")
+            return True
+        except Exception as e:
+            logger.error(f"Keeping v{self.current.version}, failed to load the new version: {e}")
+            return False
+        finally:
+            self._lock.release()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-reload", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds)
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            self.reload_if_changed()
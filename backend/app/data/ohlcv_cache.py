@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import logging
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+import pandas as pd
+from .market_calendar import SESSION
+
+logger = logging.getLogger(__name__)
+
+# A loader takes (symbol, start_date, end_date) and returns raw daily bars indexed by date
+BarLoader = Callable[[str, str, str], pd.DataFrame]
+
+
+class OHLCVCache:
+    """The Great Library of Ohara, but for candlesticks
+
+    Raw daily bars live on disk as one Parquet file per symbol, next to a small
+    JSON sidecar recording the half-open date range ``[start, end)`` that has
+    already been downloaded. A request only goes upstream for the head/tail gaps
+    outside that range. A bounded LRU of recently used symbols sits in front of
+    the disk layer so the hot path never touches the filesystem.
+    """
+
+    def __init__(self, cache_dir: Path, max_memory_symbols: int = 32):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_symbols = max_memory_symbols
+        self._memory: "OrderedDict[str, Tuple[pd.DataFrame, Tuple[str, str]]]" = OrderedDict()
+        # _lock guards the LRU; per-symbol locks let different symbols download in parallel
+        self._lock = threading.RLock()
+        self._symbol_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, symbol: str, start_date: str, end_date: str, loader: BarLoader) -> pd.DataFrame:
+        """Return bars for ``[start_date, end_date)``, downloading only what is missing."""
+        start_date, end_date = _as_date_str(start_date), _as_date_str(end_date)
+        with self._symbol_lock(symbol):
+            frame, coverage = self._load(symbol)
+            frame, coverage = self._fill_gaps(symbol, frame, coverage, start_date, end_date, loader)
+            self._remember(symbol, frame, coverage)
+
+        if frame is None:
+            return pd.DataFrame()
+        mask = (frame.index >= pd.Timestamp(start_date)) & (frame.index < pd.Timestamp(end_date))
+        return frame.loc[mask].copy()
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """Forget a symbol (or everything) both in memory and on disk."""
+        with self._lock:
+            symbols = [symbol] if symbol else [p.stem for p in self.cache_dir.glob("*.parquet")]
+            for sym in symbols:
+                self._memory.pop(sym, None)
+                for path in (self._data_path(sym), self._meta_path(sym)):
+                    if path.exists():
+                        path.unlink()
+            if symbol is None:
+                self._memory.clear()
+
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        with self._lock:
+            return self._symbol_locks.setdefault(symbol, threading.Lock())
+
+    def _fill_gaps(self, symbol: str, frame: Optional[pd.DataFrame], coverage: Optional[Tuple[str, str]],
+                   start_date: str, end_date: str, loader: BarLoader):
+        # Today's bar may still be forming, so coverage never extends past today
+        today = date.today().isoformat()
+        if coverage is None:
+            gaps = [(start_date, end_date)]
+        else:
+            covered_start, covered_end = coverage
+            gaps = []
+            if start_date < covered_start:
+                gaps.append((start_date, covered_start))
+            if end_date > covered_end:
+                gaps.append((covered_end, end_date))
+
+        gaps = [(s, e) for s, e in gaps if s < e]
+        if not gaps:
+            return frame, coverage
+
+        pieces = [] if frame is None else [frame]
+        new_start = start_date if coverage is None else min(start_date, coverage[0])
+        new_end = None if coverage is None else coverage[1]
+        for gap_start, gap_end in gaps:
+            logger.info(f"Cache miss for {symbol}: fetching {gap_start} -> {gap_end}")
+            fetched = loader(symbol, gap_start, gap_end)
+            got_bars = fetched is not None and not fetched.empty
+            if got_bars:
+                fetched = _normalize(fetched)
+                pieces.append(fetched)
+            if gap_end == end_date:
+                # The tail is covered up to the first session with no bar: weekends and
+                # holidays count as covered, a bar the vendor hasn't published yet doesn't
+                after = fetched.index.max() + pd.Timedelta(days=1) if got_bars else pd.Timestamp(gap_start)
+                through = min(SESSION.rollforward(after).strftime("%Y-%m-%d"), gap_end)
+                if through > gap_start:
+                    new_end = max(new_end or through, through)
+
+        if pieces:
+            merged = pd.concat(pieces)
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+        else:
+            merged = frame
+
+        if new_end is None:
+            # Nothing cached before and nothing came back
+            return merged, coverage
+        new_coverage = (new_start, min(new_end, today))
+        if new_coverage[0] < new_coverage[1] and merged is not None:
+            self._persist(symbol, merged, new_coverage)
+        else:
+            new_coverage = coverage
+        return merged, new_coverage
+
+    def _load(self, symbol: str):
+        with self._lock:
+            if symbol in self._memory:
+                self._memory.move_to_end(symbol)
+                return self._memory[symbol]
+
+        data_path, meta_path = self._data_path(symbol), self._meta_path(symbol)
+        if not (data_path.exists() and meta_path.exists()):
+            return None, None
+        try:
+            frame = pd.read_parquet(data_path)
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            return frame, (meta["start"], meta["end"])
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache for {symbol}: {e}")
+            return None, None
+
+    def _remember(self, symbol: str, frame: Optional[pd.DataFrame], coverage: Optional[Tuple[str, str]]) -> None:
+        if frame is None or coverage is None:
+            return
+        with self._lock:
+            self._memory[symbol] = (frame, coverage)
+            self._memory.move_to_end(symbol)
+            while len(self._memory) > self.max_memory_symbols:
+                self._memory.popitem(last=False)
+
+    def _persist(self, symbol: str, frame: pd.DataFrame, coverage: Tuple[str, str]) -> None:
+        # Write-then-rename so a crash never leaves a half-written file behind
+        data_path, meta_path = self._data_path(symbol), self._meta_path(symbol)
+        tmp_data = data_path.with_suffix(".parquet.tmp")
+        tmp_meta = meta_path.with_suffix(".json.tmp")
+        frame.to_parquet(tmp_data)
+        with open(tmp_meta, "w") as f:
+            json.dump({"start": coverage[0], "end": coverage[1], "rows": len(frame)}, f)
+        os.replace(tmp_data, data_path)
+        os.replace(tmp_meta, meta_path)
+
+    def _data_path(self, symbol: str) -> Path:
+        return self.cache_dir / f"{symbol}.parquet"
+
+    def _meta_path(self, symbol: str) -> Path:
+        return self.cache_dir / f"{symbol}.json"
+
+
+def _as_date_str(value) -> str:
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.index)).tz_localize(None).normalize()
+    df.index.name = "Date"
+    return df
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+@dataclass
+class SymbolSeries:
+    """One symbol's scaled rows plus the target rows that get a window."""
+    symbol: str
+    stock_id: int
+    features: np.ndarray  # (rows, n_features)
+    targets: np.ndarray   # (rows, 3)
+    start: int            # first target row with a full window behind it
+    stop: int             # exclusive
+
+    def __len__(self) -> int:
+        return max(self.stop - self.start, 0)
+
+
+class SequenceWindows:
+    """Infinite Tsukuyomi for training windows - they only exist when you look
+
+    Window ``i`` of a symbol is ``features[i - time_steps:i]`` with target
+    ``targets[i]``. Windows are strided views over each symbol's own rows, so
+    none of them spans two tickers and nothing is copied until ``materialize``
+    or ``take`` is called.
+    """
+
+    def __init__(self, series: List[SymbolSeries], time_steps: int):
+        self.series = [s for s in series if len(s) > 0]
+        self.time_steps = time_steps
+        self._offsets = np.cumsum([0] + [len(s) for s in self.series])
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    @property
+    def n_features(self) -> int:
+        return self.series[0].features.shape[1] if self.series else 0
+
+    def symbol_views(self) -> Iterator[Tuple[SymbolSeries, np.ndarray, np.ndarray]]:
+        """Yield (series, X view (n, time_steps, F), y view (n, 3)) without copying."""
+        T = self.time_steps
+        for s in self.series:
+            # sliding_window_view puts the window axis last: (rows - T + 1, F, T)
+            windows = sliding_window_view(s.features, T, axis=0).transpose(0, 2, 1)
+            yield s, windows[s.start - T:s.stop - T], s.targets[s.start:s.stop]
+
+    def materialize(self) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Copy every window into the dense arrays model.fit expects."""
+        X, y, ids = [], [], []
+        for s, X_view, y_view in self.symbol_views():
+            X.append(X_view)
+            y.append(y_view)
+            ids.append(np.full(len(s), s.stock_id))
+        if not X:
+            raise ValueError("No windows to materialize - every symbol is shorter than time_steps.")
+        return {
+            'price_input': np.concatenate(X),
+            'stock_input': np.concatenate(ids)
+        }, np.concatenate(y)
+
+    def locate(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Map global window indices to (series index, target row)."""
+        indices = np.asarray(indices)
+        series_idx = np.searchsorted(self._offsets, indices, side='right') - 1
+        starts = np.array([s.start for s in self.series])
+        rows = indices - self._offsets[series_idx] + starts[series_idx]
+        return series_idx, rows
+
+    def take(self, indices: np.ndarray) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Materialize only the requested windows (e.g. one training batch)."""
+        series_idx, rows = self.locate(indices)
+        T = self.time_steps
+        X = np.empty((len(rows), T, self.n_features), dtype=self.series[0].features.dtype)
+        y = np.empty((len(rows), self.series[0].targets.shape[1]), dtype=self.series[0].targets.dtype)
+        ids = np.empty(len(rows), dtype=np.int64)
+        for si in np.unique(series_idx):
+            mask = series_idx == si
+            s = self.series[si]
+            picked = rows[mask]
+            X[mask] = s.features[picked[:, None] + np.arange(-T, 0)]
+            y[mask] = s.targets[picked]
+            ids[mask] = s.stock_id
+        return {'price_input': X, 'stock_input': ids}, y
+
+    def split(self, train_split: float, val_split: float) -> Tuple["SequenceWindows", "SequenceWindows", "SequenceWindows"]:
+        """Chronological train/val/test split applied to every symbol on its own.
+
+        Each symbol contributes its earliest windows to train, the next ones to
+        val and the latest ones to test, so no split ever sees a later date of the
+        same ticker than the split after it. The three results share the source rows.
+        """
+        parts: Tuple[List[SymbolSeries], List[SymbolSeries], List[SymbolSeries]] = ([], [], [])
+        for s in self.series:
+            n_train = int(len(s) * train_split)
+            n_val = int(len(s) * val_split)
+            cuts = [s.start, s.start + n_train, s.start + n_train + n_val, s.stop]
+            for part, lo, hi in zip(parts, cuts[:-1], cuts[1:]):
+                part.append(SymbolSeries(s.symbol, s.stock_id, s.features, s.targets, lo, hi))
+        return tuple(SequenceWindows(part, self.time_steps) for part in parts)
+
+    def memory_report(self) -> Dict[str, int]:
+        """Bytes held by the source rows vs. what a dense materialization would take."""
+        source = sum(s.features.nbytes + s.targets.nbytes for s in self.series)
+        if not self.series:
+            return {'windows': 0, 'source_bytes': 0, 'materialized_bytes': 0, 'saved_bytes': 0}
+        f_item = self.series[0].features.itemsize
+        t_item = self.series[0].targets.itemsize
+        n = len(self)
+        dense = (n * self.time_steps * self.n_features * f_item
+                 + n * self.series[0].targets.shape[1] * t_item
+                 + n * np.dtype(np.int64).itemsize)
+        return {'windows': n, 'source_bytes': source, 'materialized_bytes': dense, 'saved_bytes': dense - source}
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+import pandas as pd
+from .stock_config import DataConfig
+from .sequence_windows import SequenceWindows, SymbolSeries
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "features", "scale", "window")
+
+
+def fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable short hash of a JSON-able payload (key order does not matter)."""
+    blob = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def stage_keys(config: DataConfig, symbols: List[str], start_date: str, end_date: str) -> Dict[str, str]:
+    """Chain of stage fingerprints; each stage folds in the key of the one before it,
+    so only the fields a stage actually depends on invalidate it."""
+    keys = {}
+    keys["fetch"] = fingerprint({
+        "stage": "fetch",
+        "api_source": config.api_source,
+        "replay_dir": config.replay_dir,
+        "symbols": list(symbols),
+        "start": start_date,
+        "end": end_date,
+        "base_features": config.base_features,
+    })
+    keys["features"] = fingerprint({
+        "stage": "features",
+        "parent": keys["fetch"],
+        "derived_features": config.derived_features,
+        "technical_indicators": config.technical_indicators,
+        "dtype": config.dtype,
+    })
+    keys["scale"] = fingerprint({
+        "stage": "scale",
+        "parent": keys["features"],
+        "features": config.get_active_features,
+        "stock_identifier_mapping": config.stock_identifier_mapping,
+        "time_steps": config.time_steps,
+    })
+    keys["window"] = fingerprint({
+        "stage": "window",
+        "parent": keys["scale"],
+        "train_split": config.train_split,
+        "val_split": config.val_split,
+    })
+    return keys
+
+
+class StageCache:
+    """Save points for the pipeline - reload the run right before the boss fight
+
+    Each stage output lives in ``<root>/<stage>/<key>/`` and only counts once its
+    ``_COMPLETE`` marker exists, so an interrupted run is simply a miss next time.
+    ``report`` records whether each stage was a hit, a miss or skipped because a
+    later stage was already cached.
+    """
+
+    MARKER = "_COMPLETE"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.report: Dict[str, str] = {}
+
+    def path(self, stage: str, key: str) -> Path:
+        return self.root / stage / key
+
+    def has(self, stage: str, key: str) -> bool:
+        return (self.path(stage, key) / self.MARKER).exists()
+
+    def begin(self, stage: str, key: str) -> Path:
+        """Fresh directory for a stage that is about to be (re)computed."""
+        path = self.path(stage, key)
+        if path.exists():
+            shutil.rmtree(path)
+        path.mkdir(parents=True)
+        return path
+
+    def commit(self, stage: str, key: str) -> None:
+        (self.path(stage, key) / self.MARKER).touch()
+
+    def mark(self, stage: str, status: str) -> None:
+        self.report[stage] = status
+        logger.info(f"Stage '{stage}': {status}")
+
+    # --- per-symbol frames (fetch / features) ---------------------------------
+
+    def save_frames(self, stage: str, key: str, frames: Dict[str, pd.DataFrame]) -> None:
+        path = self.begin(stage, key)
+        for symbol, df in frames.items():
+            self.save_frame(path, symbol, df)
+        self.finish_frames(stage, key, list(frames))
+
+    def save_frame(self, path: Path, symbol: str, df: pd.DataFrame) -> None:
+        """One symbol's frame into a stage directory from ``begin``; finish_frames commits it."""
+        df.to_parquet(path / f"{symbol}.parquet")
+
+    def finish_frames(self, stage: str, key: str, symbols: List[str]) -> None:
+        with open(self.path(stage, key) / "symbols.json", "w") as f:
+            json.dump(list(symbols), f)
+        self.commit(stage, key)
+
+    def load_frames(self, stage: str, key: str) -> Dict[str, pd.DataFrame]:
+        return dict(self.lazy_frames(stage, key))
+
+    def lazy_frames(self, stage: str, key: str) -> Mapping[str, pd.DataFrame]:
+        """The stage's frames as a mapping that reads each one only when it is accessed."""
+        path = self.path(stage, key)
+        with open(path / "symbols.json", "r") as f:
+            symbols = json.load(f)
+        return _StoredFrames(path, symbols)
+
+    # --- scalers (scale) --------------------------------------------------------
+
+    def save_scalers(self, key: str, feature_scaler, target_scaler) -> None:
+        with open(self.path("scale", key) / "scalers.pkl", "wb") as f:
+            pickle.dump((feature_scaler, target_scaler), f)
+        self.commit("scale", key)
+
+    def load_scalers(self, key: str):
+        with open(self.path("scale", key) / "scalers.pkl", "rb") as f:
+            return pickle.load(f)
+
+    # --- split bounds (window) --------------------------------------------------
+
+    def save_splits(self, key: str, splits: Tuple[SequenceWindows, ...]) -> None:
+        path = self.begin("window", key)
+        bounds = [{s.symbol: [s.start, s.stop] for s in split.series} for split in splits]
+        tmp_path = path / "splits.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(bounds, f)
+        os.replace(tmp_path, path / "splits.json")
+        self.commit("window", key)
+
+    def load_splits(self, key: str, windows: SequenceWindows) -> Tuple[SequenceWindows, ...]:
+        with open(self.path("window", key) / "splits.json", "r") as f:
+            bounds = json.load(f)
+        by_symbol = {s.symbol: s for s in windows.series}
+        splits = []
+        for split_bounds in bounds:
+            series = [
+                SymbolSeries(sym, by_symbol[sym].stock_id, by_symbol[sym].features,
+                             by_symbol[sym].targets, start, stop)
+                for sym, (start, stop) in split_bounds.items()
+            ]
+            splits.append(SequenceWindows(series, windows.time_steps))
+        return tuple(splits)
+
+
+class _StoredFrames(Mapping):
+    """A stage's per-symbol Parquet files, read on access and never kept around"""
+
+    def __init__(self, path: Path, symbols: List[str]):
+        self.path = path
+        self.symbols = list(symbols)
+
+    def __getitem__(self, symbol: str) -> pd.DataFrame:
+        if symbol not in self.symbols:
+            raise KeyError(symbol)
+        return pd.read_parquet(self.path / f"{symbol}.parquet")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.symbols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
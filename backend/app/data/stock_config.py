@@ -1,5 +1,6 @@
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Literal
+import os
+from typing import Dict, List, Optional, Literal, Union
 from pathlib import Path
 from datetime import datetime
 import logging
@@ -34,12 +35,30 @@ class StockMetadata:
 @dataclass
 class DataConfig:
     # Base Configuration - As immutable as Saitama's training routine
-    api_source: str = "yahoo"
+    api_source: str = field(default_factory=lambda: os.getenv("MARKET_DATA_SOURCE", "yahoo"))
     api_key: Optional[str] = None
+    # Fixture directory for the offline "replay" source
+    replay_dir: Optional[str] = field(default_factory=lambda: os.getenv("MARKET_DATA_REPLAY_DIR"))
     time_steps: int = 30
     train_split: float = field(default=0.8)
     val_split: float = field(default=0.1)
     batch_size: int = 32
+    # Raw OHLCV cache - set cache_dir to None to always hit the API
+    cache_dir: Optional[str] = "data/raw"
+    memory_cache_symbols: int = 32
+    # Upper bound on concurrent downloads in DataFetcher.fetch_many
+    fetch_workers: int = 8
+    # Compute indicators for the whole universe on stacked arrays in fetch_many
+    vectorized_indicators: bool = True
+    # Write scaled per-symbol matrices to a memory-mapped store under Config.base_path
+    # and train from it, instead of holding every symbol in RAM
+    out_of_core: bool = False
+    # Persist fetch/features/scale/window outputs under Config.base_path/stages and
+    # reuse them while the relevant config fields are unchanged
+    stage_cache: bool = True
+    # Numeric dtype for features, targets, windows and inference inputs.
+    # Keras computes in float32 anyway, so float64 only doubles memory traffic.
+    dtype: str = "float32"
      # Add multi-stock training config
     enable_multi_stock: bool = True
     # Embedding Configuration
@@ -119,6 +138,15 @@ class DataConfig:
         if self.batch_size <= 0:
             raise ValueError("Negative batch size? Are you trying to train backwards in time?")
 
+        if self.memory_cache_symbols <= 0:
+            raise ValueError("memory_cache_symbols must be positive. Even Goldfish remember one thing.")
+
+        if self.dtype not in ("float32", "float64"):
+            raise ValueError(f"dtype must be float32 or float64, not {self.dtype}. This isn't a quantization contest.")
+
+        if self.fetch_workers <= 0:
+            raise ValueError("fetch_workers must be positive. Somebody has to go get the data.")
+
     def get_symbol_active_features(self, symbol: str) -> List[str]:
         """Get features like you're assembling the Infinity Gauntlet"""
         metadata = self.stock_metadata[symbol]
@@ -165,6 +193,40 @@ class ModelConfig:
     l1_regularizer: float = 1e-5
     l2_regularizer: float = 1e-4
     batch_size: int = 32
+    # Stream windows through tf.data instead of materializing them all up front
+    streaming_input: bool = True
+    shuffle_buffer: int = 10000
+    # Save model/optimizer/callback state here every checkpoint_every epochs and
+    # resume from it if a run is interrupted. None disables checkpointing.
+    checkpoint_dir: Optional[str] = None
+    checkpoint_every: int = 1
+    # Per-epoch telemetry.json/csv (wall time, samples/s, input vs compute, peak RSS)
+    telemetry_dir: Optional[str] = None
+    # CPU performance profile - benchmark the options with modal.benchmark.
+    # jit_compile is passed to model.compile, so it covers fit and predict ("auto" = Keras decides).
+    jit_compile: Union[bool, str] = "auto"
+    # Thread pool sizes, 0 = TensorFlow's default. Applied by modal.runtime.configure_runtime,
+    # which has to run before TensorFlow is imported, hence set per run through the environment
+    intra_op_threads: int = field(default_factory=lambda: int(os.getenv("MODEL_INTRA_OP_THREADS", "0")))
+    inter_op_threads: int = field(default_factory=lambda: int(os.getenv("MODEL_INTER_OP_THREADS", "0")))
+    # TF_ENABLE_ONEDNN_OPTS (MODEL_ONEDNN=1/0); None leaves the environment alone. Only takes
+    # effect if set before TensorFlow is imported (the benchmark runs each variant in a fresh process)
+    onednn: Optional[bool] = field(default_factory=lambda: (
+        os.environ["MODEL_ONEDNN"] == "1" if os.getenv("MODEL_ONEDNN") else None
+    ))
+    # "loop" runs the LSTM/GRU as a symbolic while loop, "unrolled" unrolls the
+    # time_steps into one static graph that XLA can fuse into a few CPU kernels
+    lstm_implementation: Literal["loop", "unrolled"] = "loop"
+    # Backbone behind price_input: "lstm" (stacked LSTM + BatchNorm), "gru" (same
+    # stack with GRU cells), "tcn" (dilated causal Conv1D) or "attention" (one small
+    # self-attention block). lstm_units/dropout_rates size the recurrent ones;
+    # tcn and attention use the first dropout rate.
+    architecture: Literal["lstm", "gru", "tcn", "attention"] = "lstm"
+    conv_filters: int = 32
+    conv_kernel_size: int = 3
+    conv_dilations: list = field(default_factory=lambda: [1, 2, 4, 8])
+    attention_heads: int = 2
+    attention_key_dim: int = 16
 
     def __post_init__(self):
         if self.patience >= self.epochs:
@@ -173,6 +235,18 @@ class ModelConfig:
             raise ValueError("reduce_lr_factor must be between 0 and 1.")
         if len(self.lstm_units) != len(self.dropout_rates):
             raise ValueError("lstm_units and dropout_rates lengths must match.")
+        if self.checkpoint_every < 1:
+            raise ValueError("checkpoint_every must be at least 1.")
+        if self.jit_compile not in (True, False, "auto"):
+            raise ValueError("jit_compile must be True, False or 'auto'.")
+        if self.intra_op_threads < 0 or self.inter_op_threads < 0:
+            raise ValueError("Thread counts can't be negative. 0 means let TensorFlow pick.")
+        if self.lstm_implementation not in ("loop", "unrolled"):
+            raise ValueError(f"lstm_implementation must be 'loop' or 'unrolled', not {self.lstm_implementation}.")
+        if self.architecture not in ("lstm", "gru", "tcn", "attention"):
+            raise ValueError(f"Unknown architecture {self.architecture}. Pick lstm, gru, tcn or attention.")
+        if self.architecture == "tcn" and (not self.conv_dilations or self.conv_filters < 1):
+            raise ValueError("tcn needs at least one dilation and a positive conv_filters.")
 
 
 @dataclass
@@ -181,8 +255,45 @@ class Config:
     model: ModelConfig = field(default_factory=ModelConfig)
     base_path: Path = field(default_factory=lambda: Path("data/processed"))
     model_path: Path = field(default_factory=lambda: Path("models/saved"))
+    # Versioned model bundles (see data.model_bundle). Defaults to <model_path>/registry
+    registry_path: Optional[Path] = field(default_factory=lambda: (
+        Path(os.environ["MODEL_REGISTRY_DIR"]) if os.getenv("MODEL_REGISTRY_DIR") else None
+    ))
+    # Runtime the serving side loads bundles with: "auto" (default) prefers a
+    # full-precision TFLite/ONNX export when its package is installed, "keras" always
+    # loads TensorFlow, and an export name ("tflite_int8", ...) opts in to a quantized
+    # copy. Re-check an export with python -m modal.export --verify
+    inference_runtime: str = field(default_factory=lambda: os.getenv("MODEL_RUNTIME", "auto"))
+    # Micro-batching of concurrent /predict calls (api.batching): a batch closes at
+    # this many requests or after this many ms since its first request
+    predict_batch_max_size: int = field(default_factory=lambda: int(os.getenv("PREDICT_BATCH_MAX_SIZE", "32")))
+    predict_batch_wait_ms: float = field(default_factory=lambda: float(os.getenv("PREDICT_BATCH_WAIT_MS", "3")))
+    # Served predictions are cached until the next session's bar closes (api.prediction_cache).
+    # With a path, worker processes on the machine share hits through that SQLite file
+    prediction_cache_size: int = field(default_factory=lambda: int(os.getenv("PREDICTION_CACHE_SIZE", "1024")))
+    prediction_cache_path: Optional[Path] = field(default_factory=lambda: (
+        Path(os.environ["PREDICTION_CACHE_PATH"]) if os.getenv("PREDICTION_CACHE_PATH") else None
+    ))
+    # Refresh every symbol's forecast into that cache after each session close
+    # (api.forecast_scheduler) inside the API process. Off by default: with several
+    # uvicorn workers run the standalone scheduler worker against a shared cache path
+    precompute_forecasts: bool = field(default_factory=lambda: os.getenv("PRECOMPUTE_FORECASTS", "0") == "1")
+    forecast_poll_seconds: float = field(default_factory=lambda: float(os.getenv("FORECAST_POLL_SECONDS", "60")))
+    # Blocking prediction work runs on this many threads (api.bounded_executor); beyond
+    # workers + queue, requests get a 503, and any prediction past the timeout a 504
+    predict_workers: int = field(default_factory=lambda: int(os.getenv("PREDICT_WORKERS", "8")))
+    predict_max_queue: int = field(default_factory=lambda: int(os.getenv("PREDICT_MAX_QUEUE", "32")))
+    predict_timeout_s: float = field(default_factory=lambda: float(os.getenv("PREDICT_TIMEOUT_S", "20")))
+    # A bulk /predict over many symbols gets its own, longer deadline
+    predict_bulk_timeout_s: float = field(default_factory=lambda: float(os.getenv("PREDICT_BULK_TIMEOUT_S", "120")))
     created_at: datetime = field(default_factory=datetime.now)
 
     def __post_init__(self):
         self.base_path.mkdir(parents=True, exist_ok=True)
         self.model_path.mkdir(parents=True, exist_ok=True)
+        if self.registry_path is None:
+            self.registry_path = self.model_path / "registry"
+        if self.inference_runtime not in ("auto", "keras") and \
+                self.inference_runtime.split("_")[0] not in ("tflite", "onnx"):
+            raise ValueError(f"inference_runtime must be auto, keras or a TFLite/ONNX export name, "
+                             f"not {self.inference_runtime}.")
@@ -0,0 +1,83 @@
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+
+# ---------------------------------------------------------------------------
+# Kernels - every function works on (symbols x days) arrays along axis 1.
+# Leading NaNs mark days before a symbol has data and never leak into results.
+# ---------------------------------------------------------------------------
+
+def shift(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    out = np.full_like(x, np.nan)
+    out[:, periods:] = x[:, :-periods]
+    return out
+
+
+def diff(x: np.ndarray) -> np.ndarray:
+    return x - shift(x)
+
+
+def pct_change(x: np.ndarray, periods: int = 1) -> np.ndarray:
+    # Same formula as pandas: x / x.shift(periods) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return x / shift(x, periods) - 1
+
+
+def _pad_left(windowed: np.ndarray, window: int) -> np.ndarray:
+    pad = np.full((windowed.shape[0], window - 1), np.nan)
+    return np.concatenate([pad, windowed], axis=1)
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    if x.shape[1] < window:
+        return np.full_like(x, np.nan)
+    return _pad_left(sliding_window_view(x, window, axis=1).mean(axis=-1), window)
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    if x.shape[1] < window:
+        return np.full_like(x, np.nan)
+    return _pad_left(sliding_window_view(x, window, axis=1).std(axis=-1, ddof=1), window)
+
+
+def ewm_mean(x: np.ndarray, span: int) -> np.ndarray:
+    """pandas ``ewm(span, adjust=False).mean()`` per row, seeded at the first valid value."""
+    alpha = 2.0 / (span + 1)
+    valid = ~np.isnan(x)
+    has_data = valid.any(axis=1)
+    first = np.where(has_data, valid.argmax(axis=1), 0)
+    seed = np.where(has_data, x[np.arange(x.shape[0]), first], 0.0)
+
+    # Back-fill the leading gap with the seed: an EWM of a constant stays constant,
+    # so the value at the first real bar is exactly the seed, as in pandas.
+    leading = np.arange(x.shape[1])[None, :] < first[:, None]
+    filled = np.where(leading, seed[:, None], x)
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], filled, axis=1, zi=((1 - alpha) * seed)[:, None])
+    out[leading | ~has_data[:, None]] = np.nan
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Universe layout
+# ---------------------------------------------------------------------------
+
+def stack_universe(frames: Dict[str, pd.DataFrame], columns: List[str]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Stack per-symbol columns into (symbols x days) arrays.
+
+    Rows are right-aligned so column -1 is every symbol's latest bar; symbols with
+    a shorter history (later listing) get leading NaNs. Returns the arrays and the
+    per-symbol row counts needed to unstack.
+    """
+    lengths = np.array([len(df) for df in frames.values()], dtype=int)
+    width = int(lengths.max()) if len(lengths) else 0
+    arrays = {}
+    for col in columns:
+        arr = np.full((len(frames), width), np.nan)
+        for row, df in enumerate(frames.values()):
+            if len(df):
+                arr[row, width - len(df):] = df[col].to_numpy(dtype=float)
+        arrays[col] = arr
+    return arrays, lengths
@@ -1,6 +1,9 @@
 import tensorflow as tf
 from keras.models import Sequential
-from keras.layers import LSTM, Dense, Dropout, BatchNormalization, Input, Embedding, Concatenate
+from keras.layers import (
+    LSTM, GRU, Dense, Dropout, BatchNormalization, Input, Embedding, Concatenate,
+    Conv1D, Add, Activation, Cropping1D, Flatten, LayerNormalization, MultiHeadAttention
+)
 from keras.regularizers import l1_l2
 import logging
 from data.stock_config import ModelConfig
@@ -28,21 +31,16 @@ class StockPredictor:
             )(stock_input)
             stock_embedding = tf.keras.layers.Flatten()(stock_embedding)
             
-            # LSTM layers for price processing
-            x = price_input
-            for i, units in enumerate(self.config.lstm_units):
-                x = LSTM(
-                    units,
-                    return_sequences=i < len(self.config.lstm_units) - 1,
-                    kernel_regularizer=l1_l2(
-                        l1=self.config.l1_regularizer,
-                        l2=self.config.l2_regularizer
-                    )
-                )(x)
-                x = BatchNormalization()(x)
-                x = Dropout(self.config.dropout_rates[i])(x)
+            # Backbone for price processing
+            backbones = {
+                "lstm": self._recurrent_backbone,
+                "gru": self._recurrent_backbone,
+                "tcn": self._tcn_backbone,
+                "attention": self._attention_backbone,
+            }
+            x = backbones[self.config.architecture](price_input)
             
-            # Combine LSTM output with stock embedding
+            # Combine backbone output with stock embedding
             combined = Concatenate()([x, stock_embedding])
             
             # Output layer
@@ -56,10 +54,69 @@ class StockPredictor:
             
             # Compile
             optimizer = tf.keras.optimizers.Adam(learning_rate=self.config.learning_rate)
-            model.compile(optimizer=optimizer, loss='huber')
+            model.compile(optimizer=optimizer, loss='huber', jit_compile=self.config.jit_compile)
             
             return model
             
         except Exception as e:
             logger.error(f"Failed to build model: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def _regularizer(self):
+        return l1_l2(l1=self.config.l1_regularizer, l2=self.config.l2_regularizer)
+
+    def _recurrent_backbone(self, x):
+        """Stacked LSTM or GRU, BatchNorm + Dropout after every layer."""
+        cell = LSTM if self.config.architecture == "lstm" else GRU
+        for i, units in enumerate(self.config.lstm_units):
+            x = cell(
+                units,
+                return_sequences=i < len(self.config.lstm_units) - 1,
+                unroll=self.config.lstm_implementation == "unrolled",
+                kernel_regularizer=self._regularizer()
+            )(x)
+            x = BatchNormalization()(x)
+            x = Dropout(self.config.dropout_rates[i])(x)
+        return x
+
+    def _tcn_backbone(self, x):
+        """Residual stack of dilated causal convolutions, read out at the last time step.
+
+        With kernel k and dilations d_i the receptive field is 1 + (k - 1) * sum(d_i),
+        31 steps for the defaults - the whole 30-step window.
+        """
+        filters = self.config.conv_filters
+        dropout = self.config.dropout_rates[0]
+        for dilation in self.config.conv_dilations:
+            residual = x if x.shape[-1] == filters else Conv1D(filters, 1)(x)
+            x = Conv1D(filters, self.config.conv_kernel_size, padding='causal', dilation_rate=dilation,
+                       activation='relu', kernel_regularizer=self._regularizer())(x)
+            x = Dropout(dropout)(x)
+            x = Activation('relu')(Add()([x, residual]))
+        return self._last_step(x)
+
+    def _attention_backbone(self, x):
+        """One pre-projected self-attention block with a feed-forward layer.
+
+        A causal convolution does the input projection, so each step already
+        carries its local order and no positional encoding layer is needed.
+        """
+        d_model = self.config.attention_heads * self.config.attention_key_dim
+        dropout = self.config.dropout_rates[0]
+        x = Conv1D(d_model, 3, padding='causal', kernel_regularizer=self._regularizer())(x)
+        attended = MultiHeadAttention(
+            num_heads=self.config.attention_heads,
+            key_dim=self.config.attention_key_dim,
+            dropout=dropout
+        )(x, x)
+        x = LayerNormalization()(Add()([x, attended]))
+        ff = Dense(d_model * 2, activation='relu', kernel_regularizer=self._regularizer())(x)
+        ff = Dense(d_model)(Dropout(dropout)(ff))
+        x = LayerNormalization()(Add()([x, ff]))
+        return self._last_step(x)
+
+    @staticmethod
+    def _last_step(x):
+        # (batch, T, C) -> (batch, C) without a Lambda, so saved models load anywhere
+        return Flatten()(Cropping1D((x.shape[1] - 1, 0))(x))
+
@@ -0,0 +1,137 @@
+import csv
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+import tensorflow as tf
+from data.stock_config import Config
+from data.sequence_windows import SequenceWindows
+from modal.architecture import StockPredictor
+from modal.model_training import ModelTrainer
+from modal.evaluation import ModelEvaluator
+from modal.benchmark import predict_latency_ms
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ComparisonConfig:
+    architectures: List[str] = field(default_factory=lambda: ["lstm", "gru", "tcn", "attention"])
+    # Per-architecture ModelConfig overrides, e.g. {"tcn": {"conv_filters": 16}}
+    overrides: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    predict_batch_sizes: List[int] = field(default_factory=lambda: [1, 256])
+    predict_repeats: int = 20
+    seed: int = 42
+    output_dir: Path = Path("results/architectures")
+
+    def __post_init__(self):
+        self.output_dir = Path(self.output_dir)
+        unknown = set(self.overrides) - set(self.architectures)
+        if unknown:
+            raise ValueError(f"Overrides for architectures that aren't being compared: {sorted(unknown)}")
+
+
+class ArchitectureComparison:
+    """Tournament of Power for backbones - same data, same trainer, same test split
+
+    Every architecture is trained with ModelTrainer on the pipeline's train/val
+    split, scored on the test split with ModelEvaluator and timed with
+    model.predict at each batch size. The leaderboard puts error next to
+    parameter count and latency, so the cheapest model inside an error budget
+    is one ``cheapest`` call away.
+    """
+
+    def __init__(self, comparison: Optional[ComparisonConfig] = None, config: Optional[Config] = None):
+        self.comparison = comparison or ComparisonConfig()
+        self.config = config or Config()
+
+    def run(self, symbols: List[str], start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        from modal.pipeline import StockPredictionPipeline
+
+        pipeline = StockPredictionPipeline()
+        pipeline.config = self.config
+        train_windows, val_windows, test_windows, _, target_scaler = pipeline.prepare_data(
+            symbols, start_date, end_date
+        )
+        n_probe = min(len(test_windows), max(self.comparison.predict_batch_sizes))
+        X_probe, _ = test_windows.take(np.arange(n_probe))
+
+        results = []
+        for architecture in self.comparison.architectures:
+            result = self._evaluate(architecture, train_windows, val_windows, test_windows, target_scaler, X_probe)
+            logger.info(f"{architecture}: {result}")
+            results.append(result)
+
+        self.write_report(results)
+        return results
+
+    def _evaluate(self, architecture: str, train_windows: SequenceWindows, val_windows: SequenceWindows,
+                  test_windows: SequenceWindows, target_scaler, X_probe: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        model_config = replace(self.config.model, architecture=architecture,
+                               **self.comparison.overrides.get(architecture, {}))
+        tf.keras.utils.set_random_seed(self.comparison.seed)
+        input_shape = (train_windows.time_steps, train_windows.n_features)
+        model = StockPredictor(model_config, input_shape, self.config.data.stock_identifier_mapping).model
+        trainer = ModelTrainer(model_config)
+
+        started = time.time()
+        if model_config.streaming_input:
+            history, _ = trainer.train_on_windows(model, train_windows, val_windows)
+        else:
+            X_train, y_train = train_windows.materialize()
+            X_val, y_val = val_windows.materialize()
+            history, _ = trainer.train(model, X_train, y_train, X_val, y_val)
+        train_time = time.time() - started
+
+        metrics, _, _ = ModelEvaluator.evaluate_windows(model, test_windows, target_scaler)
+        overall = metrics["overall"]
+        return {
+            "architecture": architecture,
+            "params": int(model.count_params()),
+            "epochs_run": len(history.get("loss", [])),
+            "train_time_s": round(train_time, 2),
+            **{f"{m}_{c}": overall[m][c] for m in ("MAPE", "R2") for c in ("High", "Low", "Close")},
+            **predict_latency_ms(model, X_probe, self.comparison.predict_batch_sizes, self.comparison.predict_repeats),
+            "overrides": self.comparison.overrides.get(architecture, {}),
+        }
+
+    @staticmethod
+    def cheapest(results: List[Dict[str, Any]], max_close_mape: float,
+                 latency_key: str = "predict_b1_ms_p50") -> Optional[Dict[str, Any]]:
+        """Lowest-latency architecture whose Close MAPE is within budget, or None."""
+        within = [r for r in results if r["MAPE_Close"] <= max_close_mape]
+        return min(within, key=lambda r: (r[latency_key], r["params"])) if within else None
+
+    def write_report(self, results: List[Dict[str, Any]]) -> None:
+        out = self.comparison.output_dir
+        out.mkdir(parents=True, exist_ok=True)
+        ranked = sorted(results, key=lambda r: r["MAPE_Close"])
+        with open(out / "leaderboard.json", "w") as f:
+            json.dump({"config": asdict(self.comparison), "results": ranked}, f, indent=2, default=str)
+
+        columns = [c for c in ranked[0] if c != "overrides"] if ranked else []
+        with open(out / "leaderboard.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(ranked)
+        logger.info(f"Architecture leaderboard written to {out}")
+
+
+def main():
+    comparison = ArchitectureComparison()
+    results = comparison.run(
+        symbols=["AAPL", "MSFT", "GOOGL", "NVDA", "TSLA", "AMD", "META"],
+        start_date="2017-01-01",
+        end_date="2025-09-09",
+    )
+    for r in sorted(results, key=lambda r: r["MAPE_Close"]):
+        print(f"{r['architecture']:>10}: MAPE_Close={r['MAPE_Close']:.4f} params={r['params']} "
+              f"b1={r['predict_b1_ms_p50']}ms")
+    print("Cheapest within 3% Close MAPE:", ArchitectureComparison.cheapest(results, 0.03))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import csv
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from data.stock_config import Config, ModelConfig
+from data.sequence_windows import SequenceWindows, SymbolSeries
+
+# TensorFlow stays out of module scope so fold workers can pin threads first
+# (see modal.sweep._init_worker).
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BacktestConfig:
+    n_folds: int = 5
+    test_days: int = 63             # ~one quarter of trading days per fold
+    val_days: int = 63
+    train_days: Optional[int] = None  # None = expanding window, otherwise rolling
+    warm_start: bool = True
+    fold_epochs: Optional[int] = None  # epochs for warm-started folds, default epochs // 4
+    workers: int = 1                # > 1 runs cold-start folds in parallel
+    threads_per_fold: int = 2
+    output_dir: Path = Path("results/backtest")
+
+    def __post_init__(self):
+        self.output_dir = Path(self.output_dir)
+        if self.n_folds < 1 or self.test_days < 1 or self.val_days < 1:
+            raise ValueError("n_folds, test_days and val_days must all be positive.")
+        if self.warm_start and self.workers > 1:
+            raise ValueError("Warm-started folds depend on each other - they can't run in parallel.")
+
+
+def fold_bounds(windows: SequenceWindows, backtest: BacktestConfig) -> List[Dict[str, Dict[str, Tuple[int, int]]]]:
+    """Rolling-origin folds as per-symbol row bounds for train / val / test.
+
+    Folds are counted back from each symbol's latest row. Every symbol shares the
+    same trading calendar and end date (WalkForwardBacktester.prepare checks it
+    with check_calendars), so row ``n - k`` is the same session for all of them
+    and fold ``i`` tests the same dates across the universe.
+    """
+    T = windows.time_steps
+    folds = []
+    for k in range(backtest.n_folds):
+        fold = {"train": {}, "val": {}, "test": {}}
+        for s in windows.series:
+            n = int(s.stop)
+            test_hi = n - (backtest.n_folds - 1 - k) * backtest.test_days
+            test_lo = test_hi - backtest.test_days
+            val_lo = test_lo - backtest.val_days
+            train_lo = T if backtest.train_days is None else max(T, val_lo - backtest.train_days)
+            if val_lo <= train_lo:
+                continue  # not enough history for this symbol yet
+            fold["train"][s.symbol] = (train_lo, val_lo)
+            fold["val"][s.symbol] = (val_lo, test_lo)
+            fold["test"][s.symbol] = (test_lo, test_hi)
+        folds.append(fold)
+    return folds
+
+
+def check_calendars(frames: Dict[str, pd.DataFrame], backtest: BacktestConfig) -> None:
+    """Raise unless every symbol has the same session dates over the span the folds cover.
+
+    fold_bounds counts rows back from each symbol's end, which only lines the
+    folds up across the universe when the calendars agree there.
+    """
+    span = backtest.n_folds * backtest.test_days + backtest.val_days
+    tails = {symbol: list(df.dropna().index[-span:]) for symbol, df in frames.items()}
+    if not tails:
+        return
+    reference = max(tails.values(), key=len)
+    misaligned = sorted(symbol for symbol, tail in tails.items() if tail != reference[len(reference) - len(tail):])
+    if misaligned:
+        raise ValueError(f"{misaligned} don't share the other symbols' last {span} session dates; "
+                         f"backtest folds would test different dates per symbol.")
+
+
+def _split(windows: SequenceWindows, bounds: Dict[str, Tuple[int, int]]) -> SequenceWindows:
+    series = [
+        SymbolSeries(s.symbol, s.stock_id, s.features, s.targets, *bounds[s.symbol])
+        for s in windows.series if s.symbol in bounds
+    ]
+    return SequenceWindows(series, windows.time_steps)
+
+
+def _fit_and_score(model, trainer, windows: SequenceWindows, fold: Dict[str, Any], target_scaler) -> Dict[str, Any]:
+    from modal.evaluation import ModelEvaluator
+
+    started = time.time()
+    train_windows = _split(windows, fold["train"])
+    val_windows = _split(windows, fold["val"])
+    test_windows = _split(windows, fold["test"])
+    if trainer.config.streaming_input:
+        history, _ = trainer.train_on_windows(model, train_windows, val_windows)
+    else:
+        X_train, y_train = train_windows.materialize()
+        X_val, y_val = val_windows.materialize()
+        history, _ = trainer.train(model, X_train, y_train, X_val, y_val)
+    train_time = time.time() - started
+
+    # One forward pass over every test window of the fold
+    metrics, _, _ = ModelEvaluator.evaluate_windows(model, test_windows, target_scaler)
+    return {
+        "train_windows": len(train_windows),
+        "test_windows": len(test_windows),
+        "epochs_run": len(history.get("loss", [])),
+        "train_time_s": round(train_time, 2),
+        "metrics": metrics,
+    }
+
+
+def _run_cold_fold(fold_index: int, fold: Dict[str, Any], model_config: Dict[str, Any],
+                   stock_identifier_mapping: Dict[str, int], store_root: str, target_scaler) -> Dict[str, Any]:
+    """Worker entry point for fold-parallel (cold start) backtests."""
+    from data.feature_store import FeatureStore
+    from modal.architecture import StockPredictor
+    from modal.model_training import ModelTrainer
+
+    windows = FeatureStore(Path(store_root)).open_windows()
+    config = ModelConfig(**model_config)
+    predictor = StockPredictor(config, (windows.time_steps, windows.n_features), stock_identifier_mapping)
+    result = _fit_and_score(predictor.model, ModelTrainer(config), windows, fold, target_scaler)
+    return {"fold": fold_index, **result}
+
+
+class WalkForwardBacktester:
+    """Kamui time travel - replay history fold by fold, no peeking at the future
+
+    The scalers are fit on everything before the first test fold only. Fold ``i``
+    trains on rows before its validation block and is scored on the next
+    ``test_days`` sessions. With ``warm_start`` each fold continues from the
+    previous fold's weights for a few epochs instead of training from scratch.
+    """
+
+    def __init__(self, backtest: BacktestConfig, config: Optional[Config] = None):
+        self.backtest = backtest
+        self.config = config or Config()
+
+    def prepare(self, symbols: List[str], start_date: str, end_date: str):
+        from data.dataFetcher import DataFetcher
+        from data.data_preprocessor import DataPreprocessor
+        from data.feature_store import FeatureStore
+
+        fetcher = DataFetcher(self.config.data)
+        preprocessor = DataPreprocessor(self.config.data)
+        stock_data = fetcher.fetch_many(symbols, start_date, end_date)
+        check_calendars(stock_data, self.backtest)
+        holdout = self.backtest.n_folds * self.backtest.test_days
+        windows, _, target_scaler = preprocessor.preprocess_multiple(stock_data, lazy=True, holdout_rows=holdout)
+
+        # Park the scaled rows in a feature store so fold workers can memory-map them
+        store = FeatureStore(self.backtest.output_dir / "store", dtype=self.config.data.dtype)
+        for s in windows.series:
+            store.write_symbol(s.symbol, s.features, s.targets)
+        store.write_manifest({
+            "feature_names": self.config.data.get_active_features,
+            "time_steps": windows.time_steps,
+            "dtype": str(store.dtype),
+            "symbols": {s.symbol: {"stock_id": int(s.stock_id), "rows": int(s.stop)} for s in windows.series},
+        })
+        return store.open_windows(), store, target_scaler
+
+    def run(self, symbols: List[str], start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        windows, store, target_scaler = self.prepare(symbols, start_date, end_date)
+        folds = fold_bounds(windows, self.backtest)
+
+        if self.backtest.warm_start or self.backtest.workers <= 1:
+            results = self._run_sequential(windows, folds, target_scaler)
+        else:
+            results = self._run_parallel(folds, store.root, target_scaler)
+
+        self.write_report(results)
+        return results
+
+    def _run_sequential(self, windows: SequenceWindows, folds: List[Dict[str, Any]], target_scaler) -> List[Dict[str, Any]]:
+        from modal.architecture import StockPredictor
+        from modal.model_training import ModelTrainer
+
+        mapping = self.config.data.stock_identifier_mapping
+        input_shape = (windows.time_steps, windows.n_features)
+        first_trainer = ModelTrainer(self.config.model)
+        warm_trainer = ModelTrainer(self._warm_config())
+
+        results = []
+        predictor = None
+        for i, fold in enumerate(folds):
+            if predictor is None or not self.backtest.warm_start:
+                predictor = StockPredictor(self.config.model, input_shape, mapping)
+                trainer = first_trainer
+            else:
+                trainer = warm_trainer
+                # Keep the optimizer's moments, but not the previous fold's ReduceLROnPlateau
+                # cuts: every fold starts from the configured learning rate
+                predictor.model.optimizer.learning_rate = self.config.model.learning_rate
+            result = {"fold": i, "warm_started": trainer is warm_trainer,
+                      **_fit_and_score(predictor.model, trainer, windows, fold, target_scaler)}
+            logger.info(f"Fold {i}: {result['epochs_run']} epochs in {result['train_time_s']}s, "
+                        f"Close MAPE={result['metrics']['overall']['MAPE']['Close']:.4f}")
+            results.append(result)
+        return results
+
+    def _run_parallel(self, folds: List[Dict[str, Any]], store_root: Path, target_scaler) -> List[Dict[str, Any]]:
+        from modal.sweep import _init_worker
+
+        with ProcessPoolExecutor(
+            max_workers=min(self.backtest.workers, len(folds)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.backtest.threads_per_fold,),
+        ) as pool:
+            futures = [
+                pool.submit(_run_cold_fold, i, fold, asdict(self.config.model),
+                            self.config.data.stock_identifier_mapping, str(store_root), target_scaler)
+                for i, fold in enumerate(folds)
+            ]
+            return [{**f.result(), "warm_started": False} for f in futures]
+
+    def _warm_config(self) -> ModelConfig:
+        epochs = self.backtest.fold_epochs or max(self.config.model.epochs // 4, 2)
+        patience = min(self.config.model.patience, epochs - 1)
+        return replace(self.config.model, epochs=epochs, patience=patience)
+
+    def write_report(self, results: List[Dict[str, Any]]) -> None:
+        """folds.csv has one row per (fold, symbol) plus an ALL row per fold."""
+        out = self.backtest.output_dir
+        out.mkdir(parents=True, exist_ok=True)
+        with open(out / "backtest.json", "w") as f:
+            json.dump({"config": asdict(self.backtest), "folds": results}, f, indent=2, default=str)
+
+        columns = [f"{m}_{c}" for m in ("MAPE", "R2") for c in ("High", "Low", "Close")]
+        with open(out / "folds.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["fold", "symbol", "warm_started", "epochs_run", "train_time_s"] + columns)
+            for r in results:
+                scopes = [("ALL", r["metrics"]["overall"])] + list(r["metrics"]["per_symbol"].items())
+                for symbol, m in scopes:
+                    writer.writerow([r["fold"], symbol, r["warm_started"], r["epochs_run"], r["train_time_s"]]
+                                    + [m[k.split("_")[0]][k.split("_")[1]] for k in columns])
+        logger.info(f"Backtest report written to {out}")
+
+
+def main():
+    backtester = WalkForwardBacktester(BacktestConfig(n_folds=8))
+    results = backtester.run(
+        symbols=["AAPL", "MSFT", "GOOGL", "NVDA", "TSLA", "AMD", "META"],
+        start_date="2017-01-01",
+        end_date="2025-09-09",
+    )
+    for r in results:
+        print(f"Fold {r['fold']}: {r['metrics']['overall']}")
+
+
+if __name__ == "__main__":
+    main()
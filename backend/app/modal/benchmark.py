@@ -0,0 +1,180 @@
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+from data.stock_config import Config, ModelConfig
+from modal.runtime import configure_runtime
+
+# TensorFlow is only imported inside the variant processes, after configure_runtime
+# has set the oneDNN flag and thread counts for that variant.
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FIELDS = ("jit_compile", "intra_op_threads", "inter_op_threads", "onednn", "lstm_implementation")
+
+
+@dataclass
+class BenchmarkConfig:
+    # Every combination is benchmarked, each in a fresh process
+    variants: Dict[str, List[Any]] = field(default_factory=lambda: {
+        "jit_compile": [False, True],
+        "lstm_implementation": ["loop", "unrolled"],
+    })
+    n_samples: int = 4096
+    warmup_steps: int = 10
+    predict_batch_sizes: List[int] = field(default_factory=lambda: [1, 256])
+    predict_repeats: int = 20
+    seed: int = 42
+    output_dir: Path = Path("results/benchmark")
+
+    def __post_init__(self):
+        self.output_dir = Path(self.output_dir)
+        unknown = set(self.variants) - set(PROFILE_FIELDS)
+        if unknown:
+            raise ValueError(f"Not performance profile fields: {sorted(unknown)}. Pick from {PROFILE_FIELDS}.")
+
+
+def _init_variant(model_config: Dict[str, Any]) -> None:
+    configure_runtime(ModelConfig(**model_config))
+
+
+def _bench_variant(model_config: Dict[str, Any], time_steps: int, n_features: int,
+                   stock_identifier_mapping: Dict[str, int], bench: Dict[str, Any]) -> Dict[str, Any]:
+    """Train-step and predict timings for one profile on synthetic windows of the real shape."""
+    import tensorflow as tf
+    from modal.architecture import StockPredictor
+
+    tf.keras.utils.set_random_seed(bench["seed"])
+    config = ModelConfig(**model_config)
+    rng = np.random.default_rng(bench["seed"])
+    n = bench["n_samples"]
+    X = {
+        'price_input': rng.random((n, time_steps, n_features), dtype=np.float32),
+        'stock_input': rng.integers(0, len(stock_identifier_mapping), n),
+    }
+    y = rng.random((n, 3), dtype=np.float32)
+    model = StockPredictor(config, (time_steps, n_features), stock_identifier_mapping).model
+
+    # The first fit traces (and with XLA compiles) the train step; keep that apart from steady state
+    warm = min(bench["warmup_steps"] * config.batch_size, n)
+    started = time.perf_counter()
+    model.fit({k: v[:warm] for k, v in X.items()}, y[:warm], batch_size=config.batch_size, epochs=1, verbose=0)
+    first_fit_s = time.perf_counter() - started
+
+    step_times: List[float] = []
+
+    class StepTimer(tf.keras.callbacks.Callback):
+        def on_train_batch_begin(self, batch, logs=None):
+            self._start = time.perf_counter()
+
+        def on_train_batch_end(self, batch, logs=None):
+            step_times.append(time.perf_counter() - self._start)
+
+    model.fit(X, y, batch_size=config.batch_size, epochs=1, verbose=0, callbacks=[StepTimer()])
+    steps = np.array(step_times) * 1000
+
+    result = {
+        "first_fit_s": round(first_fit_s, 3),
+        "train_step_ms_p50": round(float(np.median(steps)), 3),
+        "train_step_ms_p90": round(float(np.percentile(steps, 90)), 3),
+        "train_samples_per_s": round(n / (steps.sum() / 1000), 1),
+    }
+    result.update(predict_latency_ms(model, X, bench["predict_batch_sizes"], bench["predict_repeats"]))
+    return result
+
+
+def predict_latency_ms(model, X: Dict[str, np.ndarray], batch_sizes: List[int], repeats: int) -> Dict[str, float]:
+    """Median model.predict latency for each batch size, after one warm-up call per size."""
+    result = {}
+    for batch_size in batch_sizes:
+        batch = {k: v[:batch_size] for k, v in X.items()}
+        model.predict(batch, batch_size=batch_size, verbose=0)
+        latencies = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            model.predict(batch, batch_size=batch_size, verbose=0)
+            latencies.append(time.perf_counter() - started)
+        result[f"predict_b{batch_size}_ms_p50"] = round(float(np.median(latencies)) * 1000, 3)
+    return result
+
+
+class ProfileBenchmark:
+    """Power level check for every CPU profile - same model, same shapes, different knobs
+
+    Each variant runs in its own spawned process because oneDNN and the thread
+    pools can only be set before TensorFlow initializes. Variants run one after
+    another so they don't compete for cores.
+    """
+
+    def __init__(self, bench: Optional[BenchmarkConfig] = None, config: Optional[Config] = None):
+        self.bench = bench or BenchmarkConfig()
+        self.config = config or Config()
+
+    def variants(self) -> List[Dict[str, Any]]:
+        keys = sorted(self.bench.variants)
+        return [dict(zip(keys, combo)) for combo in itertools.product(*(self.bench.variants[k] for k in keys))]
+
+    def run(self) -> List[Dict[str, Any]]:
+        time_steps = self.config.data.time_steps
+        n_features = len(self.config.data.get_active_features)
+        bench = asdict(self.bench)
+        bench.pop("output_dir")
+
+        results = []
+        for params in self.variants():
+            model_config = asdict(replace(self.config.model, **params))
+            with ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_variant,
+                initargs=(model_config,),
+            ) as pool:
+                try:
+                    timings = pool.submit(
+                        _bench_variant, model_config, time_steps, n_features,
+                        self.config.data.stock_identifier_mapping, bench,
+                    ).result()
+                    result = {**params, "status": "ok", **timings}
+                except Exception as e:
+                    logger.error(f"Variant {params} failed: {e}")
+                    result = {**params, "status": "failed", "error": str(e)}
+            logger.info(f"{params}: {result}")
+            results.append(result)
+
+        self.write_report(results)
+        return results
+
+    def write_report(self, results: List[Dict[str, Any]]) -> None:
+        out = self.bench.output_dir
+        out.mkdir(parents=True, exist_ok=True)
+        ranked = sorted(results, key=lambda r: r.get("train_step_ms_p50", float("inf")))
+        with open(out / "benchmark.json", "w") as f:
+            json.dump(ranked, f, indent=2, default=str)
+
+        columns = list(dict.fromkeys(key for r in ranked for key in r))
+        with open(out / "benchmark.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(ranked)
+        logger.info(f"Benchmark report written to {out}")
+
+
+def main():
+    results = ProfileBenchmark(BenchmarkConfig(variants={
+        "jit_compile": [False, True],
+        "lstm_implementation": ["loop", "unrolled"],
+        "intra_op_threads": [0, 4],
+    })).run()
+    for r in sorted(results, key=lambda r: r.get("train_step_ms_p50", float("inf"))):
+        print(r)
+
+
+if __name__ == "__main__":
+    main()
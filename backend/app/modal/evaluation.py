@@ -1,9 +1,10 @@
 # models/evaluation.py
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 import numpy as np
 from sklearn.metrics import mean_absolute_percentage_error, r2_score
 import tensorflow as tf
 from sklearn.preprocessing import MinMaxScaler
+from data.sequence_windows import SequenceWindows
 
 class ModelEvaluator:
     """The Judgment Council"""
@@ -22,17 +23,74 @@ class ModelEvaluator:
             dummy[:, :3] = y_test
             y_test = scaler.inverse_transform(dummy)[:, :3]
         
-        metrics = {
+        metrics = ModelEvaluator.metrics(y_test, predictions)
+        
+        return metrics, predictions
+
+    @staticmethod
+    def metrics(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, Dict[str, float]]:
+        """MAPE and R2 for each of the High/Low/Close columns."""
+        return {
             'MAPE': {
-                'High': mean_absolute_percentage_error(y_test[:, 0], predictions[:, 0]),
-                'Low': mean_absolute_percentage_error(y_test[:, 1], predictions[:, 1]),
-                'Close': mean_absolute_percentage_error(y_test[:, 2], predictions[:, 2])
+                name: float(mean_absolute_percentage_error(y_true[:, i], y_pred[:, i]))
+                for i, name in enumerate(('High', 'Low', 'Close'))
             },
             'R2': {
-                'High': r2_score(y_test[:, 0], predictions[:, 0]),
-                'Low': r2_score(y_test[:, 1], predictions[:, 1]),
-                'Close': r2_score(y_test[:, 2], predictions[:, 2])
+                name: float(r2_score(y_true[:, i], y_pred[:, i])) if len(y_true) > 1 else float('nan')
+                for i, name in enumerate(('High', 'Low', 'Close'))
             }
         }
-        
-        return metrics, predictions
\ No newline at end of file
+
+    @staticmethod
+    def evaluate_windows(model: tf.keras.Model, windows: SequenceWindows, target_scaler: MinMaxScaler,
+                         batch_size: int = 4096) -> Tuple[Dict[str, Any], np.ndarray, np.ndarray]:
+        """Score every window with a single predict call, overall and per symbol.
+
+        Returns ``(metrics, predictions, targets)`` in real prices, with
+        ``metrics = {'overall': {...}, 'per_symbol': {symbol: {...}}}``.
+        """
+        X, y = windows.materialize()
+        predictions = model.predict(X, batch_size=batch_size, verbose=0)
+        predictions = target_scaler.inverse_transform(predictions.astype(np.float64))
+        y = target_scaler.inverse_transform(y.astype(np.float64))
+
+        per_symbol = {}
+        offset = 0
+        for s in windows.series:
+            n = len(s)
+            per_symbol[s.symbol] = ModelEvaluator.metrics(y[offset:offset + n], predictions[offset:offset + n])
+            offset += n
+        return {'overall': ModelEvaluator.metrics(y, predictions), 'per_symbol': per_symbol}, predictions, y
+
+    @staticmethod
+    def float64_reference(model: tf.keras.Model) -> tf.keras.Model:
+        """The same architecture and weights computing in float64, as a numerical reference."""
+        config = model.get_config()
+        for layer in config["layers"]:
+            layer["config"]["dtype"] = "float64"
+        reference = model.__class__.from_config(config)
+        reference.set_weights([w.astype(np.float64) for w in model.get_weights()])
+        return reference
+
+    @staticmethod
+    def check_dtype_parity(model: tf.keras.Model, features: np.ndarray, stock_id: int,
+                           feature_scaler: MinMaxScaler, target_scaler: MinMaxScaler,
+                           rtol: float = 1e-3) -> Dict[str, float]:
+        """Predict one raw (time_steps, n_features) window through the float32 serving
+        path and through a float64 copy of the model, and compare the real-price
+        outputs. Reports the drift and whether it is within ``rtol``; never raises."""
+        outputs = []
+        for dtype, net in ((np.float64, ModelEvaluator.float64_reference(model)), (np.float32, model)):
+            scaled = np.clip(feature_scaler.transform(features.astype(dtype)), 0, 1).astype(dtype)
+            inputs = {
+                'price_input': scaled[None, ...],
+                'stock_input': np.array([[stock_id]], dtype=np.int32)
+            }
+            pred = np.asarray(net.predict(inputs, verbose=0)).astype(np.float64)
+            dummy = np.zeros((pred.shape[0], target_scaler.scale_.shape[0]), dtype=np.float64)
+            dummy[:, :3] = pred[:, :3]
+            outputs.append(target_scaler.inverse_transform(dummy)[:, :3])
+
+        abs_diff = float(np.max(np.abs(outputs[0] - outputs[1])))
+        rel_diff = float(np.max(np.abs(outputs[0] - outputs[1]) / np.maximum(np.abs(outputs[0]), 1e-12)))
+        return {'max_abs_diff': abs_diff, 'max_rel_diff': rel_diff, 'within_tolerance': rel_diff <= rtol}
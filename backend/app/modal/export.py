@@ -0,0 +1,219 @@
+import argparse
+import logging
+import math
+import tempfile
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from data.stock_config import Config
+from data.dataFetcher import DataFetcher
+from data.data_preprocessor import DataPreprocessor
+from data.inference_backends import BACKENDS
+from data.model_bundle import ModelBundle, ModelRegistry, ScalerParams
+from modal.fine_tune import INDICATOR_WARMUP
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = {
+    "tflite": (None, "float16", "int8"),
+    "onnx": (None, "int8"),
+}
+# Largest acceptable |keras - exported| on the scaled (0..1) outputs
+DEFAULT_TOLERANCE = {None: 1e-4, "float16": 5e-3, "int8": 3e-2}
+
+
+@dataclass
+class ExportConfig:
+    runtime: str = "tflite"                # "tflite" or "onnx"
+    quantization: Optional[str] = None     # None, "float16" (tflite) or "int8"
+    version: Optional[int] = None          # None = the registry's current version
+    # Real windows from just before the cutoff: int8 calibration and the parity check
+    calibration_sessions: int = 250
+    calibration_samples: int = 512
+    tolerance: Optional[float] = None      # None = DEFAULT_TOLERANCE for the quantization
+    seed: int = 42
+
+    def __post_init__(self):
+        if self.runtime not in QUANTIZATIONS:
+            raise ValueError(f"runtime must be one of {sorted(QUANTIZATIONS)}, not {self.runtime}.")
+        if self.quantization not in QUANTIZATIONS[self.runtime]:
+            raise ValueError(f"{self.runtime} supports quantization {QUANTIZATIONS[self.runtime]}, "
+                             f"not {self.quantization}.")
+
+
+class ModelExporter:
+    """Shrinking Potion for the serving model - same weights, a fraction of the runtime
+
+    Converts a published bundle's Keras model to TFLite or ONNX, optionally
+    quantized, writes it next to ``model.keras`` in the bundle directory and
+    records it in the bundle manifest. Before that, the export is run on real
+    windows and compared with Keras; if the outputs drift past the tolerance
+    nothing is recorded and the export fails.
+    """
+
+    def __init__(self, export: Optional[ExportConfig] = None, config: Optional[Config] = None):
+        self.export = export or ExportConfig()
+        self.config = config or Config()
+        self.registry = ModelRegistry(self.config.registry_path)
+
+    def run(self) -> Dict[str, Any]:
+        bundle = self.registry.load(self.export.version, compile=False)
+        bundle_dir = self.registry.path(bundle.version)
+        X = self.calibration_inputs(bundle)
+
+        suffix = f"_{self.export.quantization}" if self.export.quantization else ""
+        filename = f"model{suffix}.{self.export.runtime}"
+        target = bundle_dir / filename
+        if self.export.runtime == "tflite":
+            self._to_tflite(bundle.model, X, target)
+        else:
+            self._to_onnx(bundle.model, target)
+
+        parity = self.check_parity(bundle.model, BACKENDS[self.export.runtime](target), X, bundle.target_scaler)
+        tolerance = self.export.tolerance or DEFAULT_TOLERANCE[self.export.quantization]
+        if parity["max_abs"] > tolerance:
+            target.unlink()
+            raise ValueError(f"{filename} drifts {parity['max_abs']:.2e} from Keras (tolerance {tolerance:.0e}); "
+                             f"not recording it.")
+
+        info = {
+            "runtime": self.export.runtime,
+            "file": filename,
+            "quantization": self.export.quantization,
+            "size_bytes": target.stat().st_size,
+            "keras_size_bytes": (bundle_dir / "model.keras").stat().st_size,
+            "parity": parity,
+        }
+        # "tflite", "tflite_float16", "onnx_int8", ...: the name MODEL_RUNTIME selects it by
+        self.registry.record_runtime(bundle.version, f"{self.export.runtime}{suffix}", info)
+        logger.info(f"Exported v{bundle.version} to {target}: {info}")
+        return {"version": bundle.version, "name": f"{self.export.runtime}{suffix}", **info}
+
+    def verify(self, names: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Parity of a bundle's recorded exports against its Keras model, without exporting.
+
+        Run it after upgrading an inference runtime or before switching MODEL_RUNTIME.
+        ``names`` limits it to those exports ("tflite", "onnx_int8", ...); the
+        tolerance is each export's quantization default unless ExportConfig sets one.
+        """
+        bundle = self.registry.load(self.export.version, compile=False)
+        bundle_dir = self.registry.path(bundle.version)
+        X = self.calibration_inputs(bundle)
+        report = {}
+        for name, info in bundle.runtimes.items():
+            if names and name not in names:
+                continue
+            backend = BACKENDS[info.get("runtime", name)](bundle_dir / info["file"])
+            parity = self.check_parity(bundle.model, backend, X, bundle.target_scaler)
+            tolerance = self.export.tolerance or DEFAULT_TOLERANCE[info.get("quantization")]
+            report[name] = {**parity, "tolerance": tolerance, "within_tolerance": parity["max_abs"] <= tolerance}
+            if not report[name]["within_tolerance"]:
+                logger.warning(f"v{bundle.version} {name} drifts {parity['max_abs']:.2e} from Keras "
+                               f"(tolerance {tolerance:.0e})")
+        return report
+
+    def calibration_inputs(self, bundle: ModelBundle) -> Dict[str, np.ndarray]:
+        """A seeded sample of real, bundle-scaled windows from before the cutoff."""
+        cutoff = pd.Timestamp(bundle.cutoff)
+        sessions = self.export.calibration_sessions + bundle.time_steps + INDICATOR_WARMUP
+        start = (cutoff - timedelta(days=math.ceil(sessions * 7 / 5) + 10)).date().isoformat()
+
+        fetcher = DataFetcher(self.config.data)
+        symbols = bundle.metadata.get("symbols") or list(bundle.stock_identifier_mapping)
+        frames = fetcher.fetch_many(symbols, start, cutoff.date().isoformat())
+        windows = DataPreprocessor(self.config.data).transform_multiple(
+            frames, bundle.feature_scaler.to_scaler(), bundle.target_scaler.to_scaler()
+        )
+        rng = np.random.default_rng(self.export.seed)
+        n = min(len(windows), self.export.calibration_samples)
+        X, _ = windows.take(np.sort(rng.choice(len(windows), n, replace=False)))
+        return X
+
+    def _to_tflite(self, model: tf.keras.Model, X: Dict[str, np.ndarray], target: Path) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            saved_model = Path(tmp) / "saved_model"
+            model.export(str(saved_model), format="tf_saved_model")
+            converter = tf.lite.TFLiteConverter.from_saved_model(str(saved_model))
+            # Builtin ops only, so the standalone interpreter can run it without the Flex delegate
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS]
+            if self.export.quantization == "float16":
+                converter.optimizations = [tf.lite.Optimize.DEFAULT]
+                converter.target_spec.supported_types = [tf.float16]
+            elif self.export.quantization == "int8":
+                converter.optimizations = [tf.lite.Optimize.DEFAULT]
+                converter.representative_dataset = lambda: self._representative(model, X)
+                converter.target_spec.supported_ops = [
+                    tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS
+                ]
+            target.write_bytes(converter.convert())
+
+    @staticmethod
+    def _representative(model: tf.keras.Model, X: Dict[str, np.ndarray]):
+        # One sample per step, inputs in the order and dtype the graph declares
+        names = [t.name.split(":")[0] for t in model.inputs]
+        for i in range(len(X["price_input"])):
+            yield {
+                name: X[name][i:i + 1].reshape((1,) + tuple(d or 1 for d in t.shape[1:])).astype(np.float32)
+                for name, t in zip(names, model.inputs)
+            }
+
+    def _to_onnx(self, model: tf.keras.Model, target: Path) -> None:
+        if self.export.quantization is None:
+            model.export(str(target), format="onnx")
+            return
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        with tempfile.TemporaryDirectory() as tmp:
+            float_model = Path(tmp) / "model.onnx"
+            model.export(str(float_model), format="onnx")
+            quantize_dynamic(str(float_model), str(target), weight_type=QuantType.QInt8)
+
+    @staticmethod
+    def check_parity(model: tf.keras.Model, backend, X: Dict[str, np.ndarray],
+                     target_scaler: ScalerParams) -> Dict[str, float]:
+        """Keras vs exported outputs on the same windows (one at a time, as served),
+        in scaled units and as relative error on the inverse-transformed prices."""
+        expected = model.predict(X, verbose=0)
+        actual = np.concatenate([backend.predict({k: v[i:i + 1] for k, v in X.items()})
+                                 for i in range(len(X["price_input"]))])
+        diff = np.abs(expected - actual)
+        expected_prices = target_scaler.inverse_transform(expected)
+        price_rel = np.abs(target_scaler.inverse_transform(actual) - expected_prices) / np.abs(expected_prices)
+        return {
+            "samples": int(len(diff)),
+            "max_abs": float(diff.max()),
+            "mean_abs": float(diff.mean()),
+            "max_price_rel": float(price_rel.max()),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a published model bundle to a slim inference runtime")
+    parser.add_argument("--runtime", choices=sorted(QUANTIZATIONS), default="tflite")
+    parser.add_argument("--quantization", choices=["float16", "int8"], default=None)
+    parser.add_argument("--version", type=int, default=None)
+    parser.add_argument("--verify", nargs="*", metavar="NAME", default=None,
+                        help="Re-check the parity of the version's recorded exports (all, or these names) "
+                             "instead of exporting")
+    args = parser.parse_args()
+
+    if args.verify is not None:
+        report = ModelExporter(ExportConfig(version=args.version)).verify(args.verify)
+        for name, parity in report.items():
+            print(f"{name}: {parity}")
+        if not all(parity["within_tolerance"] for parity in report.values()):
+            raise SystemExit(1)
+        return
+
+    result = ModelExporter(ExportConfig(runtime=args.runtime, quantization=args.quantization,
+                                        version=args.version)).run()
+    print(f"v{result['version']}: {result['file']} {result['size_bytes'] / 1e6:.2f} MB "
+          f"(keras {result['keras_size_bytes'] / 1e6:.2f} MB), parity {result['parity']}")
+
+
+if __name__ == "__main__":
+    main()
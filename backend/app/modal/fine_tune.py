@@ -0,0 +1,176 @@
+import logging
+import math
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from data.stock_config import Config
+from data.dataFetcher import DataFetcher
+from data.data_preprocessor import DataPreprocessor
+from data.sequence_windows import SequenceWindows, SymbolSeries
+from modal.evaluation import ModelEvaluator
+from data.model_bundle import ModelBundle, ModelRegistry
+from data.market_calendar import last_closed_session
+
+logger = logging.getLogger(__name__)
+
+# Rows the indicators need before they stop producing NaN (MACD signal, RSI, ATR)
+INDICATOR_WARMUP = 60
+
+
+@dataclass
+class FineTuneConfig:
+    epochs: int = 3
+    learning_rate: float = 1e-4
+    batch_size: int = 32
+    # Older windows to sample from, in trading sessions before the cutoff
+    replay_sessions: int = 250
+    # Replay windows drawn per new window, so fresh bars don't overwrite what the model knew
+    replay_ratio: float = 1.0
+    seed: int = 42
+
+    def __post_init__(self):
+        if self.epochs < 1:
+            raise ValueError("epochs must be at least 1.")
+        if self.replay_sessions < 0 or self.replay_ratio < 0:
+            raise ValueError("replay_sessions and replay_ratio can't be negative.")
+
+
+class IncrementalUpdater:
+    """Hyperbolic Time Chamber, nightly edition - a few epochs on what happened since last time
+
+    Loads the current bundle from the registry, fetches only bars at or after
+    its cutoff (plus enough history for indicators and a replay sample),
+    fine-tunes on the new windows mixed with a random sample of older ones and
+    publishes the result as the next registry version. The scalers are reused
+    as-is so the new version reads inputs exactly like the old one.
+    """
+
+    def __init__(self, fine_tune: Optional[FineTuneConfig] = None, config: Optional[Config] = None):
+        self.fine_tune = fine_tune or FineTuneConfig()
+        self.config = config or Config()
+        self.registry = ModelRegistry(self.config.registry_path)
+
+    def update(self, end_date: Optional[str] = None) -> Dict[str, Any]:
+        bundle = self.registry.load()
+        if bundle.feature_names != self.config.data.get_active_features:
+            raise ValueError("Active features changed since the last full training; fine-tuning can't reuse its scalers.")
+
+        cutoff = pd.Timestamp(bundle.cutoff)
+        # [cutoff, end_date) stops after the last settled session: a bar still forming
+        # would otherwise be trained on and then fall behind the new cutoff for good
+        end_date = end_date or (last_closed_session() + timedelta(days=1)).date().isoformat()
+        if pd.Timestamp(end_date) <= cutoff:
+            logger.info(f"Model v{bundle.version} already covers everything before {end_date}.")
+            return {"version": bundle.version, "updated": False, "new_windows": 0}
+
+        model = bundle.model
+        feature_scaler = bundle.feature_scaler.to_scaler()
+        target_scaler = bundle.target_scaler.to_scaler()
+        new_windows, replay_windows = self._windows(bundle, cutoff, end_date, feature_scaler, target_scaler)
+        if not len(new_windows):
+            logger.info(f"No new bars since {cutoff.date()}, keeping v{bundle.version}.")
+            return {"version": bundle.version, "updated": False, "new_windows": 0}
+
+        # Scores on the new bars before training on them are honest out-of-sample numbers
+        before, _, _ = ModelEvaluator.evaluate_windows(model, new_windows, target_scaler)
+        X, y = self._training_set(new_windows, replay_windows)
+
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=self.fine_tune.learning_rate), loss='huber',
+                      jit_compile=self.config.model.jit_compile)
+        history = model.fit(
+            X, y,
+            epochs=self.fine_tune.epochs,
+            batch_size=self.fine_tune.batch_size,
+            shuffle=True,
+            verbose=1
+        )
+        after, _, _ = ModelEvaluator.evaluate_windows(model, new_windows, target_scaler)
+
+        # Same scalers, features and mapping as the parent - only the weights and cutoff move
+        new_bundle = ModelBundle(
+            model=model,
+            feature_scaler=bundle.feature_scaler,
+            target_scaler=bundle.target_scaler,
+            feature_names=bundle.feature_names,
+            time_steps=bundle.time_steps,
+            stock_identifier_mapping=bundle.stock_identifier_mapping,
+            cutoff=end_date,
+            metadata={
+                **{k: v for k, v in bundle.metadata.items() if k != "created_at"},
+                "kind": "incremental",
+                "parent_version": bundle.version,
+                "previous_cutoff": bundle.cutoff,
+                "new_windows": len(new_windows),
+                "replay_windows": len(y) - len(new_windows),
+            },
+        )
+        version = self.registry.publish(new_bundle)
+        logger.info(f"Published v{version}: Close MAPE on new bars {before['overall']['MAPE']['Close']:.4f} -> "
+                    f"{after['overall']['MAPE']['Close']:.4f}")
+        return {
+            "version": version,
+            "updated": True,
+            "new_windows": len(new_windows),
+            "replay_windows": len(y) - len(new_windows),
+            "history": history.history,
+            "metrics_before": before,
+            "metrics_after": after,
+        }
+
+    def _windows(self, bundle: ModelBundle, cutoff: pd.Timestamp, end_date: str,
+                 feature_scaler, target_scaler) -> Tuple[SequenceWindows, SequenceWindows]:
+        """New windows (targets at or after the cutoff) and the replay pool just before them."""
+        time_steps = bundle.time_steps
+        sessions = self.fine_tune.replay_sessions + time_steps + INDICATOR_WARMUP
+        # ~5 sessions per 7 calendar days, plus slack for holidays
+        start = (cutoff - timedelta(days=math.ceil(sessions * 7 / 5) + 10)).date().isoformat()
+
+        fetcher = DataFetcher(self.config.data)
+        symbols = bundle.metadata.get("symbols") or list(bundle.stock_identifier_mapping)
+        raw = fetcher.fetch_many_raw(symbols, start, end_date)
+        windows = DataPreprocessor(self.config.data).transform_multiple(
+            fetcher.add_features_many(raw), feature_scaler, target_scaler
+        )
+
+        new, replay = [], []
+        for s in windows.series:
+            # dropna only trims the indicator warmup at the front, so the new bars are the tail
+            # Yahoo without the bar cache hands back a tz-aware index; the cutoff is a plain date
+            index = pd.DatetimeIndex(raw[s.symbol].index)
+            if index.tz is not None:
+                index = index.tz_localize(None)
+            n_new = min(int((index >= cutoff).sum()), len(s))
+            boundary = s.stop - n_new
+            new.append(SymbolSeries(s.symbol, s.stock_id, s.features, s.targets, boundary, s.stop))
+            replay.append(SymbolSeries(s.symbol, s.stock_id, s.features, s.targets,
+                                       max(s.start, boundary - self.fine_tune.replay_sessions), boundary))
+        return SequenceWindows(new, time_steps), SequenceWindows(replay, time_steps)
+
+    def _training_set(self, new_windows: SequenceWindows,
+                      replay_windows: SequenceWindows) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        X, y = new_windows.materialize()
+        n_replay = min(len(replay_windows), int(len(new_windows) * self.fine_tune.replay_ratio))
+        if n_replay == 0:
+            return X, y
+        rng = np.random.default_rng(self.fine_tune.seed)
+        X_replay, y_replay = replay_windows.take(np.sort(rng.choice(len(replay_windows), n_replay, replace=False)))
+        return {
+            key: np.concatenate([X[key], X_replay[key].astype(X[key].dtype, copy=False)]) for key in X
+        }, np.concatenate([y, y_replay])
+
+
+def main():
+    result = IncrementalUpdater().update()
+    if result["updated"]:
+        print(f"v{result['version']}: {result['new_windows']} new + {result['replay_windows']} replay windows")
+        print("Before:", result["metrics_before"]["overall"])
+        print("After:", result["metrics_after"]["overall"])
+    else:
+        print(f"Nothing to do, still serving v{result['version']}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import time
+from typing import Optional
+import numpy as np
+import tensorflow as tf
+from data.sequence_windows import SequenceWindows
+from modal.training_callbacks import InputTimer
+
+
+def make_dataset(windows: SequenceWindows, batch_size: int, shuffle: bool = False,
+                 shuffle_buffer: int = 10000, seed: int = None,
+                 timer: Optional[InputTimer] = None) -> tf.data.Dataset:
+    """Stream ``({'price_input', 'stock_input'}, y)`` batches straight from SequenceWindows.
+
+    Only window indices flow through the shuffle buffer; each batch is gathered
+    from the per-symbol source rows in a parallel map and prefetched, so memory
+    stays flat no matter how many windows there are. ``timer`` accumulates the
+    time spent gathering batches.
+    """
+    n = len(windows)
+    if n == 0:
+        raise ValueError("Cannot build a dataset from zero windows.")
+
+    time_steps, n_features = windows.time_steps, windows.n_features
+    feature_dtype = tf.as_dtype(windows.series[0].features.dtype)
+    target_dtype = tf.as_dtype(windows.series[0].targets.dtype)
+    n_targets = windows.series[0].targets.shape[1]
+
+    def _gather(indices: np.ndarray):
+        started = time.perf_counter()
+        X, y = windows.take(indices)
+        if timer is not None:
+            timer.add(time.perf_counter() - started)
+        return X['price_input'], X['stock_input'], y
+
+    def _load(indices):
+        price, stock, y = tf.numpy_function(_gather, [indices], [feature_dtype, tf.int64, target_dtype])
+        price.set_shape([None, time_steps, n_features])
+        stock.set_shape([None])
+        y.set_shape([None, n_targets])
+        return {'price_input': price, 'stock_input': stock}, y
+
+    ds = tf.data.Dataset.range(n)
+    if shuffle:
+        ds = ds.shuffle(min(shuffle_buffer, n), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(_load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    return ds.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,92 @@
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+from data.stock_config import Config
+from data.inference_backends import KerasFastPath
+from data.model_bundle import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LatencyConfig:
+    version: Optional[int] = None      # None = the registry's current version
+    repeats: int = 500
+    warmup: int = 20
+    seed: int = 42
+    output_dir: Path = Path("results/benchmark")
+
+    def __post_init__(self):
+        self.output_dir = Path(self.output_dir)
+
+
+def call_latency_ms(predict: Callable[[Dict[str, np.ndarray]], np.ndarray], X: Dict[str, np.ndarray],
+                    repeats: int, warmup: int) -> Dict[str, float]:
+    """p50/p99/mean of one ``predict(X)`` call, after ``warmup`` untimed calls."""
+    for _ in range(warmup):
+        predict(X)
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict(X)
+        latencies.append(time.perf_counter() - started)
+    latencies = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.median(latencies)), 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+        "mean_ms": round(float(latencies.mean()), 4),
+    }
+
+
+class SingleSampleLatency:
+    """Stopwatch for the serving path - one window, Model.predict vs KerasFastPath
+
+    Loads the published Keras bundle, times a batch-of-one prediction through
+    both paths on the same random window and checks that their outputs match.
+    """
+
+    def __init__(self, latency: Optional[LatencyConfig] = None, config: Optional[Config] = None):
+        self.latency = latency or LatencyConfig()
+        self.config = config or Config()
+
+    def run(self) -> Dict[str, Any]:
+        bundle = ModelRegistry(self.config.registry_path).load(self.latency.version, compile=False)
+        rng = np.random.default_rng(self.latency.seed)
+        X = {
+            'price_input': rng.random((1, bundle.time_steps, len(bundle.feature_names)), dtype=np.float32),
+            'stock_input': np.array([[rng.integers(len(bundle.stock_identifier_mapping))]], dtype=np.int32),
+        }
+        fast = KerasFastPath(bundle.model)
+        max_abs_diff = float(np.abs(bundle.model.predict(X, verbose=0) - fast.predict(X)).max())
+
+        result = {
+            "version": bundle.version,
+            "model_predict": call_latency_ms(lambda x: bundle.model.predict(x, verbose=0), X,
+                                             self.latency.repeats, self.latency.warmup),
+            "fast_path": call_latency_ms(fast.predict, X, self.latency.repeats, self.latency.warmup),
+            "max_abs_diff": max_abs_diff,
+            "config": asdict(self.latency),
+        }
+        result["speedup_p50"] = round(result["model_predict"]["p50_ms"] / result["fast_path"]["p50_ms"], 2)
+
+        out = self.latency.output_dir
+        out.mkdir(parents=True, exist_ok=True)
+        with open(out / "single_sample_latency.json", "w") as f:
+            json.dump(result, f, indent=2, default=str)
+        logger.info(f"Single-sample latency written to {out}")
+        return result
+
+
+def main():
+    result = SingleSampleLatency().run()
+    for path in ("model_predict", "fast_path"):
+        print(f"{path:>14}: p50={result[path]['p50_ms']}ms p99={result[path]['p99_ms']}ms")
+    print(f"speedup (p50): {result['speedup_p50']}x, max |diff| = {result['max_abs_diff']:.2e}")
+
+
+if __name__ == "__main__":
+    main()
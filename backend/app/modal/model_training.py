@@ -1,7 +1,26 @@
-from typing import Dict, Any    
+import hashlib
+from dataclasses import asdict
+from typing import Dict, Any, List, Optional, Tuple
 import tensorflow as tf
 import numpy as np
 from data.stock_config import ModelConfig
+from data.sequence_windows import SequenceWindows
+from data.stage_cache import fingerprint
+from modal.input_pipeline import make_dataset
+from modal.training_callbacks import EpochTelemetry, InputTimer, TrainingCheckpoint
+
+# Where and how often to save, not what is trained: changing them keeps a checkpoint resumable
+_RUN_CONTROL_FIELDS = ("epochs", "checkpoint_dir", "checkpoint_every", "telemetry_dir")
+
+
+def _data_key(*arrays: np.ndarray) -> str:
+    """Digest of the training arrays, so a checkpoint is only resumed on the data it was trained on."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        digest.update(str(array.shape).encode())
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:16]
+
 
 class ModelTrainer:
     """The Training Grounds"""
@@ -10,11 +29,60 @@ class ModelTrainer:
     
     def train(self, model: tf.keras.Model, 
               X_train: Dict[str, np.ndarray], y_train: np.ndarray,
-              X_val: Dict[str, np.ndarray], y_val: np.ndarray) -> Dict[str, Any]:
+              X_val: Dict[str, np.ndarray], y_val: np.ndarray,
+              extra_callbacks: Optional[List[tf.keras.callbacks.Callback]] = None,
+              run_key: Optional[str] = None) -> Dict[str, Any]:
         
         # Ensuring data is properly preprocessed
         self._check_preprocessed_data(X_train, X_val)
         
+        # Model training
+        if self.config.checkpoint_dir and run_key is None:
+            run_key = _data_key(X_train['stock_input'], y_train, y_val)
+        callbacks, initial_epoch = self._callbacks(len(y_train), run_key=run_key)
+        history = model.fit(
+            X_train, y_train,
+            validation_data=(X_val, y_val), 
+            epochs=self.config.epochs,
+            initial_epoch=initial_epoch,
+            batch_size=self.config.batch_size,
+            callbacks=callbacks + list(extra_callbacks or []),
+            verbose=1
+        )
+        return self._summarize(history)
+
+    def train_on_windows(self, model: tf.keras.Model,
+                         train_windows: SequenceWindows, val_windows: SequenceWindows,
+                         extra_callbacks: Optional[List[tf.keras.callbacks.Callback]] = None,
+                         run_key: Optional[str] = None) -> Dict[str, Any]:
+        """Train from lazily gathered windows instead of fully materialized arrays.
+
+        ``run_key`` identifies the data (e.g. the pipeline's stage key) for checkpoint
+        resume; without it the windows' source rows are hashed.
+        """
+        self._check_windows(train_windows, val_windows)
+
+        input_timer = InputTimer() if self.config.telemetry_dir else None
+        train_ds = make_dataset(train_windows, self.config.batch_size, shuffle=True,
+                                shuffle_buffer=self.config.shuffle_buffer, timer=input_timer)
+        val_ds = make_dataset(val_windows, self.config.batch_size)
+
+        if self.config.checkpoint_dir and run_key is None:
+            run_key = _data_key(*(s.targets for s in train_windows.series + val_windows.series))
+        callbacks, initial_epoch = self._callbacks(len(train_windows), input_timer, run_key)
+        history = model.fit(
+            train_ds,
+            validation_data=val_ds,
+            epochs=self.config.epochs,
+            initial_epoch=initial_epoch,
+            callbacks=callbacks + list(extra_callbacks or []),
+            verbose=1
+        )
+        return self._summarize(history)
+
+    def _callbacks(self, n_samples: int, input_timer: Optional[InputTimer] = None,
+                   run_key: Optional[str] = None) -> Tuple[list, int]:
+        """Callbacks for the run and the epoch to start from (non-zero when resuming a checkpoint)."""
         # Callbacks for early stopping and learning rate reduction
         callbacks = [
             tf.keras.callbacks.EarlyStopping(
@@ -28,17 +96,20 @@ class ModelTrainer:
                 patience=self.config.patience
             )
         ]
-        
-        # Model training
-        history = model.fit(
-            X_train, y_train,
-            validation_data=(X_val, y_val), 
-            epochs=self.config.epochs,
-            batch_size=self.config.batch_size,
-            callbacks=callbacks,
-            verbose=1
-        )
-        
+        initial_epoch = 0
+        if self.config.checkpoint_dir:
+            # Goes after the callbacks it tracks so it can restore their state on resume
+            config = {k: v for k, v in asdict(self.config).items() if k not in _RUN_CONTROL_FIELDS}
+            checkpoint = TrainingCheckpoint(self.config.checkpoint_dir, self.config.checkpoint_every, list(callbacks),
+                                            fingerprint=fingerprint({"config": config, "data": run_key}))
+            initial_epoch = checkpoint.resume_epoch()
+            callbacks.append(checkpoint)
+        if self.config.telemetry_dir:
+            callbacks.append(EpochTelemetry(self.config.telemetry_dir, n_samples, input_timer, initial_epoch))
+        return callbacks, initial_epoch
+
+    @staticmethod
+    def _summarize(history) -> Dict[str, Any]:
         # Log training and validation loss
         train_loss = history.history.get("loss", [])
         val_loss = history.history.get("val_loss", [])
@@ -46,6 +117,16 @@ class ModelTrainer:
         # Return or log metrics
         return history.history, {"train_loss": train_loss, "val_loss": val_loss}
 
+    def _check_windows(self, train_windows: SequenceWindows, val_windows: SequenceWindows) -> None:
+        """Same checks as _check_preprocessed_data, run once on the source rows"""
+        if len(train_windows) == 0 or len(val_windows) == 0:
+            raise ValueError("Training and validation splits must both contain windows.")
+        for s in train_windows.series + val_windows.series:
+            if np.any(np.isnan(s.features)):
+                raise ValueError("Training and validation data contain NaN values. Please ensure data is preprocessed correctly.")
+            if s.features.min() < 0 or s.features.max() > 1:
+                raise ValueError("Expected scaled data within range [0, 1]. Please ensure data is preprocessed correctly.")
+
     def _check_preprocessed_data(self, X_train: Dict[str, np.ndarray], X_val: Dict[str, np.ndarray]) -> None:
         """Ensure data is properly scaled or normalized"""
         for key in X_train:
@@ -1,17 +1,27 @@
 import logging
 from pathlib import Path
-import pickle
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping, Optional
 import json
 from datetime import datetime
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from data.stock_config import Config, DataConfig, ModelConfig
+from modal.runtime import check_runtime, configure_runtime
+
+# The oneDNN flag and thread pools only take effect if set before TensorFlow is
+# imported, and the modules below import it: apply the performance profile first.
+# ModelConfig reads it from the environment, so this is the run's own profile
+configure_runtime(ModelConfig())
+
 from data.dataFetcher import DataFetcher
 from data.data_preprocessor import DataPreprocessor
-from model.architecture import StockPredictor
-from model.model_training import ModelTrainer
-from model.evaluation import ModelEvaluator
+from data.feature_store import FeatureStore
+from data.model_bundle import ModelBundle, ModelRegistry
+from data.stage_cache import StageCache, stage_keys
+from modal.architecture import StockPredictor
+from modal.model_training import ModelTrainer
+from modal.evaluation import ModelEvaluator
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +35,9 @@ class StockPredictionPipeline:
         self.config = Config()
         self.setup_directories()
         self.results_cache = {}
+        self.stage_report: Dict[str, str] = {}
+        # Stage key of the training windows, when they came from the stage cache
+        self.run_key: Optional[str] = None
         
     def setup_directories(self):
         """Create necessary directories"""
@@ -38,70 +51,188 @@ class StockPredictionPipeline:
         for dir_path in dirs:
             dir_path.mkdir(parents=True, exist_ok=True)
 
+    def prepare_data(self, symbols: List[str], start_date: str, end_date: str):
+        """Fetch -> features -> scale -> window.
+
+        Returns ``(train_windows, val_windows, test_windows, feature_scaler, target_scaler)``
+        with each split chronological within every symbol.
+        """
+        fetcher = DataFetcher(self.config.data)
+        preprocessor = DataPreprocessor(self.config.data)
+
+        if self.config.data.stage_cache:
+            # Honours out_of_core too: the fetch and features stages then stream symbol by symbol
+            return self._prepare_with_stage_cache(fetcher, preprocessor, symbols, start_date, end_date)
+
+        if self.config.data.out_of_core:
+            # One symbol in memory at a time; windows are read from memory maps
+            store = FeatureStore(self.config.base_path / "features", dtype=self.config.data.dtype)
+            stock_data = fetcher.lazy_frames(symbols, start_date, end_date)
+            windows, feature_scaler, target_scaler = preprocessor.preprocess_to_store(stock_data, store)
+        else:
+            # Fetch data for all stocks concurrently
+            stock_data = fetcher.fetch_many(symbols, start_date, end_date)
+            windows, feature_scaler, target_scaler = preprocessor.preprocess_multiple(stock_data, lazy=True)
+
+        # Split data chronologically within each symbol
+        train_windows, val_windows, test_windows = windows.split(
+            self.config.data.train_split, self.config.data.val_split
+        )
+        return train_windows, val_windows, test_windows, feature_scaler, target_scaler
+
+    def _prepare_with_stage_cache(self, fetcher: DataFetcher, preprocessor: DataPreprocessor,
+                                  symbols: List[str], start_date: str, end_date: str):
+        """prepare_data, reusing every stage whose config fingerprint is unchanged"""
+        cache = StageCache(self.config.base_path / "stages")
+        keys = stage_keys(self.config.data, symbols, start_date, end_date)
+        dtype = self.config.data.dtype
+
+        if cache.has("scale", keys["scale"]):
+            cache.mark("fetch", "skipped")
+            cache.mark("features", "skipped")
+            feature_scaler, target_scaler = cache.load_scalers(keys["scale"])
+            cache.mark("scale", "hit")
+        else:
+            frames = self._cached_features(cache, keys, fetcher, symbols, start_date, end_date)
+            store = FeatureStore(cache.begin("scale", keys["scale"]), dtype=dtype)
+            _, feature_scaler, target_scaler = preprocessor.preprocess_to_store(frames, store)
+            cache.save_scalers(keys["scale"], feature_scaler, target_scaler)
+            cache.mark("scale", "miss")
+
+        windows = FeatureStore(cache.path("scale", keys["scale"]), dtype=dtype).open_windows()
+        if cache.has("window", keys["window"]):
+            splits = cache.load_splits(keys["window"], windows)
+            cache.mark("window", "hit")
+        else:
+            splits = windows.split(self.config.data.train_split, self.config.data.val_split)
+            cache.save_splits(keys["window"], splits)
+            cache.mark("window", "miss")
+
+        self.run_key = keys["window"]
+        self.stage_report = dict(cache.report)
+        logger.info(f"Stage cache report: {self.stage_report}")
+        return (*splits, feature_scaler, target_scaler)
+
+    def _cached_features(self, cache: StageCache, keys: Dict[str, str], fetcher: DataFetcher,
+                         symbols: List[str], start_date: str, end_date: str) -> Mapping[str, pd.DataFrame]:
+        if self.config.data.out_of_core:
+            return self._streamed_features(cache, keys, fetcher, symbols, start_date, end_date)
+        if cache.has("features", keys["features"]):
+            cache.mark("fetch", "skipped")
+            cache.mark("features", "hit")
+            return cache.load_frames("features", keys["features"])
+
+        if cache.has("fetch", keys["fetch"]):
+            raw = cache.load_frames("fetch", keys["fetch"])
+            cache.mark("fetch", "hit")
+        else:
+            raw = fetcher.fetch_many_raw(symbols, start_date, end_date)
+            cache.save_frames("fetch", keys["fetch"], raw)
+            cache.mark("fetch", "miss")
+
+        frames = fetcher.add_features_many(raw)
+        cache.save_frames("features", keys["features"], frames)
+        cache.mark("features", "miss")
+        return frames
+
+    def _streamed_features(self, cache: StageCache, keys: Dict[str, str], fetcher: DataFetcher,
+                           symbols: List[str], start_date: str, end_date: str) -> Mapping[str, pd.DataFrame]:
+        """_cached_features for out_of_core: fetch and features run one symbol at a time,
+        and the result is a lazy mapping over the stored frames, so at most one
+        symbol is ever in memory."""
+        if cache.has("features", keys["features"]):
+            cache.mark("fetch", "skipped")
+            cache.mark("features", "hit")
+            return cache.lazy_frames("features", keys["features"])
+
+        raw_hit = cache.has("fetch", keys["fetch"])
+        stored_raw = cache.lazy_frames("fetch", keys["fetch"]) if raw_hit else None
+        raw_path = None if raw_hit else cache.begin("fetch", keys["fetch"])
+        features_path = cache.begin("features", keys["features"])
+        for symbol in symbols:
+            if raw_hit:
+                raw = stored_raw[symbol]
+            else:
+                raw = fetcher.fetch_raw(symbol, start_date, end_date)
+                cache.save_frame(raw_path, symbol, raw)
+            cache.save_frame(features_path, symbol, fetcher.add_features_many({symbol: raw})[symbol])
+
+        if not raw_hit:
+            cache.finish_frames("fetch", keys["fetch"], symbols)
+        cache.mark("fetch", "hit" if raw_hit else "miss")
+        cache.finish_frames("features", keys["features"], symbols)
+        cache.mark("features", "miss")
+        return cache.lazy_frames("features", keys["features"])
+
     def train_multiple_stocks(self, symbols: List[str], start_date: str, end_date: str) -> Dict[str, Any]:
         """Train one model for multiple stocks"""
         logger.info(f"Starting training pipeline for stocks: {symbols}")
+        # A profile changed on self.config after import can no longer be applied: refuse it
+        check_runtime(self.config.model)
         
         try:
-            # Initialize components
-            fetcher = DataFetcher(self.config.data)
-            preprocessor = DataPreprocessor(self.config.data)
-            
-            # Fetch data for all stocks
-            stock_data = {}
-            for symbol in symbols:
-                df = fetcher.fetch_data(symbol, start_date, end_date)
-                stock_data[symbol] = df
-                
-            (X_dict, y_array), feature_scaler, target_scaler = preprocessor.preprocess_multiple(stock_data)
-            
-            # Split data
-            train_size = int(len(X_dict['price_input']) * self.config.data.train_split)
-            val_size = int(len(X_dict['price_input']) * self.config.data.val_split)
-            
-            splits = {
-                'train': ({
-                    'price_input': X_dict['price_input'][:train_size],
-                    'stock_input': X_dict['stock_input'][:train_size]
-                }, y_array[:train_size]),
-                'val': ({
-                    'price_input': X_dict['price_input'][train_size:train_size + val_size],
-                    'stock_input': X_dict['stock_input'][train_size:train_size + val_size]
-                }, y_array[train_size:train_size + val_size]),
-                'test': ({
-                    'price_input': X_dict['price_input'][train_size + val_size:],
-                    'stock_input': X_dict['stock_input'][train_size + val_size:]
-                }, y_array[train_size + val_size:])
-            }
+            train_windows, val_windows, test_windows, feature_scaler, target_scaler = self.prepare_data(
+                symbols, start_date, end_date
+            )
             # Initialize and train model
-            input_shape = (X_dict['price_input'].shape[1], X_dict['price_input'].shape[2])
+            input_shape = (train_windows.time_steps, train_windows.n_features)
             predictor = StockPredictor(self.config.model, input_shape ,self.config.data.stock_identifier_mapping)
             trainer = ModelTrainer(self.config.model)
             
             # Train
-            history, metrics = trainer.train(
-                predictor.model,
-                splits['train'][0], splits['train'][1],
-                splits['val'][0], splits['val'][1]
-            )
+            if self.config.model.streaming_input:
+                history, metrics = trainer.train_on_windows(predictor.model, train_windows, val_windows,
+                                                            run_key=self.run_key)
+            else:
+                X_train, y_train = train_windows.materialize()
+                X_val, y_val = val_windows.materialize()
+                history, metrics = trainer.train(predictor.model, X_train, y_train, X_val, y_val,
+                                                 run_key=self.run_key)
             
-            # Save model
-            model_path = self.config.model_path / "multi_stock_model.keras"
-            predictor.model.save(model_path)
+            # Held-out scores, one forward pass over the whole test split
+            if len(test_windows):
+                test_metrics, _, _ = ModelEvaluator.evaluate_windows(predictor.model, test_windows, target_scaler)
+                metrics['test'] = test_metrics
+                logger.info(f"Test metrics: {test_metrics['overall']}")
+
+                # float32 end to end should not move predictions compared to a float64 reference.
+                # Reported, not enforced: a drifting window shouldn't throw away a finished run
+                X_probe, _ = test_windows.take(np.array([0]))
+                raw_window = feature_scaler.inverse_transform(X_probe['price_input'][0])
+                try:
+                    parity = ModelEvaluator.check_dtype_parity(
+                        predictor.model, raw_window, int(X_probe['stock_input'][0]), feature_scaler, target_scaler
+                    )
+                    metrics['dtype_parity'] = parity
+                    if parity['within_tolerance']:
+                        logger.info(f"float32 vs float64 prediction drift: {parity}")
+                    else:
+                        logger.warning(f"float32 predictions drift from the float64 reference: {parity}")
+                except Exception as e:
+                    logger.warning(f"Skipping the float32/float64 parity check: {e}")
+
+            # Publish model, scaler parameters, feature order and cutoff as one bundle
             print("🛠 feature_scaler.n_features_in_ =", feature_scaler.n_features_in_)
             print("🛠 target_scaler.n_features_in_  =", target_scaler.n_features_in_)
-            # Save scalers
-            feature_scaler_path = self.config.model_path / "multi_stock_feature_scaler.pkl"
-            target_scaler_path = self.config.model_path / "multi_stock_target_scaler.pkl"
-            with open(feature_scaler_path, "wb") as f:
-                pickle.dump(feature_scaler, f)
-            with open(target_scaler_path, "wb") as f:
-                pickle.dump(target_scaler, f)
+            bundle = ModelBundle.from_training(
+                predictor.model, feature_scaler, target_scaler,
+                feature_names=self.config.data.get_active_features,
+                time_steps=self.config.data.time_steps,
+                stock_identifier_mapping=self.config.data.stock_identifier_mapping,
+                cutoff=end_date,
+                kind="full",
+                symbols=symbols,
+                start_date=start_date,
+                architecture=self.config.model.architecture,
+            )
+            version = ModelRegistry(self.config.registry_path).publish(bundle)
 
             return {
                 'symbols': symbols,
                 'history': history,
-                'metrics': metrics
+                'metrics': metrics,
+                'stages': self.stage_report,
+                'version': version
             }
             
         except Exception as e:
@@ -0,0 +1,64 @@
+import logging
+import os
+import sys
+from typing import Optional, Tuple
+from data.stock_config import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+# (onednn, intra_op_threads, inter_op_threads) last applied in this process
+_applied: Optional[Tuple] = None
+
+
+def _profile(config: ModelConfig) -> Tuple:
+    return config.onednn, config.intra_op_threads, config.inter_op_threads
+
+
+def configure_runtime(config: ModelConfig) -> None:
+    """Apply the CPU side of the performance profile: oneDNN toggle and thread pools.
+
+    Call it before anything imports TensorFlow: modal.pipeline does so at import
+    time, modal.benchmark in each variant process. The oneDNN flag and the thread
+    variables are read when TensorFlow is imported, so if that already happened
+    they are ignored with a warning. Use check_runtime to make sure a run's
+    config is the one that was applied.
+    """
+    global _applied
+    _applied = _profile(config)
+    if "tensorflow" in sys.modules and (config.intra_op_threads or config.inter_op_threads):
+        logger.warning("TensorFlow is already imported; thread pool sizes only apply if it hasn't run an op yet.")
+    if config.onednn is not None:
+        if "tensorflow" in sys.modules:
+            logger.warning("TensorFlow is already imported; onednn=%s only applies to new processes.", config.onednn)
+        os.environ["TF_ENABLE_ONEDNN_OPTS"] = "1" if config.onednn else "0"
+    if config.intra_op_threads:
+        os.environ["OMP_NUM_THREADS"] = str(config.intra_op_threads)
+        os.environ["TF_NUM_INTRAOP_THREADS"] = str(config.intra_op_threads)
+    if config.inter_op_threads:
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(config.inter_op_threads)
+
+    import tensorflow as tf
+    try:
+        if config.intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(config.intra_op_threads)
+        if config.inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(config.inter_op_threads)
+    except RuntimeError:
+        logger.warning("TensorFlow runtime already initialized; thread counts unchanged.")
+
+
+def check_runtime(config: ModelConfig) -> None:
+    """Raise if ``config``'s CPU profile isn't the one configure_runtime applied.
+
+    The profile can't be changed once TensorFlow is loaded, so a run whose
+    config asks for different threads or oneDNN would otherwise silently run
+    with the applied one. Set it through MODEL_INTRA_OP_THREADS,
+    MODEL_INTER_OP_THREADS and MODEL_ONEDNN instead.
+    """
+    if _applied is not None and _profile(config) != _applied:
+        names = ("onednn", "intra_op_threads", "inter_op_threads")
+        raise ValueError(
+            f"Runtime profile {dict(zip(names, _profile(config)))} differs from the one applied before "
+            f"TensorFlow was imported {dict(zip(names, _applied))}. Set MODEL_INTRA_OP_THREADS, "
+            f"MODEL_INTER_OP_THREADS or MODEL_ONEDNN before starting the process."
+        )
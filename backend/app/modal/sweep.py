@@ -0,0 +1,280 @@
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, fields, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+from data.stock_config import Config, ModelConfig
+from data.stage_cache import StageCache, stage_keys
+
+# TensorFlow is imported lazily: sweep workers must pin their thread pools
+# before TF initializes its runtime, which happens on first import.
+
+logger = logging.getLogger(__name__)
+
+SEARCHABLE = {f.name for f in fields(ModelConfig)}
+
+
+@dataclass
+class SweepConfig:
+    # {"learning_rate": [1e-3, 3e-4], "lstm_units": [[64, 32], [128, 64]], ...}
+    search_space: Dict[str, List[Any]]
+    sweep_dir: Path = Path("results/sweep")
+    n_trials: Optional[int] = None  # None = full grid, otherwise random sample
+    seed: int = 42
+    workers: Optional[int] = None   # defaults to cores // threads_per_trial
+    threads_per_trial: int = 2
+    prune_warmup_epochs: int = 3
+    prune_min_trials: int = 3
+
+    def __post_init__(self):
+        self.sweep_dir = Path(self.sweep_dir)
+        unknown = set(self.search_space) - SEARCHABLE
+        if unknown:
+            raise ValueError(f"Not ModelConfig fields, can't search over them: {sorted(unknown)}")
+        if any(not values for values in self.search_space.values()):
+            raise ValueError("Every search space entry needs at least one value.")
+        if self.threads_per_trial < 1:
+            raise ValueError("threads_per_trial must be at least 1.")
+
+
+def generate_trials(sweep: SweepConfig) -> List[Dict[str, Any]]:
+    """Full grid, or a seeded random sample of it when ``n_trials`` is set."""
+    keys = sorted(sweep.search_space)
+    grid = [dict(zip(keys, combo)) for combo in itertools.product(*(sweep.search_space[k] for k in keys))]
+    if sweep.n_trials is not None and sweep.n_trials < len(grid):
+        grid = random.Random(sweep.seed).sample(grid, sweep.n_trials)
+    return grid
+
+
+class MedianPruner:
+    """Senzu bean rationing - trials that fall behind the median stop eating compute
+
+    Every trial appends ``{"epoch", "val_loss"}`` lines to ``<trials_dir>/<trial_id>.jsonl``.
+    After ``warmup_epochs``, a trial whose val_loss is worse than the median of the
+    other trials at the same epoch is pruned. The files are the only shared state,
+    so this works across worker processes.
+    """
+
+    def __init__(self, trials_dir: Path, warmup_epochs: int = 3, min_trials: int = 3):
+        self.trials_dir = Path(trials_dir)
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+
+    def report(self, trial_id: str, epoch: int, val_loss: float) -> None:
+        with open(self.trials_dir / f"{trial_id}.jsonl", "a") as f:
+            f.write(json.dumps({"epoch": epoch, "val_loss": val_loss}) + "\n")
+
+    def should_prune(self, trial_id: str, epoch: int, val_loss: float) -> bool:
+        if epoch < self.warmup_epochs:
+            return False
+        peers = []
+        for path in self.trials_dir.glob("*.jsonl"):
+            if path.stem == trial_id:
+                continue
+            for line in path.read_text().splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A peer may be halfway through appending its latest line
+                    continue
+                if record["epoch"] == epoch:
+                    peers.append(record["val_loss"])
+                    break
+        if len(peers) < self.min_trials:
+            return False
+        return val_loss > float(np.median(peers))
+
+
+def _pruning_callback(pruner: MedianPruner, trial_id: str):
+    import tensorflow as tf
+
+    class PruneOnMedian(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.pruned_at: Optional[int] = None
+
+        def on_epoch_end(self, epoch, logs=None):
+            val_loss = (logs or {}).get("val_loss")
+            if val_loss is None:
+                return
+            pruner.report(trial_id, epoch, float(val_loss))
+            if pruner.should_prune(trial_id, epoch, float(val_loss)):
+                logger.info(f"Trial {trial_id} pruned at epoch {epoch} (val_loss={val_loss:.5f})")
+                self.pruned_at = epoch
+                self.model.stop_training = True
+
+    return PruneOnMedian()
+
+
+def _init_worker(threads: int) -> None:
+    """Pin each worker's thread pools so N trials share the cores instead of fighting over them."""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _run_trial(trial_id: str, params: Dict[str, Any], base_model: Dict[str, Any],
+               stock_identifier_mapping: Dict[str, int], cache_root: str,
+               scale_key: str, window_key: str, trials_dir: str,
+               warmup_epochs: int, min_trials: int, seed: int) -> Dict[str, Any]:
+    """One trial inside a worker process. The dataset is re-opened from the stage
+    cache as read-only memory maps, so every worker shares the same page cache."""
+    import tensorflow as tf
+    from data.feature_store import FeatureStore
+    from modal.architecture import StockPredictor
+    from modal.model_training import ModelTrainer
+
+    started = time.time()
+    tf.keras.utils.set_random_seed(seed)
+    model_config = replace(ModelConfig(**base_model), **params)
+    # Trials run side by side, so each one gets its own checkpoint/telemetry directory
+    if model_config.checkpoint_dir:
+        model_config.checkpoint_dir = str(Path(model_config.checkpoint_dir) / trial_id)
+    if model_config.telemetry_dir:
+        model_config.telemetry_dir = str(Path(model_config.telemetry_dir) / trial_id)
+
+    cache = StageCache(Path(cache_root))
+    windows = FeatureStore(cache.path("scale", scale_key)).open_windows()
+    train_windows, val_windows, _ = cache.load_splits(window_key, windows)
+
+    predictor = StockPredictor(model_config, (train_windows.time_steps, train_windows.n_features),
+                               stock_identifier_mapping)
+    pruner = MedianPruner(Path(trials_dir), warmup_epochs, min_trials)
+    prune_callback = _pruning_callback(pruner, trial_id)
+
+    trainer = ModelTrainer(model_config)
+    if model_config.streaming_input:
+        history, _ = trainer.train_on_windows(predictor.model, train_windows, val_windows,
+                                              extra_callbacks=[prune_callback])
+    else:
+        X_train, y_train = train_windows.materialize()
+        X_val, y_val = val_windows.materialize()
+        history, _ = trainer.train(predictor.model, X_train, y_train, X_val, y_val,
+                                   extra_callbacks=[prune_callback])
+
+    val_losses = history.get("val_loss", [])
+    return {
+        "trial_id": trial_id,
+        "status": "pruned" if prune_callback.pruned_at is not None else "complete",
+        "best_val_loss": float(min(val_losses)) if val_losses else float("nan"),
+        "epochs_run": len(val_losses),
+        "duration_s": round(time.time() - started, 2),
+        "params": params,
+    }
+
+
+class SweepRunner:
+    """Shadow Clone Jutsu for hyperparameters - one dataset, many trials, all cores"""
+
+    def __init__(self, sweep: SweepConfig, config: Optional[Config] = None):
+        self.sweep = sweep
+        self.config = config or Config()
+        # Workers read the dataset straight from the stage cache
+        self.config.data.stage_cache = True
+
+    def run(self, symbols: List[str], start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        from modal.pipeline import StockPredictionPipeline
+
+        pipeline = StockPredictionPipeline()
+        pipeline.config = self.config
+        pipeline.prepare_data(symbols, start_date, end_date)
+        keys = stage_keys(self.config.data, symbols, start_date, end_date)
+
+        trials = generate_trials(self.sweep)
+        trials_dir = self.sweep.sweep_dir / "trials"
+        trials_dir.mkdir(parents=True, exist_ok=True)
+        for stale in trials_dir.glob("*.jsonl"):
+            stale.unlink()
+
+        workers = self.sweep.workers or max(1, (os.cpu_count() or 1) // self.sweep.threads_per_trial)
+        workers = min(workers, len(trials))
+        logger.info(f"Sweeping {len(trials)} trials on {workers} workers "
+                    f"x {self.sweep.threads_per_trial} threads")
+
+        base_model = asdict(self.config.model)
+        results = []
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.sweep.threads_per_trial,),
+        ) as pool:
+            futures = {}
+            for i, params in enumerate(trials):
+                trial_id = f"trial_{i:03d}"
+                future = pool.submit(
+                    _run_trial, trial_id, params, base_model,
+                    self.config.data.stock_identifier_mapping,
+                    str(self.config.base_path / "stages"), keys["scale"], keys["window"],
+                    str(trials_dir), self.sweep.prune_warmup_epochs, self.sweep.prune_min_trials,
+                    self.sweep.seed + i,
+                )
+                futures[future] = (trial_id, params)
+
+            for future in as_completed(futures):
+                trial_id, params = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Trial {trial_id} failed: {e}")
+                    result = {"trial_id": trial_id, "status": "failed", "best_val_loss": float("nan"),
+                              "epochs_run": 0, "duration_s": 0.0, "params": params, "error": str(e)}
+                results.append(result)
+                logger.info(f"{trial_id}: {result['status']} val_loss={result['best_val_loss']:.5f}")
+
+        leaderboard = self.write_leaderboard(results)
+        return leaderboard
+
+    def write_leaderboard(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Sort by best val_loss (failed trials last) and write CSV + JSON."""
+        leaderboard = sorted(
+            results,
+            key=lambda r: (r["status"] == "failed", np.nan_to_num(r["best_val_loss"], nan=np.inf)),
+        )
+        self.sweep.sweep_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.sweep.sweep_dir / "leaderboard.json", "w") as f:
+            json.dump(leaderboard, f, indent=2, default=str)
+
+        param_names = sorted(self.sweep.search_space)
+        with open(self.sweep.sweep_dir / "leaderboard.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["rank", "trial_id", "status", "best_val_loss", "epochs_run", "duration_s"] + param_names)
+            for rank, r in enumerate(leaderboard, start=1):
+                writer.writerow([rank, r["trial_id"], r["status"], r["best_val_loss"], r["epochs_run"],
+                                 r["duration_s"]] + [json.dumps(r["params"].get(p)) for p in param_names])
+        logger.info(f"Leaderboard written to {self.sweep.sweep_dir}")
+        return leaderboard
+
+
+def main():
+    sweep = SweepConfig(
+        search_space={
+            "learning_rate": [1e-3, 3e-4],
+            "lstm_units": [[64, 32], [128, 64]],
+            "dropout_rates": [[0.2, 0.3]],
+            "batch_size": [32, 64],
+        },
+        n_trials=6,
+    )
+    leaderboard = SweepRunner(sweep).run(
+        symbols=["AAPL", "MSFT", "GOOGL", "NVDA", "TSLA", "AMD", "META"],
+        start_date="2017-01-01",
+        end_date="2025-09-09",
+    )
+    print("Best trial:", leaderboard[0])
+
+
+if __name__ == "__main__":
+    main()
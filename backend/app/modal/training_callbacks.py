@@ -0,0 +1,229 @@
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+import tensorflow as tf
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Callback attributes that survive a resume; on_train_begin resets all of them
+_CALLBACK_STATE = {
+    "EarlyStopping": ("wait", "stopped_epoch", "best", "best_epoch"),
+    "ReduceLROnPlateau": ("wait", "best", "cooldown_counter"),
+}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, None where getrusage is missing."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class InputTimer:
+    """Seconds the input pipeline spent gathering batches, summed over its parallel workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seconds = 0.0
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._seconds += seconds
+
+    def take(self) -> float:
+        """Return the accumulated time and start counting from zero again."""
+        with self._lock:
+            seconds, self._seconds = self._seconds, 0.0
+        return seconds
+
+
+class TrainingCheckpoint(tf.keras.callbacks.Callback):
+    """Kage Bunshin save point - model, optimizer and callback state every few epochs
+
+    ``last.keras`` holds the model with its optimizer state, ``state.json`` the
+    epoch, learning rate and EarlyStopping/ReduceLROnPlateau counters, and
+    ``best_weights.npz`` EarlyStopping's best weights. It must come after the
+    callbacks it tracks so it restores them after their own on_train_begin
+    reset. A finished run is marked complete and is not resumed again, and a
+    checkpoint whose ``fingerprint`` (config and data of the run that wrote it)
+    differs from this run's is ignored and overwritten.
+    """
+
+    def __init__(self, directory: Path, every: int = 1, tracked: Optional[List[tf.keras.callbacks.Callback]] = None,
+                 fingerprint: Optional[str] = None):
+        super().__init__()
+        self.directory = Path(directory)
+        self.every = every
+        self.tracked = list(tracked or [])
+        self.fingerprint = fingerprint
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def _state_path(self) -> Path:
+        return self.directory / "state.json"
+
+    def resume_epoch(self) -> int:
+        """Epoch to pass as ``initial_epoch``: 0 unless an unfinished run left a checkpoint."""
+        state = self._read_state()
+        return state["epoch"] + 1 if self._resumable(state) else 0
+
+    def _resumable(self, state: Optional[Dict[str, Any]]) -> bool:
+        return state is not None and not state.get("completed") and state.get("fingerprint") == self.fingerprint
+
+    def _read_state(self) -> Optional[Dict[str, Any]]:
+        if not self._state_path.exists():
+            return None
+        with open(self._state_path) as f:
+            return json.load(f)
+
+    def on_train_begin(self, logs=None):
+        state = self._read_state()
+        if not self._resumable(state):
+            if state is not None and not state.get("completed"):
+                logger.warning(f"Checkpoint in {self.directory} is from a different run; starting fresh")
+            # Another run's best weights must not be picked up by a later resume of this one
+            (self.directory / "best_weights.npz").unlink(missing_ok=True)
+            return
+        saved = tf.keras.models.load_model(self.directory / "last.keras")
+        self.model.set_weights(saved.get_weights())
+        optimizer = self.model.optimizer
+        if not optimizer.built:
+            optimizer.build(self.model.trainable_variables)
+        for variable, value in zip(optimizer.variables, saved.optimizer.variables):
+            variable.assign(value)
+        optimizer.learning_rate = state["learning_rate"]
+
+        best_weights = None
+        if (self.directory / "best_weights.npz").exists():
+            with np.load(self.directory / "best_weights.npz") as data:
+                best_weights = [data[f"arr_{i}"] for i in range(len(data.files))]
+        for callback in self.tracked:
+            name = type(callback).__name__
+            for attr, value in state["callbacks"].get(name, {}).items():
+                setattr(callback, attr, value)
+            if name == "EarlyStopping":
+                callback.best_weights = best_weights
+        logger.info(f"Resumed from {self.directory} after epoch {state['epoch']}")
+
+    def on_epoch_end(self, epoch, logs=None):
+        if (epoch + 1) % self.every == 0:
+            self._save(epoch)
+
+    def on_train_end(self, logs=None):
+        state = self._read_state()
+        if state is not None:
+            state["completed"] = True
+            self._write_state(state)
+
+    def _save(self, epoch: int) -> None:
+        # Keras wants the .keras suffix, so stage as tmp.keras and rename over the last one
+        tmp_path = self.directory / "tmp.keras"
+        self.model.save(tmp_path)
+        os.replace(tmp_path, self.directory / "last.keras")
+
+        callbacks = {}
+        for callback in self.tracked:
+            name = type(callback).__name__
+            callbacks[name] = {
+                attr: float(getattr(callback, attr)) if attr == "best" else int(getattr(callback, attr))
+                for attr in _CALLBACK_STATE.get(name, ()) if hasattr(callback, attr)
+            }
+            if name == "EarlyStopping" and getattr(callback, "best_weights", None) is not None:
+                np.savez(self.directory / "best_weights.npz", *callback.best_weights)
+
+        self._write_state({
+            "epoch": epoch,
+            "learning_rate": float(np.asarray(self.model.optimizer.learning_rate)),
+            "callbacks": callbacks,
+            "fingerprint": self.fingerprint,
+            "completed": False,
+        })
+
+    def _write_state(self, state: Dict[str, Any]) -> None:
+        tmp_path = self._state_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self._state_path)
+
+
+class EpochTelemetry(tf.keras.callbacks.Callback):
+    """Scouter readings for every epoch - is it the data or the math that's slow?
+
+    Per epoch: wall time, training-sample throughput, time inside train steps,
+    time between steps (callbacks and host overhead), validation time, the time
+    the input pipeline spent producing batches (streaming input only, summed over
+    its parallel workers) and the process's peak RSS. Rewritten to
+    ``telemetry.json`` / ``telemetry.csv`` after every epoch so a crash keeps it.
+    """
+
+    def __init__(self, output_dir: Path, n_samples: int, input_timer: Optional[InputTimer] = None,
+                 initial_epoch: int = 0):
+        super().__init__()
+        self.output_dir = Path(output_dir)
+        self.n_samples = n_samples
+        self.input_timer = input_timer
+        self.records: List[Dict[str, Any]] = []
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # A resumed run keeps the epochs recorded before the interruption
+        previous = self.output_dir / "telemetry.json"
+        if initial_epoch > 0 and previous.exists():
+            with open(previous) as f:
+                self.records = [r for r in json.load(f) if r["epoch"] < initial_epoch]
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = self._last_step_end = time.perf_counter()
+        self._step_s = 0.0
+        self._between_s = 0.0
+        if self.input_timer is not None:
+            self.input_timer.take()
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._step_start = time.perf_counter()
+        self._between_s += self._step_start - self._last_step_end
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._last_step_end = time.perf_counter()
+        self._step_s += self._last_step_end - self._step_start
+
+    def on_epoch_end(self, epoch, logs=None):
+        now = time.perf_counter()
+        train_s = self._last_step_end - self._epoch_start
+        logs = logs or {}
+        record = {
+            "epoch": epoch,
+            "wall_s": round(now - self._epoch_start, 4),
+            "train_s": round(train_s, 4),
+            "step_s": round(self._step_s, 4),
+            "between_steps_s": round(self._between_s, 4),
+            "val_s": round(now - self._last_step_end, 4),
+            "input_s": round(self.input_timer.take(), 4) if self.input_timer is not None else None,
+            "samples_per_s": round(self.n_samples / train_s, 1) if train_s > 0 else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+            "loss": logs.get("loss"),
+            "val_loss": logs.get("val_loss"),
+            "learning_rate": float(np.asarray(self.model.optimizer.learning_rate)),
+        }
+        self.records.append(record)
+        self._write()
+
+    def _write(self) -> None:
+        with open(self.output_dir / "telemetry.json", "w") as f:
+            json.dump(self.records, f, indent=2, default=float)
+        with open(self.output_dir / "telemetry.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.records[0]))
+            writer.writeheader()
+            writer.writerows(self.records)
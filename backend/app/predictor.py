@@ -1,6 +1,5 @@
 # predictor.py
 from pathlib import Path
-import tensorflow as tf
 import numpy as np
 import pandas as pd
 from typing import Dict, Optional, Union
@@ -8,17 +7,24 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 from app.data.data_preprocessor import TechnicalIndicators
 from app.data.stock_config import DataConfig
+from app.data.inference_backends import KerasFastPath
+from app.data.model_bundle import ModelRegistry
 import yfinance as yf
-import pickle
 
 
 @dataclass
 class PredictionConfig:
-    model_path: Path
-    feature_scaler_path: Path
-    target_scaler_path: Path
-    time_steps: int = 30
+    registry_path: Path
+    # None serves whatever the registry's CURRENT pointer names
+    version: Optional[int] = None
     batch_size: int = 32
+    # XLA for predict (keras runtime only); None keeps whatever the saved model was compiled with
+    jit_compile: Optional[bool] = None
+    # "auto" (full-precision TFLite/ONNX export if installed, else keras), "keras"
+    # or an export name such as "tflite_int8" to opt in to a quantized copy
+    runtime: str = "auto"
+    # Serve keras bundles through a traced forward pass instead of Model.predict
+    fast_path: bool = True
 
 class StockPredictor:
    
@@ -30,30 +36,35 @@ class StockPredictor:
     
     def _load_artifacts(self):
         """Load your weapons like Tanjiro unsheathes his sword"""
-        self.model = tf.keras.models.load_model(self.config.model_path)
-        with open(self.config.feature_scaler_path, 'rb') as f:
-            self.feature_scaler = pickle.load(f)
-        try :
-            self.feature_names = list(self.feature_scaler.feature_names_in_)
-        except AttributeError:
-            self.feature_names = self.data_config.get_active_features
-            
-        with open(self.config.target_scaler_path, 'rb') as f:
-            self.target_scaler = pickle.load(f)
-            # --- DEBUG: print how many features each scaler expects ---
-        print("🔍 feature_scaler.n_features_in_ =", 
-              getattr(self.feature_scaler, 'n_features_in_', None))
-        print("🔍 target_scaler.n_features_in_ =", 
-              getattr(self.target_scaler, 'n_features_in_', None))
+        self.bundle = ModelRegistry(self.config.registry_path).load(self.config.version, runtime=self.config.runtime)
+        self.model = self.bundle.model
+        if self.bundle.runtime == "keras":
+            if self.config.fast_path:
+                self.model = KerasFastPath(self.model, jit_compile=self.config.jit_compile)
+                # Trace once here so the first prediction doesn't pay for it
+                self.model.predict({
+                    'price_input': np.zeros((1, self.bundle.time_steps, len(self.bundle.feature_names)),
+                                            dtype=np.float32),
+                    'stock_input': np.zeros((1, 1), dtype=np.int32),
+                })
+            elif self.config.jit_compile is not None:
+                self.model.jit_compile = self.config.jit_compile
+        # Feature order and window length are recorded in the bundle, nothing to guess
+        self.feature_names = self.bundle.feature_names
+        self.time_steps = self.bundle.time_steps
+        self.feature_scaler = self.bundle.feature_scaler
+        self.target_scaler = self.bundle.target_scaler
+        print(f"🔍 model v{self.bundle.version} ({self.bundle.runtime}): {len(self.feature_names)} features, "
+              f"time_steps={self.time_steps}, cutoff={self.bundle.cutoff}")
     
     def prepare_prediction_data(self, df: pd.DataFrame, symbol: str) -> Dict[str, np.ndarray]:
         """Prepare data faster than Killua's Godspeed"""
         # Add your technical indicators here
         # Make a copy to avoid SettingWithCopyWarning
         features_df = df.copy()
-        features_df = TechnicalIndicators.calculate_all(features_df)
+        features_df = TechnicalIndicators.calculate_all(features_df, self.feature_names)
         features_df = features_df.ffill().bfill()
-        # Use config's active features instead of scaler.feature_names_in_
+        # Feature order recorded in the model bundle
         feature_names = self.feature_names  
         # sanity check
         missing = set(feature_names) - set(features_df.columns)
@@ -64,25 +75,26 @@ class StockPredictor:
 
          
         
-        if len(features) < self.config.time_steps:
+        if len(features) < self.time_steps:
             raise ValueError(
-                f"Not enough data after fill: {len(features)} < {self.config.time_steps}"
+                f"Not enough data after fill: {len(features)} < {self.time_steps}"
             )
-        scaled = self.feature_scaler.transform(features.values)
+        dtype = self.data_config.dtype
+        scaled = self.feature_scaler.transform(features.to_numpy(dtype=dtype))
         scaled = np.nan_to_num(scaled, nan=0.0, posinf=1.0, neginf=0.0)
         scaled = np.clip(scaled, 0.0, 1.0)
 
        # Create sequence for price data
         
-        seq = scaled[-self.config.time_steps:]
-        price_input = np.expand_dims(seq, axis=0)
+        seq = scaled[-self.time_steps:]
+        price_input = np.expand_dims(seq, axis=0).astype(dtype, copy=False)
 
 
         # Get stock ID
-        stock_id = self.data_config.stock_identifier_mapping.get(symbol)
+        stock_id = self.bundle.stock_identifier_mapping.get(symbol)
         if stock_id is None:
-            raise ValueError(f"Symbol {symbol} not found in stock_identifier_mapping.")
-        stock_input = np.array([[stock_id]])
+            raise ValueError(f"Symbol {symbol} not found in the model's stock_identifier_mapping.")
+        stock_input = np.array([[stock_id]], dtype=np.int32)
 
         return {
             'price_input': price_input,
@@ -94,10 +106,8 @@ class StockPredictor:
         # Make prediction
         scaled_pred = self.model.predict(processed_input, batch_size=self.config.batch_size)
         
-        # Inverse transform using target scaler
-        dummy_for_inverse = np.zeros((scaled_pred.shape[0], self.target_scaler.scale_.shape[0]))
-        dummy_for_inverse[:, :3] = scaled_pred
-        predictions = self.target_scaler.inverse_transform(dummy_for_inverse)[:, :3]
+        # Inverse transform using the bundle's target scaler parameters
+        predictions = self.target_scaler.inverse_transform(scaled_pred[:, :3])
         
         return {
             'timestamp': datetime.now().isoformat(),
@@ -1,30 +1,18 @@
 from app.data.dataFetcher import DataFetcher
-from app.data.stock_config import DataConfig
-from pathlib import Path
+from app.data.stock_config import Config, DataConfig
+from app.data.model_bundle import ModelRegistry
 import sys
 from datetime import datetime, timedelta
 from app.predictor import PredictionConfig, StockPredictor
 import pandas as pd
 def main():
-    model_path = Path(r"C:\Users\mohit\Desktop\python\FinancialAgent\LJ_Hackathon\backend\models\saved\multi_stock_model.keras")
-    feature_scaler_path = Path(r"C:\Users\mohit\Desktop\python\FinancialAgent\LJ_Hackathon\backend\models\saved\multi_stock_feature_scaler.pkl")
-    target_scaler_path = Path(r"C:\Users\mohit\Desktop\python\FinancialAgent\LJ_Hackathon\backend\models\saved\multi_stock_target_scaler.pkl")
-    # Check if model and scaler files exist before proceeding`  `
-    for p, desc in [
-        (model_path, "Model file"),
-        (feature_scaler_path, "Feature scaler file"),
-        (target_scaler_path, "Target scaler file")
-    ]:
-        if not p.exists():
-            print(f"Error: {desc} not found at {p.resolve()}. Please train the model first.")
-            sys.exit(1)
+    registry_path = Config().registry_path
+    # Check that a model bundle has been published before proceeding
+    if ModelRegistry(registry_path).current_version() is None:
+        print(f"Error: no model bundle in {registry_path.resolve()}. Please train the model first.")
+        sys.exit(1)
 
-    config = PredictionConfig(
-        model_path=model_path,
-        feature_scaler_path=feature_scaler_path,
-        target_scaler_path=target_scaler_path,
-        time_steps=30
-    )
+    config = PredictionConfig(registry_path=registry_path)
     data_config = DataConfig()  # Initialize DataConfig for DataFetcher
     predictor = StockPredictor(config, data_config)
     fetcher = DataFetcher(data_config)  # Pass DataConfig to DataFetcher
@@ -40,14 +28,14 @@ def main():
         # Calculate date range to fetch historical data
         # Fetch more than time_steps to account for non-trading days
         end_date = prediction_date
-        start_date = end_date - timedelta(days=config.time_steps * 2)
+        start_date = end_date - timedelta(days=predictor.time_steps * 2)
 
         # Fetch the data
         print(f"Fetching historical data for {symbol} up to {end_date} to make a prediction...")
         data = fetcher.fetch_data(symbol, start_date=start_date.strftime("%Y-%m-%d"), end_date=end_date.strftime("%Y-%m-%d"))
         
-        if data.shape[0] < config.time_steps:
-            print(f"Not enough historical data found ({data.shape[0]} days) to make a prediction for {symbol}. Need at least {config.time_steps} days.")
+        if data.shape[0] < predictor.time_steps:
+            print(f"Not enough historical data found ({data.shape[0]} days) to make a prediction for {symbol}. Need at least {predictor.time_steps} days.")
             sys.exit(1)
 
         # Process and predict